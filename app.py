@@ -1,9 +1,17 @@
 # ocb/ui/app.py
+import asyncio
+import os
 import flet as ft
 from auth import authenticate_google_sheets
-from data.data_loader import DataLoader
 from data.decision_maker import DecisionMaker
-from data.financial_analyzer import FinancialAnalyzer
+from data.inference_service import InferenceService, ml_disponivel
+from data.instrumentation import SamplingProfiler, metrics
+from data.payment_optimizer import PaymentOptimizer
+from data.refresh_scheduler import DEFAULT_REFRESH_INTERVAL
+from data.rule_engine import RuleEngine
+from data.snapshot_cache import SnapshotCache
+from data.tenants import TenantRegistry, TenantSpec, load_tenant_specs
+from data.write_back import WriteJournal
 import logging
 
 logging.basicConfig(level=logging.INFO,
@@ -14,8 +22,85 @@ CREDENTIALS_PATH = "credentials.json"
 SPREADSHEET_NAME = "Minha Planilha de Gastos"
 WORKSHEET_RESUMO = "resumo"
 WORKSHEET_DESPESAS = "despesa"
+CACHE_PATH = ".ocb_cache.sqlite3"
 
-def main(page: ft.Page):
+# Arquivo local (.xlsx ou diretório de .csv/.parquet) usado no lugar do
+# Google Sheets, para execução offline
+LOCAL_DATA_PATH = os.environ.get("OCB_DADOS_LOCAIS")
+
+# Arquivo JSON com as regras de decisão; sem ele, vale a regra padrão de 30%
+RULES_PATH = os.environ.get("OCB_REGRAS", "regras.json")
+
+# Arquivo JSON com as condições de pagamento (juros e descontos por forma
+# de pagamento e parcelamento); sem ele, valem as condições padrão
+CONDITIONS_PATH = os.environ.get("OCB_CONDICOES", "condicoes.json")
+
+# Se "1", a sugestão inclui a resposta do modelo de linguagem local; exige
+# os pacotes de requirements-ml.txt, importados só quando a IA é usada
+USE_AI = os.environ.get("OCB_USAR_IA") == "1"
+if USE_AI and not ml_disponivel():
+    logging.warning("OCB_USAR_IA=1, mas torch/transformers não estão instalados "
+                    "(requirements-ml.txt). Usando apenas as regras de decisão.")
+    USE_AI = False
+
+# Intervalo (em segundos) entre as verificações da planilha em segundo plano
+REFRESH_INTERVAL = float(os.environ.get("OCB_INTERVALO_ATUALIZACAO",
+                                        DEFAULT_REFRESH_INTERVAL))
+
+# Diretório onde as métricas (metricas.prom) e o trace (trace.json) são
+# gravados após cada consulta; com OCB_METRICAS=1 a instrumentação é ligada
+METRICS_DIR = os.environ.get("OCB_METRICAS_DIR", ".ocb_metricas")
+
+# Se "1", um profiler por amostragem roda durante cada consulta e grava as
+# pilhas (formato folded) em METRICS_DIR/perfil.folded
+USE_PROFILER = os.environ.get("OCB_PROFILER") == "1"
+
+# Se "1", cada compra avaliada é registrada na aba "simulações" e as compras
+# aprovadas podem ser lançadas na aba despesa; exige credenciais com
+# permissão de escrita na planilha
+WRITE_BACK = os.environ.get("OCB_GRAVAR") == "1"
+
+# Cache de snapshots compartilhado por todas as sessões do processo
+snapshot_cache = SnapshotCache(CACHE_PATH)
+
+# Linhas ainda não enviadas à planilha, reenviadas se o processo reiniciar
+write_journal = WriteJournal(CACHE_PATH) if WRITE_BACK else None
+
+# Modelos de IA carregados uma vez e compartilhados por todas as sessões
+inference_service = InferenceService()
+
+# Arquivo JSON com os usuários do modo servidor (uma planilha por usuário);
+# sem ele, o aplicativo atende um único usuário com a planilha acima
+TENANTS_PATH = os.environ.get("OCB_USUARIOS")
+DEFAULT_TENANT = "padrao"
+
+
+def build_tenant_registry() -> TenantRegistry:
+    """Monta o registro de usuários a partir de OCB_USUARIOS ou da planilha padrão."""
+    if TENANTS_PATH:
+        specs = load_tenant_specs(TENANTS_PATH)
+    else:
+        specs = {DEFAULT_TENANT: TenantSpec(DEFAULT_TENANT, CREDENTIALS_PATH,
+                                            SPREADSHEET_NAME, LOCAL_DATA_PATH)}
+    return TenantRegistry(specs, cache=snapshot_cache,
+                          refresh_interval=REFRESH_INTERVAL, journal=write_journal)
+
+
+# Loader, agregados e atualização em segundo plano de cada usuário; as
+# requisições leem só a memória e nunca esperam a planilha
+tenant_registry = build_tenant_registry()
+
+
+def export_metrics(profiler: SamplingProfiler = None):
+    """Grava as métricas, o trace e, se houver, o perfil em METRICS_DIR."""
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    with open(os.path.join(METRICS_DIR, "metricas.prom"), "w", encoding="utf-8") as arquivo:
+        arquivo.write(metrics.export_prometheus())
+    metrics.export_trace(os.path.join(METRICS_DIR, "trace.json"))
+    if profiler is not None:
+        profiler.save(os.path.join(METRICS_DIR, "perfil.folded"))
+
+async def main(page: ft.Page):
     """Função principal para iniciar o aplicativo Flet."""
 
     page.title = "OCB - Previsão de Limites de Crédito e Débito"
@@ -23,15 +108,140 @@ def main(page: ft.Page):
     page.horizontal_alignment = ft.CrossAxisAlignment.CENTER
     page.vertical_alignment = ft.MainAxisAlignment.CENTER
 
-    # Inicializar componentes
-    data_loader = DataLoader(CREDENTIALS_PATH, SPREADSHEET_NAME)
-    decision_maker = DecisionMaker() #  DecisionMaker inicializado aqui
+    # Cada sessão é vinculada ao seu usuário (ex.: /?usuario=familia-silva)
+    tenant_id = page.query.get("usuario") if TENANTS_PATH else DEFAULT_TENANT
+    if tenant_id not in tenant_registry.specs:
+        page.add(ft.Text("Usuário não encontrado.", color="red"))
+        page.update()
+        return
+
+    # Inicializar componentes (autenticação e modelos fora do loop de eventos)
+    tenant = await tenant_registry.acquire(tenant_id)
+    regras = RuleEngine.from_file(RULES_PATH) if os.path.exists(RULES_PATH) else None
+    decision_maker = await asyncio.to_thread(
+        DecisionMaker, regras=regras, inference=inference_service,
+        usar_ia=USE_AI) #  DecisionMaker inicializado aqui
+    otimizador = PaymentOptimizer.from_file(CONDITIONS_PATH) \
+        if os.path.exists(CONDITIONS_PATH) else PaymentOptimizer()
 
     # Elementos da interface
     page.add(ft.Text("OCB - Previsão de Limites", size=20))
+    balance_text = ft.Text("")
+    page.add(balance_text)
+
+    # Consulta em andamento, para permitir o cancelamento
+    tarefa_atual = None
+
+    async def mostrar_saldo():
+        """Exibe o saldo atual (lido do snapshot em memória)."""
+        financial_analyzer = await tenant.analyzer()
+        balance_text.value = f"Saldo atual: R$ {financial_analyzer.get_current_balance():.2f}"
+        page.update()
+
+    async def on_amount_change(e):
+        """Recomenda o plano de pagamento mais barato enquanto o valor é digitado."""
+        try:
+            purchase_amount = float(purchase_amount_field.value)
+        except (TypeError, ValueError):
+            purchase_amount = 0.0
+        if purchase_amount <= 0:
+            plan_text.value = ""
+            page.update()
+            return
+        with metrics.span("plano_pagamento"):
+            financial_analyzer = await tenant.analyzer()
+            # A projeção é calculada uma vez por versão dos dados; depois
+            # disso a busca leva microssegundos
+            projecao = await tenant.data_loader.run(tenant.cash_flow)
+            plano = financial_analyzer.melhor_plano_pagamento(
+                purchase_amount, otimizador, projecao=projecao, regras=regras)
+        plan_text.value = (f"Melhor forma de pagamento: {plano.descrever(purchase_amount)}"
+                           if plano is not None else
+                           "Nenhuma forma de pagamento mantém seu saldo positivo.")
+        page.update()
+
+    async def on_dados_atualizados(evento):
+        """Recebe o aviso da atualização em segundo plano e atualiza a sessão."""
+        await mostrar_saldo()
+        page.snack_bar = ft.SnackBar(ft.Text("Saldo atualizado com os dados da planilha."))
+        page.snack_bar.open = True
+        page.update()
 
-    def on_button_click(e):
+    async def on_disconnect(e):
+        """Desvincula a sessão encerrada do seu usuário."""
+        tenant.scheduler.unsubscribe(on_dados_atualizados)
+        await tenant_registry.release(tenant)
+
+    tenant.scheduler.subscribe(on_dados_atualizados)
+    page.on_disconnect = on_disconnect
+
+    async def avaliar_compra(purchase_amount, category, installments, payment_method):
+        """Executa a análise financeira e a decisão sem bloquear a interface."""
+
+        # Análise financeira
+        with metrics.span("analise"):
+            financial_analyzer = await tenant.analyzer()
+            saldo_atual = financial_analyzer.get_current_balance()
+            limite_credito = financial_analyzer.get_available_credit()
+            impacto_compra = financial_analyzer.simular_compra(
+                purchase_amount, installments
+            )
+
+        # Gasto do mês na categoria da compra e sinais de gasto incomum,
+        # usados pelas regras por categoria e pelos alertas de anomalia
+        with metrics.span("categoria"):
+            contexto = await asyncio.to_thread(
+                financial_analyzer.contexto_categoria, category, purchase_amount)
+
+        # Obtém sugestão de compra
+        with metrics.span("decisao"):
+            suggestion = await asyncio.to_thread(
+                decision_maker.get_purchase_suggestion,
+                saldo_atual,
+                limite_credito,
+                impacto_compra,
+                purchase_amount,
+                installments,
+                payment_method,
+                contexto
+            )
+
+        # Quanto do orçamento do mês já foi gasto na categoria da compra
+        if contexto["orcamento_mes"]:
+            percentual = 100 * contexto["gasto_categoria"] / contexto["orcamento_mes"]
+            suggestion["categoria"] = (
+                f"Você já gastou {percentual:.1f}% do orçamento do mês em {category}.")
+
+        # Se a compra foi negada, informa quando ela passa a ser possível
+        if "negada" in suggestion["suggestion"].lower():
+            with metrics.span("fluxo_caixa"):
+                mes_viavel = await asyncio.to_thread(
+                    financial_analyzer.quando_posso_comprar,
+                    purchase_amount, installments
+                )
+            suggestion["quando"] = (
+                f"Você poderá fazer esta compra a partir de {mes_viavel.strftime('%m/%Y')}."
+                if mes_viavel is not None else
+                "A compra não cabe no seu orçamento nos próximos meses."
+            )
+        # Registra a simulação na planilha (enviada junto com as próximas)
+        if tenant.write_back is not None:
+            await tenant.data_loader.run(
+                tenant.registrar, "registrar_simulacao", purchase_amount, category,
+                payment_method, installments, suggestion["suggestion"],
+                suggestion["justification"])
+        return suggestion
+
+    def set_busy(busy: bool):
+        """Mostra ou esconde o indicador de progresso."""
+        progress_ring.visible = busy
+        cancel_button.visible = busy
+        button.disabled = busy
+        page.update()
+
+    async def on_button_click(e):
         """Processa a solicitação de compra quando o botão é clicado."""
+        nonlocal tarefa_atual
 
         try:
             purchase_amount = float(purchase_amount_field.value)
@@ -50,38 +260,78 @@ def main(page: ft.Page):
             if not payment_method:
                 raise ValueError("Selecione uma forma de pagamento.")
 
-            # Análise financeira
-            financial_analyzer = FinancialAnalyzer(data_loader)
-            saldo_atual = financial_analyzer.get_current_balance() 
-            limite_credito = financial_analyzer.get_available_credit()  
-            impacto_compra = financial_analyzer.simular_compra(
-                purchase_amount, installments
-            )
+        except (TypeError, ValueError) as e:
+            # TypeError: campo ainda vazio (valor None)
+            page.add(ft.Text(f"Erro: {e}", color="red"))
+            page.update()
+            return
 
-            # Obtém sugestão de compra
-            suggestion = decision_maker.get_purchase_suggestion(
-                saldo_atual, 
-                limite_credito, 
-                impacto_compra,
-                purchase_amount, 
-                installments, 
-                payment_method
-            )
+        set_busy(True)
+        profiler = SamplingProfiler() if USE_PROFILER else None
+        try:
+            if profiler is not None:
+                profiler.start()
+            # A tarefa herda o span, que fica como pai das etapas da consulta
+            with metrics.span("consulta", usuario=tenant_id):
+                tarefa_atual = asyncio.create_task(avaliar_compra(
+                    purchase_amount, category, installments, payment_method))
+                suggestion = await tarefa_atual
 
-            # Exibe a sugestão na interface
+            # Exibe a sugestão na interface; em caso de erro, o DecisionMaker
+            # retorna só a sugestão e a justificativa
+            page.add(ft.Text(f"Sugestão: {suggestion.get('suggestion', '')}"))
+            page.add(ft.Text(f"Justificativa: {suggestion.get('justification', '')}"))
+            if "resume" in suggestion:
+                page.add(ft.Text(f"Informação: {suggestion['resume']}"))
+            if "ai_suggestion" in suggestion:
+                page.add(ft.Text(f"Sugestão da IA: {suggestion['ai_suggestion']} "
+                                 f"{suggestion['ai_justification']}"))
+            if "categoria" in suggestion:
+                page.add(ft.Text(suggestion["categoria"]))
+            if "quando" in suggestion:
+                page.add(ft.Text(f"Previsão: {suggestion['quando']}"))
+            if tenant.write_back is not None \
+                    and "aprovada" in suggestion.get("suggestion", "").lower():
+                page.add(ft.ElevatedButton(
+                    "Registrar compra",
+                    on_click=registrar_compra_handler(
+                        purchase_amount, category, installments, payment_method)))
 
-            
-            page.add(ft.Text(f"Sugestão: {suggestion['suggestion']}"))
-            page.add(ft.Text(f"Justificativa: {suggestion['justification']}"))
-            page.add(ft.Text(f"Informação: {suggestion['resume']}"))
+        except asyncio.CancelledError:
+            if not tarefa_atual.cancelled():
+                raise
+            page.add(ft.Text("Consulta cancelada.", color="orange"))
+        except Exception as e:
+            logging.exception(f"Erro ao avaliar a compra: {e}")
+            page.add(ft.Text(f"Erro ao avaliar a compra: {e}", color="red"))
+        finally:
+            tarefa_atual = None
+            set_busy(False)
+            if profiler is not None:
+                profiler.stop()
+            if metrics.enabled or profiler is not None:
+                await asyncio.to_thread(export_metrics, profiler)
 
+    def registrar_compra_handler(purchase_amount, category, installments, payment_method):
+        """Cria o handler que lança a compra aprovada na aba despesa."""
+        async def on_click(e):
+            e.control.disabled = True
             page.update()
+            await tenant.data_loader.run(
+                tenant.registrar, "registrar_compra", purchase_amount, category,
+                payment_method, installments)
+            e.control.text = "Compra registrada"
+            await mostrar_saldo()
+        return on_click
 
-        except ValueError as e:
-            page.add(ft.Text(f"Erro: {e}", color="red"))
-            page.update()
+    def on_cancel_click(e):
+        """Cancela a consulta em andamento."""
+        if tarefa_atual is not None and not tarefa_atual.done():
+            tarefa_atual.cancel()
 
-    purchase_amount_field = ft.TextField(label="Valor da Compra", width=200)
+    purchase_amount_field = ft.TextField(label="Valor da Compra", width=200,
+                                         on_change=on_amount_change)
+    plan_text = ft.Text("")
     category_dropdown = ft.Dropdown(
         width=200,
         options=[
@@ -98,19 +348,26 @@ def main(page: ft.Page):
             ft.dropdown.Option("Cartão de Crédito"),
             ft.dropdown.Option("Cartão de Débito"),
             ft.dropdown.Option("Dinheiro"),
+            ft.dropdown.Option("Pix"),
             # Adicione mais formas de pagamento aqui
         ],
     )
     button = ft.ElevatedButton("Posso Comprar?", on_click=on_button_click)
+    cancel_button = ft.TextButton("Cancelar", on_click=on_cancel_click,
+                                  visible=False)
+    progress_ring = ft.ProgressRing(width=24, height=24, visible=False)
     
     # Adiciona os componentes na página
     page.add(
         purchase_amount_field, 
+        plan_text,
         category_dropdown,
         installments_field, 
         payment_method_dropdown, 
-        button
+        ft.Row([button, progress_ring, cancel_button],
+               alignment=ft.MainAxisAlignment.CENTER)
     )
+    await mostrar_saldo()
 
 if __name__ == "__main__":
     ft.app(target=main)
\ No newline at end of file
@@ -1,6 +1,4 @@
-import os
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
+from data.google_clients import WRITE_SCOPES, get_client_pool
 
 # Escopos necessários para acessar a API do Google Sheets
 SCOPES = ['https://www.googleapis.com/auth/spreadsheets.readonly']
@@ -8,13 +6,20 @@ SCOPES = ['https://www.googleapis.com/auth/spreadsheets.readonly']
 # Caminho para o arquivo de credenciais da conta de serviço
 CREDENTIALS_FILE = 'credentials.json'
 
-def authenticate_google_sheets():
-    """Autentica usando credenciais de conta de serviço."""
+def authenticate_google_sheets(gravar: bool = False):
+    """
+    Autentica usando credenciais de conta de serviço.
+
+    O serviço é criado uma única vez por processo (pool de clientes) e
+    reaproveitado nas chamadas seguintes.
+
+    Args:
+        gravar: Se True, pede permissão de gravação (WRITE_SCOPES), usada só
+            quando o registro na planilha está habilitado (OCB_GRAVAR=1).
+    """
     try:
-        credentials = service_account.Credentials.from_service_account_file(
-            CREDENTIALS_FILE, scopes=SCOPES)
-        service = build('sheets', 'v4', credentials=credentials)
-        return service
+        return get_client_pool().sheets_service(CREDENTIALS_FILE,
+                                                WRITE_SCOPES if gravar else SCOPES)
     except Exception as e:
         print(f"Erro na autenticação: {e}")
-        return None
\ No newline at end of file
+        return None
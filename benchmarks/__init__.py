@@ -0,0 +1 @@
+# Arquivo vazio para indicar que esta pasta é um pacote Python.
\ No newline at end of file
@@ -0,0 +1,139 @@
+# ocb/benchmarks/bench_startup.py
+"""
+Mede o tempo de inicialização e a memória residente do modo somente-regras.
+
+Cada medição roda em um processo Python novo, que importa o DecisionMaker,
+cria a instância e gera uma sugestão, exatamente como o app faz no início de
+uma sessão. Também é medido, em processos novos, o tempo de importação dos
+módulos do núcleo (leitura da planilha, análise e regras), que não podem
+importar nenhum pacote de requirements-ml.txt. O script termina com código 1
+se algum orçamento for estourado; com --detalhar, lista as importações mais
+lentas (python -X importtime).
+
+Uso (a partir da raiz do projeto):
+    python -m benchmarks.bench_startup [--repeticoes 5] [--orcamento 1.0]
+        [--orcamento-importacao 0.6] [--detalhar]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Executado em um processo isolado; imprime as medições em JSON
+SCRIPT_MEDICAO = """
+import json, resource, sys, time
+inicio = time.perf_counter()
+from data.decision_maker import DecisionMaker
+decision_maker = DecisionMaker()
+decision_maker.get_purchase_suggestion(1500.0, 3000.0, "", 200.0, 1, "Dinheiro")
+fim = time.perf_counter()
+rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({
+    "segundos": fim - inicio,
+    "rss_mb": rss_kb / 1024,
+    "torch_importado": "torch" in sys.modules,
+    "transformers_importado": "transformers" in sys.modules,
+}))
+"""
+
+# Módulos do núcleo (instalação sem requirements-ml.txt)
+MODULOS_NUCLEO = ["data.data_loader", "data.financial_analyzer", "data.rule_engine",
+                  "data.decision_maker", "data.payment_optimizer", "data.tenants",
+                  "data.refresh_scheduler", "auth"]
+
+# Pacotes que o núcleo nunca deve importar
+PACOTES_PESADOS = ["torch", "transformers", "tensorflow", "sklearn", "matplotlib"]
+
+SCRIPT_IMPORTACAO = f"""
+import json, sys, time
+inicio = time.perf_counter()
+import {", ".join(MODULOS_NUCLEO)}
+fim = time.perf_counter()
+print(json.dumps({{
+    "segundos": fim - inicio,
+    "pesados": [p for p in {PACOTES_PESADOS!r} if p in sys.modules],
+}}))
+"""
+
+
+def medir_importacao() -> dict:
+    """Importa o núcleo em um processo novo e retorna o tempo e os pacotes pesados carregados."""
+    saida = subprocess.run(
+        [sys.executable, "-c", SCRIPT_IMPORTACAO],
+        cwd=RAIZ, capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(saida.strip().splitlines()[-1])
+
+
+def importacoes_mais_lentas(quantidade: int = 15) -> list:
+    """Lista (tempo acumulado em s, módulo) das importações mais lentas do núcleo."""
+    saida = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {', '.join(MODULOS_NUCLEO)}"],
+        cwd=RAIZ, capture_output=True, text=True, check=True,
+    ).stderr
+    linhas = []
+    for linha in saida.splitlines():
+        partes = linha.split("|")
+        if len(partes) == 3 and partes[1].strip().isdigit():
+            linhas.append((int(partes[1]) / 1e6, partes[2].rstrip()))
+    return sorted(linhas, reverse=True)[:quantidade]
+
+
+def medir() -> dict:
+    """Executa uma medição em um processo novo e retorna os resultados."""
+    saida = subprocess.run(
+        [sys.executable, "-c", SCRIPT_MEDICAO],
+        cwd=RAIZ, capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(saida.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeticoes", type=int, default=5)
+    parser.add_argument("--orcamento", type=float, default=1.0,
+                        help="tempo máximo de inicialização em segundos")
+    parser.add_argument("--orcamento-importacao", type=float, default=0.6,
+                        help="tempo máximo de importação do núcleo em segundos")
+    parser.add_argument("--detalhar", action="store_true",
+                        help="lista as importações mais lentas do núcleo")
+    args = parser.parse_args()
+
+    importacoes = [medir_importacao() for _ in range(args.repeticoes)]
+    tempo_importacao = statistics.median(m["segundos"] for m in importacoes)
+    pesados_nucleo = sorted({p for m in importacoes for p in m["pesados"]})
+    print(f"Importação do núcleo: mediana {tempo_importacao:.3f}s "
+          f"(orçamento {args.orcamento_importacao:.2f}s)")
+    print(f"Pacotes pesados importados pelo núcleo: {', '.join(pesados_nucleo) or 'nenhum'}")
+    if args.detalhar:
+        for segundos, modulo in importacoes_mais_lentas():
+            print(f"  {segundos * 1000:8.1f} ms {modulo}")
+
+    medicoes = [medir() for _ in range(args.repeticoes)]
+    tempos = [m["segundos"] for m in medicoes]
+    rss = [m["rss_mb"] for m in medicoes]
+    pesados = any(m["torch_importado"] or m["transformers_importado"]
+                  for m in medicoes)
+
+    print(f"Inicialização (modo regras): mediana {statistics.median(tempos):.3f}s, "
+          f"máx {max(tempos):.3f}s")
+    print(f"RSS máximo: {max(rss):.1f} MB")
+    print(f"torch/transformers importados: {'sim' if pesados else 'não'}")
+
+    if pesados_nucleo or tempo_importacao > args.orcamento_importacao:
+        print(f"FALHA: orçamento de importação de {args.orcamento_importacao:.2f}s "
+              "estourado ou pacotes pesados importados pelo núcleo.")
+        sys.exit(1)
+    if pesados or max(tempos) > args.orcamento:
+        print(f"FALHA: orçamento de {args.orcamento:.2f}s estourado "
+              "ou dependências de ML importadas.")
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+# ocb/benchmarks/bench_suite.py
+"""
+Mede o custo de cada etapa (carga, conversão, análise, previsão e decisão)
+sobre planilhas sintéticas de 100 a 1.000.000 de linhas.
+
+Tudo roda offline: as abas são geradas por benchmarks.synthetic e servidas
+por um cliente gspread falso, em memória. Para cada etapa são reportados os
+percentis de latência, a vazão e o pico de memória; o tempo de importação
+de cada módulo é medido em processos Python novos. Com --baseline, as
+medições são comparadas a um baseline salvo e o script termina com código 1
+se alguma etapa regredir além da tolerância.
+
+Uso (a partir da raiz do projeto):
+    python -m benchmarks.bench_suite [--tamanhos 100 10000 100000]
+        [--repeticoes 5] [--baseline benchmarks/baseline.json]
+        [--salvar-baseline] [--tolerancia 0.25]
+"""
+import argparse
+import gc
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, List
+
+import numpy as np
+
+from benchmarks.synthetic import FakeClient, FakeSpreadsheet, gerar_planilha
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_PADRAO = os.path.join(RAIZ, "benchmarks", "baseline.json")
+
+# Módulos cujo tempo de importação é medido
+MODULOS = ["data.data_loader", "data.sheet_parser", "data.financial_analyzer",
+           "data.prediction_model", "data.decision_maker", "data.spending_rollups",
+           "data.anomaly_detector"]
+
+# Variações abaixo destes pisos são ruído de medição, não regressão
+PISO_SEGUNDOS = 0.005
+PISO_MB = 1.0
+
+
+def _loader(abas):
+    from data.data_loader import DataLoader
+    return DataLoader(None, "benchmark", client=FakeClient(FakeSpreadsheet(abas)))
+
+
+def _registros(linhas: List[List[str]]) -> List[Dict]:
+    return [dict(zip(linhas[0], linha)) for linha in linhas[1:]]
+
+
+def preparar_etapas(abas) -> Dict[str, Callable[[], object]]:
+    """
+    Monta as etapas medidas. Cada etapa é uma função sem argumentos; o estado
+    que ela reaproveita (loader aquecido, analisador) é criado aqui.
+    """
+    from data.anomaly_detector import AnomalyDetector
+    from data.decision_maker import DecisionMaker
+    from data.financial_analyzer import FinancialAnalyzer
+    from data.payment_optimizer import PaymentOptimizer
+    from data.prediction_model import PredictionModel
+    from data.sheet_parser import SCHEMAS, SheetTable
+    from data.spending_rollups import SpendingRollups
+
+    quente = _loader(abas)
+    quente.load_all()
+    analisador = FinancialAnalyzer(quente)
+    decision_maker = DecisionMaker()
+    registros = {nome: _registros(linhas) for nome, linhas in abas.items()}
+    otimizador = PaymentOptimizer()
+    projecao = analisador.projetar_fluxo_caixa()
+    valores = np.linspace(10, 10000, 100)
+
+    return {
+        "load_frio": lambda: _loader(abas).load_all(),
+        "load_quente": quente.load_all,
+        "conversao": lambda: SheetTable(abas["despesa"], SCHEMAS["despesa"]),
+        "simulacao": lambda: analisador.simular_compras(
+            valores, range(1, 13), ["Cartão de Crédito", "Dinheiro"]),
+        "fluxo_caixa": lambda: analisador.quando_posso_comprar(5000.0, 6),
+        "otimizacao": lambda: analisador.melhor_plano_pagamento(
+            2000.0, otimizador, projecao=projecao),
+        "anomalias": lambda: AnomalyDetector().refresh(quente.load_table("despesa")),
+        "agregados": lambda: SpendingRollups().refresh_from_loader(quente),
+        "previsao": lambda: PredictionModel(
+            registros["receita"], registros["despesa"], registros["resumo"]).predict_limits(),
+        "decisao": lambda: decision_maker.get_purchase_suggestion(
+            1500.0, 3000.0, "", 200.0, 3, "Cartão de Crédito"),
+    }
+
+
+def medir_etapa(funcao: Callable[[], object], repeticoes: int, linhas: int) -> Dict:
+    """
+    Executa uma etapa e retorna p50/p95/p99 (s), vazão (linhas/s) e pico de
+    memória (MB). O pico é medido em uma execução separada, com tracemalloc,
+    para não distorcer os tempos.
+    """
+    funcao()  # aquecimento
+    tempos = []
+    for _ in range(repeticoes):
+        gc.collect()
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - inicio)
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        funcao()
+        _, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    p50, p95, p99 = np.percentile(tempos, [50, 95, 99]).tolist()
+    return {
+        "p50": p50,
+        "p95": p95,
+        "p99": p99,
+        "vazao": linhas / p50 if p50 > 0 else float("inf"),
+        "pico_mb": pico / 1024 / 1024,
+    }
+
+
+def medir_importacoes(repeticoes: int) -> Dict[str, Dict]:
+    """Mede, em processos novos, o tempo de importação de cada módulo."""
+    resultado = {}
+    for modulo in MODULOS:
+        script = (f"import time; inicio = time.perf_counter(); import {modulo}; "
+                  f"print(time.perf_counter() - inicio)")
+        tempos = [float(subprocess.run([sys.executable, "-c", script], cwd=RAIZ,
+                                       capture_output=True, text=True,
+                                       check=True).stdout.split()[-1])
+                  for _ in range(repeticoes)]
+        resultado[modulo] = {"p50": statistics.median(tempos), "pico_mb": 0.0}
+    return resultado
+
+
+def comparar(atual: Dict, baseline: Dict, tolerancia: float) -> List[str]:
+    """Lista as etapas cujo p50 ou pico de memória pioraram além da tolerância."""
+    regressoes = []
+    for grupo, etapas in atual.items():
+        for etapa, medida in etapas.items():
+            base = baseline.get(grupo, {}).get(etapa)
+            if base is None:
+                continue
+            for metrica, piso in (("p50", PISO_SEGUNDOS), ("pico_mb", PISO_MB)):
+                limite = base[metrica] * (1 + tolerancia)
+                if medida[metrica] > limite and medida[metrica] - base[metrica] > piso:
+                    regressoes.append(
+                        f"{grupo}/{etapa}: {metrica} {medida[metrica]:.4f} "
+                        f"(baseline {base[metrica]:.4f})")
+    return regressoes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--tamanhos", type=int, nargs="+", default=[100, 10000, 100000],
+                        help="quantidades de linhas de despesa (até 1000000)")
+    parser.add_argument("--repeticoes", type=int, default=5)
+    parser.add_argument("--etapas", nargs="+", help="etapas a medir (padrão: todas)")
+    parser.add_argument("--baseline", default=BASELINE_PADRAO)
+    parser.add_argument("--salvar-baseline", action="store_true",
+                        help="grava as medições como o novo baseline")
+    parser.add_argument("--tolerancia", type=float, default=0.25,
+                        help="piora relativa aceita antes de acusar regressão")
+    parser.add_argument("--sem-importacoes", action="store_true")
+    args = parser.parse_args()
+
+    resultados: Dict[str, Dict] = {}
+    if not args.sem_importacoes:
+        resultados["importacao"] = medir_importacoes(args.repeticoes)
+        for modulo, medida in resultados["importacao"].items():
+            print(f"importação {modulo:<28} {medida['p50'] * 1000:8.1f} ms")
+
+    for tamanho in args.tamanhos:
+        abas = gerar_planilha(tamanho)
+        etapas = preparar_etapas(abas)
+        if args.etapas:
+            etapas = {nome: f for nome, f in etapas.items() if nome in args.etapas}
+        # Planilhas grandes: menos repetições para manter o tempo total razoável
+        repeticoes = max(1, args.repeticoes if tamanho <= 100000 else args.repeticoes // 3)
+        grupo = resultados.setdefault(f"linhas_{tamanho}", {})
+        print(f"\n{tamanho} linhas")
+        print(f"{'etapa':<14}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+              f"{'linhas/s':>14}{'pico MB':>10}")
+        for nome, funcao in etapas.items():
+            medida = medir_etapa(funcao, repeticoes, tamanho)
+            grupo[nome] = medida
+            print(f"{nome:<14}{medida['p50'] * 1000:10.2f}{medida['p95'] * 1000:10.2f}"
+                  f"{medida['p99'] * 1000:10.2f}{medida['vazao']:14.0f}"
+                  f"{medida['pico_mb']:10.1f}")
+
+    if args.salvar_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as arquivo:
+            json.dump(resultados, arquivo, indent=2)
+        print(f"\nBaseline gravado em {args.baseline}")
+        return
+
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as arquivo:
+            baseline = json.load(arquivo)
+        regressoes = comparar(resultados, baseline, args.tolerancia)
+        if regressoes:
+            print("\nFALHA: regressões em relação ao baseline:")
+            for regressao in regressoes:
+                print(f"  {regressao}")
+            sys.exit(1)
+        print("\nOK: sem regressões em relação ao baseline.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+# ocb/benchmarks/synthetic.py
+"""
+Gerador de planilhas sintéticas no layout exato das abas Resumo, Receita e
+Despesa, e um cliente gspread falso, em memória, para rodar os benchmarks
+sem rede nem credenciais.
+"""
+import datetime
+import time
+from typing import Dict, List, Optional
+import numpy as np
+
+CATEGORIAS_DESPESA = ["Alimentação", "Transporte", "Lazer", "Moradia", "Saúde",
+                      "Educação", "Assinaturas", "Vestuário"]
+CATEGORIAS_RECEITA = ["Salário", "Freelance", "Rendimentos", "Outros"]
+FORMAS_PAGAMENTO = ["Cartão de Crédito", "Cartão de Débito", "Dinheiro", "Pix"]
+
+CABECALHO_RESUMO = ["Data de Referência", "Limite Total", "Saldo Restante",
+                    "Limite Disponível", "Total a Pagar", "credit_limit", "debit_limit"]
+CABECALHO_RECEITA = ["Data da Receita", "Descrição da Receita", "Valor da Receita",
+                     "Categoria da Receita", "Recorrente"]
+CABECALHO_DESPESA = ["Data da Despesa", "Descrição da Despesa", "Valor da Despesa",
+                     "Categoria da Despesa", "Forma de Pagamento", "Parcelas", "Recorrente"]
+
+
+def formatar_brl(centavos: np.ndarray) -> List[str]:
+    """Formata valores em centavos como na planilha (ex.: 'R$ 1.234,56')."""
+    reais, resto = np.divmod(np.asarray(centavos, dtype=np.int64), 100)
+    return [f"R$ {r:,}".replace(",", ".") + f",{c:02d}"
+            for r, c in zip(reais.tolist(), resto.tolist())]
+
+
+def formatar_datas(dias: np.ndarray, inicio: datetime.date) -> List[str]:
+    """Formata deslocamentos em dias a partir de `inicio` como dd/mm/aaaa."""
+    # Só as datas distintas são formatadas
+    unicos, inverso = np.unique(dias, return_inverse=True)
+    textos = np.array([(inicio + datetime.timedelta(days=int(d))).strftime("%d/%m/%Y")
+                       for d in unicos], dtype=object)
+    return textos[inverso].tolist()
+
+
+def gerar_planilha(linhas: int, seed: int = 0, meses: int = 24,
+                   hoje: Optional[datetime.date] = None) -> Dict[str, List[List[str]]]:
+    """
+    Gera as abas de uma planilha sintética.
+
+    Args:
+        linhas: Quantidade de despesas (as receitas são ~1/10 disso).
+        seed: Semente do gerador aleatório (mesma semente, mesma planilha).
+        meses: Meses de histórico cobertos pelas datas.
+        hoje: Data de referência (padrão: hoje).
+
+    Returns:
+        Dict[str, List[List[str]]]: Valores de cada aba no formato de
+        get_all_values(), com o cabeçalho na primeira linha.
+    """
+    rng = np.random.default_rng(seed)
+    hoje = hoje or datetime.date.today()
+    inicio = hoje - datetime.timedelta(days=30 * meses)
+    dias_totais = (hoje - inicio).days
+
+    n = linhas
+    valores = np.round(rng.lognormal(mean=4.5, sigma=1.0, size=n) * 100).astype(np.int64)
+    parcelas = np.where(rng.random(n) < 0.2, rng.integers(2, 13, n), 1)
+    parcela_atual = np.minimum(rng.integers(1, 13, n), parcelas)
+    texto_parcelas = np.where(parcelas > 1,
+                              np.char.add(np.char.add(parcela_atual.astype(str), "/"),
+                                          parcelas.astype(str)), "").tolist()
+    despesa = [CABECALHO_DESPESA] + [list(linha) for linha in zip(
+        formatar_datas(rng.integers(0, dias_totais, n), inicio),
+        [f"Despesa {i}" for i in range(n)],
+        formatar_brl(valores),
+        np.array(CATEGORIAS_DESPESA, dtype=object)[rng.integers(0, len(CATEGORIAS_DESPESA), n)],
+        np.array(FORMAS_PAGAMENTO, dtype=object)[rng.integers(0, len(FORMAS_PAGAMENTO), n)],
+        texto_parcelas,
+        np.where(rng.random(n) < 0.1, "Sim", "Não").tolist(),
+    )]
+
+    m = max(1, n // 10)
+    valores_receita = np.round(rng.lognormal(mean=7.5, sigma=0.5, size=m) * 100).astype(np.int64)
+    receita = [CABECALHO_RECEITA] + [list(linha) for linha in zip(
+        formatar_datas(rng.integers(0, dias_totais, m), inicio),
+        [f"Receita {i}" for i in range(m)],
+        formatar_brl(valores_receita),
+        np.array(CATEGORIAS_RECEITA, dtype=object)[rng.integers(0, len(CATEGORIAS_RECEITA), m)],
+        np.where(rng.random(m) < 0.5, "Sim", "Não").tolist(),
+    )]
+
+    # Uma linha por mês, com os limites evoluindo ao longo do tempo
+    referencias = np.arange(meses) * 30
+    limite_total = 500000 + np.cumsum(rng.integers(0, 20000, meses))
+    saldo = rng.integers(50000, 800000, meses)
+    disponivel = limite_total - rng.integers(0, 300000, meses)
+    resumo = [CABECALHO_RESUMO] + [list(linha) for linha in zip(
+        formatar_datas(referencias, inicio),
+        formatar_brl(limite_total),
+        formatar_brl(saldo),
+        formatar_brl(disponivel),
+        formatar_brl(limite_total - disponivel),
+        formatar_brl(limite_total),
+        formatar_brl(saldo),
+    )]
+    return {"resumo": resumo, "receita": receita, "despesa": despesa}
+
+
+class FakeWorksheet:
+    """Aba em memória com a interface usada pelo DataLoader."""
+
+    def __init__(self, title: str, linhas: List[List[str]], id: int = 0):
+        self.title = title
+        self.linhas = linhas
+        self.id = id
+
+    def get_all_values(self) -> List[List[str]]:
+        return self.linhas
+
+
+class FakeSpreadsheet:
+    """
+    Planilha gspread falsa, em memória.
+
+    Args:
+        abas: Valores de cada aba (ex.: o retorno de gerar_planilha).
+        latencia: Atraso (s) simulado em cada chamada à API.
+    """
+
+    def __init__(self, abas: Dict[str, List[List[str]]], latencia: float = 0.0):
+        self.abas = {nome: FakeWorksheet(nome, linhas, i)
+                     for i, (nome, linhas) in enumerate(abas.items())}
+        self.latencia = latencia
+        self.revisao = 0
+        self.chamadas = {"worksheets": 0, "values_batch_get": 0, "revisao": 0,
+                         "batch_update": 0}
+
+    def _esperar(self, chamada: str):
+        self.chamadas[chamada] += 1
+        if self.latencia:
+            time.sleep(self.latencia)
+
+    def worksheets(self) -> List[FakeWorksheet]:
+        self._esperar("worksheets")
+        return list(self.abas.values())
+
+    def values_batch_get(self, ranges: List[str], params=None) -> Dict:
+        self._esperar("values_batch_get")
+        return {"valueRanges": [
+            {"range": r, "values": self.abas[r.strip("'").replace("''", "'")].linhas}
+            for r in ranges]}
+
+    def get_lastUpdateTime(self) -> str:
+        self._esperar("revisao")
+        return f"rev-{self.revisao}"
+
+    def batch_update(self, corpo: Dict) -> Dict:
+        """Aplica as requisições addSheet e appendCells, gravando os valores como texto."""
+        self._esperar("batch_update")
+        por_id = {aba.id: aba for aba in self.abas.values()}
+        for requisicao in corpo["requests"]:
+            if "addSheet" in requisicao:
+                propriedades = requisicao["addSheet"]["properties"]
+                aba = FakeWorksheet(propriedades["title"], [], propriedades["sheetId"])
+                self.abas[aba.title] = por_id[aba.id] = aba
+            elif "appendCells" in requisicao:
+                anexo = requisicao["appendCells"]
+                por_id[anexo["sheetId"]].linhas.extend(
+                    [_texto_celula(celula) for celula in linha["values"]]
+                    for linha in anexo["rows"])
+        self.revisao += 1
+        return {"replies": []}
+
+    def editar(self, aba: str, linhas: List[List[str]]):
+        """Substitui o conteúdo de uma aba e avança a revisão."""
+        self.abas[aba] = FakeWorksheet(aba, linhas)
+        self.revisao += 1
+
+
+def _texto_celula(celula: Dict) -> str:
+    """Texto exibido de uma célula gravada com batch_update (moeda, data ou texto)."""
+    valor = celula["userEnteredValue"]
+    if "stringValue" in valor:
+        return valor["stringValue"]
+    formato = celula.get("userEnteredFormat", {}).get("numberFormat", {})
+    if formato.get("type") == "DATE":
+        data = datetime.date(1899, 12, 30) + datetime.timedelta(days=int(valor["numberValue"]))
+        return data.strftime("%d/%m/%Y")
+    return formatar_brl(np.array([round(valor["numberValue"] * 100)]))[0]
+
+
+class FakeClient:
+    """Cliente gspread falso: open/open_by_key devolvem a mesma planilha."""
+
+    def __init__(self, spreadsheet: FakeSpreadsheet):
+        self.spreadsheet = spreadsheet
+
+    def open(self, nome: str) -> FakeSpreadsheet:
+        return self.spreadsheet
+
+    def open_by_key(self, chave: str) -> FakeSpreadsheet:
+        return self.spreadsheet
@@ -0,0 +1,249 @@
+# ocb/cli.py
+"""
+Avaliação de compras em lote, sem a interface gráfica: pela linha de comando
+ou por uma API HTTP local.
+
+    python cli.py avaliar compras.jsonl > decisoes.jsonl
+    python cli.py avaliar compras.csv --trace
+    python cli.py servir --porta 8765
+
+Cada compra é um objeto JSON (uma por linha) ou uma linha de CSV com
+valor_compra e, opcionalmente, parcelas, categoria, forma_pagamento e id.
+O resultado sai em JSON lines, uma decisão por compra, na ordem da entrada.
+
+API HTTP:
+    POST /avaliar      corpo em JSON lines (ou CSV, com Content-Type: text/csv);
+                       ?trace=1 inclui o trace das regras
+    GET  /saude        saldo e limite do snapshot atual
+    GET  /metrics      métricas no formato do Prometheus (com OCB_METRICAS=1)
+"""
+import argparse
+import contextlib
+import io
+import json
+import logging
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterable, Iterator, Optional
+from urllib.parse import parse_qs, urlparse
+from data.anomaly_detector import AnomalyDetector
+from data.batch_evaluator import LEITORES, TAMANHO_LOTE, BatchEvaluator
+from data.data_loader import DataLoader
+from data.decision_maker import DecisionMaker
+from data.financial_analyzer import FinancialAnalyzer
+from data.instrumentation import metrics
+from data.rule_engine import RuleEngine
+from data.snapshot_cache import SnapshotCache
+from data.spending_rollups import SpendingRollups
+
+# Mesmos padrões do aplicativo (app.py)
+CREDENTIALS_PATH = "credentials.json"
+SPREADSHEET_NAME = "Minha Planilha de Gastos"
+CACHE_PATH = ".ocb_cache.sqlite3"
+
+# Endereço padrão da API: só a máquina local
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+
+class Avaliador:
+    """
+    Loader, regras, agregados e detector de anomalias compartilhados por
+    todas as avaliações do processo. Cada lote usa o snapshot vigente quando
+    começa; os agregados só recalculam o que mudou desde o lote anterior.
+    """
+
+    def __init__(self, args: argparse.Namespace):
+        cache = SnapshotCache(args.cache) if args.cache else None
+        if args.dados:
+            self.data_loader = DataLoader.from_file(args.dados, cache=cache, ttl=args.ttl)
+        else:
+            self.data_loader = DataLoader(args.credenciais, args.planilha,
+                                          cache=cache, ttl=args.ttl)
+        regras = RuleEngine.from_file(args.regras) if os.path.exists(args.regras) else None
+        self.decision_maker = DecisionMaker(regras=regras)
+        self.rollups = SpendingRollups()
+        self.anomalias = AnomalyDetector()
+        self.tamanho_lote = args.lote
+        # Agregados e detector não são atualizados por duas threads ao mesmo tempo
+        self._lock = threading.Lock()
+
+    def evaluator(self) -> BatchEvaluator:
+        """Avaliador de um lote, sobre o snapshot atual da planilha."""
+        with self._lock:
+            analyzer = FinancialAnalyzer(self.data_loader, rollups=self.rollups,
+                                         anomalias=self.anomalias)
+            analyzer.get_rollups()
+            analyzer.get_anomalias()
+            return BatchEvaluator(analyzer, self.decision_maker, self.tamanho_lote)
+
+    def avaliar(self, linhas: Iterable[str], formato: str,
+                trace: bool = False) -> Iterator[str]:
+        """Avalia as compras das linhas de entrada; gera uma linha JSON por compra."""
+        compras = LEITORES[formato](linhas)
+        for resultado in self.evaluator().avaliar(compras, trace=trace):
+            yield json.dumps(resultado, ensure_ascii=False, allow_nan=False) + "\n"
+
+
+def _formato(caminho: Optional[str], formato: Optional[str]) -> str:
+    """Formato informado ou deduzido da extensão do arquivo (padrão: JSON lines)."""
+    if formato:
+        return formato
+    return "csv" if caminho and caminho.lower().endswith(".csv") else "jsonl"
+
+
+def avaliar(args: argparse.Namespace):
+    """Subcomando avaliar: lê as compras de um arquivo (ou da entrada padrão)."""
+    avaliador = Avaliador(args)
+    entrada = open(args.entrada, encoding="utf-8-sig", newline="") \
+        if args.entrada and args.entrada != "-" else sys.stdin
+    saida = open(args.saida, "w", encoding="utf-8") if args.saida else sys.stdout
+    try:
+        # Avisos impressos pelos módulos de dados não se misturam aos resultados
+        with contextlib.redirect_stdout(sys.stderr):
+            for linha in avaliador.avaliar(entrada, _formato(args.entrada, args.formato),
+                                           trace=args.trace):
+                saida.write(linha)
+    finally:
+        if entrada is not sys.stdin:
+            entrada.close()
+        if saida is not sys.stdout:
+            saida.close()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """Rotas da API HTTP local (ver a documentação do módulo)."""
+
+    avaliador: Avaliador = None
+    # Resposta em blocos de 64 KiB, não uma escrita no socket por decisão
+    wbufsize = 64 * 1024
+
+    def _json(self, status: int, corpo):
+        conteudo = json.dumps(corpo, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(conteudo)))
+        self.end_headers()
+        self.wfile.write(conteudo)
+
+    def do_GET(self):
+        rota = urlparse(self.path).path
+        if rota == "/saude":
+            evaluator = self.avaliador.evaluator()
+            self._json(200, {"status": "ok", "saldo_atual": evaluator.saldo_atual,
+                             "limite_credito": evaluator.limite_credito})
+        elif rota == "/metrics":
+            conteudo = metrics.export_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(conteudo)))
+            self.end_headers()
+            self.wfile.write(conteudo)
+        else:
+            self._json(404, {"erro": "Rota não encontrada."})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path != "/avaliar":
+            self._json(404, {"erro": "Rota não encontrada."})
+            return
+        try:
+            tamanho = int(self.headers.get("Content-Length", ""))
+        except ValueError:
+            self._json(411, {"erro": "Content-Length obrigatório."})
+            return
+        consulta = parse_qs(url.query)
+        formato = "csv" if "csv" in self.headers.get("Content-Type", "") else "jsonl"
+        trace = consulta.get("trace", ["0"])[0] in ("1", "true")
+        # O corpo é lido e avaliado em blocos, e cada bloco é respondido assim
+        # que fica pronto: nem a entrada nem a saída ficam inteiras em memória
+        corpo = io.TextIOWrapper(_CorpoLimitado(self.rfile, tamanho), encoding="utf-8-sig",
+                                 newline="")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson; charset=utf-8")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        try:
+            for linha in self.avaliador.avaliar(corpo, formato, trace=trace):
+                self.wfile.write(linha.encode("utf-8"))
+        except Exception as e:
+            logging.error(f"Erro ao avaliar o lote: {e}")
+            self.wfile.write((json.dumps({"erro": str(e)}, ensure_ascii=False) + "\n")
+                             .encode("utf-8"))
+
+    def log_message(self, formato, *args):
+        logging.info(f"{self.address_string()} - {formato % args}")
+
+
+class _CorpoLimitado(io.RawIOBase):
+    """Corpo da requisição: lê no máximo Content-Length bytes do socket."""
+
+    def __init__(self, arquivo, tamanho: int):
+        self.arquivo = arquivo
+        self.restante = tamanho
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        if self.restante <= 0:
+            return 0
+        dados = self.arquivo.read(min(len(buffer), self.restante))
+        self.restante -= len(dados)
+        buffer[:len(dados)] = dados
+        return len(dados)
+
+
+def servir(args: argparse.Namespace):
+    """Subcomando servir: API HTTP local."""
+    _Handler.avaliador = Avaliador(args)
+    # HTTP/1.0: cada resposta termina ao fechar a conexão, o que permite
+    # enviar os resultados à medida que ficam prontos
+    servidor = ThreadingHTTPServer((args.host, args.porta), _Handler)
+    logging.info(f"API de avaliação em http://{args.host}:{args.porta}")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--dados", default=os.environ.get("OCB_DADOS_LOCAIS"),
+                        help="arquivo .xlsx ou diretório de .csv/.parquet no lugar do "
+                             "Google Sheets")
+    parser.add_argument("--credenciais", default=CREDENTIALS_PATH)
+    parser.add_argument("--planilha", default=SPREADSHEET_NAME)
+    parser.add_argument("--regras", default=os.environ.get("OCB_REGRAS", "regras.json"))
+    parser.add_argument("--cache", default=CACHE_PATH,
+                        help="cache de snapshots em disco (vazio para não usar)")
+    parser.add_argument("--ttl", type=float, default=30.0,
+                        help="segundos em que o snapshot é usado sem revalidar a planilha")
+    parser.add_argument("--lote", type=int, default=TAMANHO_LOTE,
+                        help="compras avaliadas juntas em cada chamada às regras")
+    comandos = parser.add_subparsers(dest="comando", required=True)
+
+    comando = comandos.add_parser("avaliar", help="avalia as compras de um arquivo")
+    comando.add_argument("entrada", nargs="?", help="arquivo .jsonl ou .csv (padrão: "
+                                                    "entrada padrão)")
+    comando.add_argument("--formato", choices=sorted(LEITORES))
+    comando.add_argument("--saida", help="arquivo de saída (padrão: saída padrão)")
+    comando.add_argument("--trace", action="store_true",
+                         help="inclui o trace das regras em cada decisão")
+    comando.set_defaults(funcao=avaliar)
+
+    comando = comandos.add_parser("servir", help="inicia a API HTTP local")
+    comando.add_argument("--host", default=DEFAULT_HOST)
+    comando.add_argument("--porta", type=int, default=DEFAULT_PORT)
+    comando.set_defaults(funcao=servir)
+
+    args = parser.parse_args(argv)
+    args.funcao(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,345 @@
+# ocb/data/anomaly_detector.py
+import collections
+import logging
+import math
+import threading
+from typing import Dict, List, NamedTuple, Optional, Sequence
+import numpy as np
+import pandas as pd
+from data.data_loader import DataLoader
+from data.sheet_parser import SheetTable, normalizar_nome
+
+# Peso de cada nova despesa na média móvel exponencial dos valores da
+# categoria (~ as últimas 40 despesas) e de cada mês na média dos totais mensais
+ALFA_VALOR = 0.05
+ALFA_MENSAL = 0.3
+
+# Escore a partir do qual uma despesa é incomum e fator sobre o gasto mensal
+# esperado a partir do qual a categoria está em pico
+LIMIAR_ESCORE = 3.5
+FATOR_PICO = 2.0
+
+# Histórico mínimo da categoria antes de emitir alertas
+MIN_DESPESAS = 5
+MIN_MESES = 3
+
+# Meses sem gasto aplicados de uma vez entre dois lançamentos da categoria
+MAX_MESES_VAZIOS = 24
+
+# Quantidade de despesas incomuns mantidas para consulta
+MAX_ANOMALIAS = 100
+
+# Fator que converte o desvio absoluto médio em desvio padrão (distribuição normal)
+_ESCALA_DESVIO = math.sqrt(math.pi / 2)
+
+
+def _mes_atual() -> int:
+    hoje = pd.Timestamp.today()
+    return hoje.year * 12 + hoje.month - 1
+
+
+class Anomalia(NamedTuple):
+    """Despesa com valor incomum para a sua categoria."""
+    linha: int
+    data: Optional[pd.Timestamp]
+    categoria: str
+    valor: float
+    escore: float
+
+
+class AnomalyDetector:
+    """
+    Detector incremental de despesas incomuns e de picos de gasto por categoria.
+
+    Para cada categoria mantém, em arrays compactos indexados pela categoria,
+    a média móvel exponencial (EWMA) do logaritmo dos valores e o desvio
+    absoluto médio em torno dela, além do total do mês corrente da categoria
+    e a EWMA (com desvio) dos totais dos meses anteriores. Cada nova linha da
+    aba Despesa atualiza esse estado em O(1); a cada atualização só as linhas
+    acrescentadas desde a última são consumidas, sem reprocessar o histórico.
+
+    Uma despesa é incomum quando o seu escore robusto (distância à média em
+    desvios, calculada com o estado anterior à despesa) passa de LIMIAR_ESCORE.
+    Uma categoria está em pico quando o gasto do mês passa de FATOR_PICO vezes
+    o gasto mensal esperado. Lançamentos de meses anteriores ao mês corrente
+    da categoria entram na estatística de valores, mas não nos totais mensais.
+    """
+
+    def __init__(self, alfa: float = ALFA_VALOR, alfa_mensal: float = ALFA_MENSAL,
+                 limiar: float = LIMIAR_ESCORE, min_despesas: int = MIN_DESPESAS,
+                 min_meses: int = MIN_MESES, capacidade: int = 16):
+        """
+        Args:
+            alfa: Peso de cada despesa na EWMA dos valores da categoria.
+            alfa_mensal: Peso de cada mês na EWMA dos totais mensais.
+            limiar: Escore a partir do qual uma despesa é registrada como incomum.
+            min_despesas: Despesas mínimas da categoria antes de calcular escores.
+            min_meses: Meses mínimos da categoria antes de detectar picos.
+            capacidade: Quantidade inicial de categorias (os arrays crescem sob demanda).
+        """
+        self.alfa = alfa
+        self.alfa_mensal = alfa_mensal
+        self.limiar = limiar
+        self.min_despesas = min_despesas
+        self.min_meses = min_meses
+        self._capacidade = capacidade
+        self._lock = threading.Lock()
+        self._reiniciar()
+
+    def _reiniciar(self):
+        """Descarta todo o estado (usado quando o histórico já consumido muda)."""
+        n = self._capacidade
+        self._categorias: Dict[str, int] = {}
+        self._nomes: List[str] = []
+        # Estatística dos valores (log dos centavos)
+        self._contagem = np.zeros(n, dtype=np.int64)
+        self._media = np.zeros(n)
+        self._desvio = np.zeros(n)
+        # Mês corrente da categoria (ano * 12 + mês - 1) e total gasto nele
+        self._mes = np.full(n, -1, dtype=np.int64)
+        self._gasto_mes = np.zeros(n, dtype=np.int64)
+        # Estatística dos totais mensais já fechados (centavos)
+        self._meses_vistos = np.zeros(n, dtype=np.int64)
+        self._media_mensal = np.zeros(n)
+        self._desvio_mensal = np.zeros(n)
+        self._anomalias: collections.deque = collections.deque(maxlen=MAX_ANOMALIAS)
+        self._linhas = 0
+        # Assinatura (sensível à ordem) das linhas já consumidas e a tabela de
+        # onde vieram, para detectar edições no histórico
+        self._assinatura_consumidas = np.uint64(0)
+        self._origem: Optional[SheetTable] = None
+
+    def _indice(self, categoria: str) -> int:
+        """Índice da categoria nos arrays, criando-a (e ampliando os arrays) se preciso."""
+        indice = self._categorias.get(categoria)
+        if indice is not None:
+            return indice
+        indice = len(self._categorias)
+        if indice == self._contagem.size:
+            for nome in ("_contagem", "_media", "_desvio", "_gasto_mes",
+                         "_meses_vistos", "_media_mensal", "_desvio_mensal"):
+                atual = getattr(self, nome)
+                setattr(self, nome, np.concatenate([atual, np.zeros_like(atual)]))
+            self._mes = np.concatenate([self._mes, np.full(self._mes.size, -1, dtype=np.int64)])
+        self._categorias[categoria] = indice
+        self._nomes.append(categoria)
+        return indice
+
+    @staticmethod
+    def _hashes(despesas: SheetTable) -> np.ndarray:
+        """
+        Hash de cada linha combinado com a sua posição (vetorizado): a soma
+        desses hashes muda se uma linha for editada, removida ou trocada de lugar.
+        """
+        linhas = pd.util.hash_pandas_object(despesas.frame, index=False).to_numpy()
+        posicoes = pd.util.hash_array(np.arange(linhas.size, dtype=np.int64))
+        return pd.util.hash_array(linhas ^ posicoes)
+
+    def refresh(self, despesas: SheetTable) -> int:
+        """
+        Consome as linhas da aba Despesa acrescentadas desde a última chamada.
+
+        Se alguma linha já consumida mudou ou trocou de lugar (a assinatura
+        dessas linhas difere da registrada) ou a aba encolheu, o histórico foi
+        editado e o estado é reconstruído a partir do início.
+
+        Conferir o histórico exige um hash vetorizado de todas as linhas, O(N);
+        por isso ele só é feito quando chega uma tabela nova (no DataLoader,
+        um novo snapshot, ou seja, uma nova revisão da planilha). A mesma
+        tabela recebida de novo não custa nada, e o consumo das linhas novas
+        continua O(1) por linha.
+
+        Args:
+            despesas: Aba Despesa convertida.
+
+        Returns:
+            int: Quantidade de linhas consumidas.
+        """
+        with self._lock:
+            if despesas is self._origem:
+                return 0
+            self._origem = despesas
+            hashes = self._hashes(despesas)
+            if self._linhas and (len(despesas) < self._linhas or self._assinatura_consumidas
+                                 != hashes[:self._linhas].sum(dtype=np.uint64)):
+                logging.info("Histórico de despesas alterado: reconstruindo o detector.")
+                self._reiniciar()
+                self._origem = despesas
+            inicio = self._linhas
+            if inicio >= len(despesas) or "Valor da Despesa" not in despesas:
+                return 0
+
+            valores = despesas.centavos("Valor da Despesa")[inicio:].tolist()
+            if "Data da Despesa" in despesas:
+                datas = despesas.column("Data da Despesa").iloc[inicio:]
+                meses = (datas.dt.year * 12 + datas.dt.month - 1) \
+                    .fillna(_mes_atual()).astype(np.int64).tolist()
+            else:
+                datas = None
+                meses = [_mes_atual()] * len(valores)
+            if "Categoria da Despesa" in despesas:
+                codigos, distintas = pd.factorize(
+                    despesas.column("Categoria da Despesa").iloc[inicio:].fillna(""))
+                # Normaliza só as categorias distintas, não cada linha
+                indices = [self._indice(normalizar_nome(c)) for c in distintas]
+                categorias = [indices[c] for c in codigos.tolist()]
+            else:
+                categorias = [self._indice("")] * len(valores)
+
+            # As novas linhas são consumidas em ordem de data, para que os
+            # totais mensais se formem mesmo se a aba não estiver ordenada
+            for deslocamento in np.argsort(meses, kind="stable").tolist():
+                valor, mes, categoria = valores[deslocamento], meses[deslocamento], \
+                    categorias[deslocamento]
+                escore = self._consumir(categoria, valor, mes)
+                if escore > self.limiar:
+                    linha = inicio + deslocamento
+                    self._anomalias.append(Anomalia(
+                        linha=linha,
+                        data=datas.iloc[deslocamento] if datas is not None else None,
+                        categoria=self._nomes[categoria],
+                        valor=valor / 100,
+                        escore=escore,
+                    ))
+
+            self._linhas = len(despesas)
+            self._assinatura_consumidas = hashes.sum(dtype=np.uint64)
+            consumidas = self._linhas - inicio
+            logging.info(f"Detector de anomalias: {consumidas} despesa(s) consumida(s).")
+            return consumidas
+
+    def refresh_from_loader(self, data_loader: DataLoader) -> int:
+        """Consome as novas linhas da aba Despesa do DataLoader (nada se o snapshot é o mesmo)."""
+        return self.refresh(data_loader.load_table("despesa"))
+
+    def _consumir(self, c: int, valor: int, mes: int) -> float:
+        """Atualiza o estado da categoria com uma despesa; retorna o escore dela."""
+        # Totais mensais: ao mudar de mês, fecha o mês anterior (e os meses vazios)
+        if mes > self._mes[c]:
+            if self._mes[c] >= 0:
+                self._fechar_mes(c, float(self._gasto_mes[c]))
+                for _ in range(min(mes - self._mes[c] - 1, MAX_MESES_VAZIOS)):
+                    self._fechar_mes(c, 0.0)
+            self._mes[c] = mes
+            self._gasto_mes[c] = 0
+        if mes == self._mes[c]:
+            self._gasto_mes[c] += valor
+
+        # Valores: escore com o estado anterior, depois a atualização
+        x = math.log1p(max(valor, 0))
+        escore = self._escore(c, x)
+        if self._contagem[c] == 0:
+            self._media[c] = x
+        else:
+            desvio = x - self._media[c]
+            self._media[c] += self.alfa * desvio
+            self._desvio[c] += self.alfa * (abs(desvio) - self._desvio[c])
+        self._contagem[c] += 1
+        return escore
+
+    def _fechar_mes(self, c: int, total: float):
+        if self._meses_vistos[c] == 0:
+            self._media_mensal[c] = total
+        else:
+            desvio = total - self._media_mensal[c]
+            self._media_mensal[c] += self.alfa_mensal * desvio
+            self._desvio_mensal[c] += self.alfa_mensal * (abs(desvio) - self._desvio_mensal[c])
+        self._meses_vistos[c] += 1
+
+    def _escore(self, c: int, x: float) -> float:
+        """Escore robusto de um valor (log) na categoria; NaN sem histórico suficiente."""
+        if self._contagem[c] < self.min_despesas:
+            return float("nan")
+        escala = max(float(self._desvio[c]) * _ESCALA_DESVIO, 1e-6)
+        return (x - float(self._media[c])) / escala
+
+    def escore(self, categoria: str, valor: float) -> float:
+        """
+        Escore de um valor (em reais) em relação às despesas da categoria.
+
+        Returns:
+            float: Desvios acima (positivo) ou abaixo da média; NaN se a
+            categoria não tiver histórico suficiente.
+        """
+        with self._lock:
+            c = self._categorias.get(normalizar_nome(categoria))
+            if c is None:
+                return float("nan")
+            return self._escore(c, math.log1p(max(valor * 100, 0)))
+
+    def razao_pico(self, categoria: str, valor: float = 0.0) -> float:
+        """
+        Gasto do mês corrente na categoria (mais `valor`, em reais) dividido
+        pelo gasto mensal esperado.
+
+        Returns:
+            float: A razão; NaN se a categoria não tiver meses suficientes.
+        """
+        with self._lock:
+            c = self._categorias.get(normalizar_nome(categoria))
+            if c is None or self._meses_vistos[c] < self.min_meses \
+                    or self._media_mensal[c] <= 0:
+                return float("nan")
+            gasto = int(self._gasto_mes[c]) if self._mes[c] == _mes_atual() else 0
+            return (gasto + valor * 100) / float(self._media_mensal[c])
+
+    def picos(self, fator: float = FATOR_PICO) -> Dict[str, float]:
+        """Categorias cujo gasto no mês corrente passa de `fator` vezes o esperado."""
+        with self._lock:
+            categorias = list(self._categorias)
+        razoes = {categoria: self.razao_pico(categoria) for categoria in categorias}
+        return {categoria: razao for categoria, razao in razoes.items() if razao > fator}
+
+    def anomalias(self) -> List[Anomalia]:
+        """Despesas incomuns mais recentes (até MAX_ANOMALIAS), na ordem em que foram consumidas."""
+        with self._lock:
+            return list(self._anomalias)
+
+    def contexto(self, categoria: str, valor: float) -> Dict[str, float]:
+        """
+        Variáveis de anomalia usadas pelas regras de decisão.
+
+        Returns:
+            Dict[str, float]: escore_anomalia (do valor da compra na categoria)
+            e razao_pico_categoria (gasto do mês com a compra / esperado).
+        """
+        return {
+            "escore_anomalia": self.escore(categoria, valor),
+            "razao_pico_categoria": self.razao_pico(categoria, valor),
+        }
+
+    def contexto_lote(self, categorias: Sequence[str],
+                      valores: Sequence[float]) -> Dict[str, np.ndarray]:
+        """
+        Versão vetorizada de contexto para um lote de compras.
+
+        Args:
+            categorias: Categoria de cada compra.
+            valores: Valor (em reais) de cada compra.
+
+        Returns:
+            Dict[str, np.ndarray]: escore_anomalia e razao_pico_categoria de
+            cada compra (NaN onde a categoria não tem histórico suficiente).
+        """
+        valores = np.asarray(valores, dtype=float)
+        codigos, distintas = pd.factorize(pd.Series(categorias, dtype=object).fillna(""))
+        with self._lock:
+            # Normaliza só as categorias distintas, não cada compra
+            indices = np.array([self._categorias.get(normalizar_nome(c), -1)
+                                for c in distintas] + [-1], dtype=np.int64)
+            c = indices[codigos]
+            conhecida = c >= 0
+            c = np.where(conhecida, c, 0)
+            contagem, media, desvio = self._contagem[c], self._media[c], self._desvio[c]
+            mes, gasto_mes = self._mes[c], self._gasto_mes[c]
+            meses_vistos, media_mensal = self._meses_vistos[c], self._media_mensal[c]
+
+        centavos = np.maximum(valores * 100, 0)
+        escala = np.maximum(desvio * _ESCALA_DESVIO, 1e-6)
+        escore = np.where(conhecida & (contagem >= self.min_despesas),
+                          (np.log1p(centavos) - media) / escala, np.nan)
+        gasto = np.where(mes == _mes_atual(), gasto_mes, 0)
+        com_historico = conhecida & (meses_vistos >= self.min_meses) & (media_mensal > 0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            razao = np.where(com_historico, (gasto + valores * 100) / media_mensal, np.nan)
+        return {"escore_anomalia": escore, "razao_pico_categoria": razao}
@@ -0,0 +1,85 @@
+# ocb/data/async_loader.py
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+from data.data_loader import DataLoader
+from data.sheet_parser import SheetTable
+
+# Número máximo de leituras simultâneas da planilha no processo
+MAX_IO_WORKERS = 8
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_io_executor() -> ThreadPoolExecutor:
+    """Retorna o pool de threads de E/S compartilhado pelo processo."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=MAX_IO_WORKERS,
+                                           thread_name_prefix="ocb-io")
+        return _executor
+
+
+class AsyncDataLoader:
+    """
+    Fachada assíncrona do DataLoader.
+
+    As chamadas bloqueantes ao Google Sheets são executadas no pool de threads
+    de E/S, liberando o loop de eventos para atender outras sessões enquanto a
+    rede responde.
+    """
+
+    def __init__(self, data_loader: DataLoader,
+                 executor: Optional[ThreadPoolExecutor] = None):
+        """
+        Inicializa a fachada assíncrona.
+
+        Args:
+            data_loader: DataLoader síncrono a ser utilizado.
+            executor: Pool de threads; se None, usa o pool compartilhado.
+        """
+        self.data_loader = data_loader
+        self.executor = executor
+
+    @classmethod
+    async def create(cls, *args, **kwargs) -> "AsyncDataLoader":
+        """Cria o DataLoader (autenticação incluída) sem bloquear o loop."""
+        data_loader = await cls._run(None, DataLoader, *args, **kwargs)
+        return cls(data_loader)
+
+    @staticmethod
+    async def _run(executor, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            executor or get_io_executor(), lambda: func(*args, **kwargs))
+
+    async def run(self, func, *args, **kwargs):
+        """Executa uma função bloqueante (ex.: um recálculo) no pool de E/S."""
+        return await self._run(self.executor, func, *args, **kwargs)
+
+    async def load_data(self, worksheet_name) -> List[List[str]]:
+        """Versão assíncrona de DataLoader.load_data."""
+        return await self._run(self.executor, self.data_loader.load_data,
+                               worksheet_name)
+
+    async def load_many(self, worksheet_names: List[str]) -> Dict[str, List[List[str]]]:
+        """Versão assíncrona de DataLoader.load_many."""
+        return await self._run(self.executor, self.data_loader.load_many,
+                               worksheet_names)
+
+    async def load_all(self) -> Dict[str, List[List[str]]]:
+        """Versão assíncrona de DataLoader.load_all."""
+        return await self._run(self.executor, self.data_loader.load_all)
+
+    async def load_table(self, worksheet_name) -> SheetTable:
+        """Versão assíncrona de DataLoader.load_table."""
+        return await self._run(self.executor, self.data_loader.load_table,
+                               worksheet_name)
+
+    async def refresh(self, worksheet_names: Optional[List[str]] = None) -> List[str]:
+        """Versão assíncrona de DataLoader.refresh."""
+        return await self._run(self.executor, self.data_loader.refresh,
+                               worksheet_names)
@@ -0,0 +1,380 @@
+# ocb/data/backends.py
+import csv
+import datetime
+import logging
+import os
+import zlib
+from typing import Dict, List, Optional
+import pandas as pd
+from data.sheet_parser import DATA, MOEDA, SCHEMAS, normalizar_nome, parse_brl, parse_datas
+
+# Dia zero das datas seriais do Google Sheets
+_EPOCA_PLANILHA = datetime.datetime(1899, 12, 30)
+
+# Layout de lançamentos (o de templates/Meus Gastos OCB.xlsx): uma única aba
+# com estas colunas, em que o Tipo separa receitas de despesas. Sem as abas
+# receita e despesa, ela é desmembrada nas abas resumo, receita e despesa.
+COLUNAS_LANCAMENTOS = ("data", "descricao", "valor", "categoria", "tipo")
+ABAS_LANCAMENTOS = ("resumo", "receita", "despesa")
+
+# Valores do Tipo (sem acentos nem maiúsculas) que indicam uma receita;
+# qualquer outro valor é despesa
+TIPOS_RECEITA = {"receita", "entrada", "credito", "renda", "ganho"}
+
+
+class GoogleSheetsBackend:
+    """Origem dos dados: uma planilha do Google Sheets aberta com gspread."""
+
+    def __init__(self, spreadsheet):
+        """
+        Args:
+            spreadsheet: Planilha aberta (gspread.Spreadsheet ou compatível).
+        """
+        self.spreadsheet = spreadsheet
+
+    def revision(self) -> Optional[str]:
+        """Retorna o horário da última modificação da planilha (consulta de metadados)."""
+        if hasattr(self.spreadsheet, "get_lastUpdateTime"):
+            return self.spreadsheet.get_lastUpdateTime()
+        return getattr(self.spreadsheet, "lastUpdateTime", None)
+
+    def worksheets(self) -> Dict[str, object]:
+        """Retorna as abas da planilha indexadas pelo título."""
+        return {worksheet.title: worksheet
+                for worksheet in self.spreadsheet.worksheets()}
+
+    def fetch_many(self, worksheet_names: List[str]) -> Dict[str, List[List[str]]]:
+        """
+        Baixa várias abas em uma única requisição (values:batchGet).
+
+        Args:
+            worksheet_names: Nomes das abas existentes na planilha.
+
+        Returns:
+            Dict[str, List[List[str]]]: Valores de cada aba, no mesmo formato
+            retornado por get_all_values().
+        """
+        ranges = ["'{}'".format(nome.replace("'", "''"))
+                  for nome in worksheet_names]
+        resposta = self.spreadsheet.values_batch_get(ranges)
+        resultado = {}
+        for nome, value_range in zip(worksheet_names,
+                                     resposta.get("valueRanges", [])):
+            linhas = value_range.get("values", [])
+            # A API omite células vazias no fim das linhas; completa para
+            # manter o formato retangular de get_all_values()
+            largura = max((len(linha) for linha in linhas), default=0)
+            resultado[nome] = [linha + [""] * (largura - len(linha))
+                               for linha in linhas]
+        return resultado
+
+    def append_rows(self, linhas: Dict[str, List[List[str]]],
+                    cabecalhos: Dict[str, List[str]]):
+        """
+        Acrescenta linhas ao fim de várias abas em uma única requisição
+        (spreadsheets:batchUpdate), criando as abas que ainda não existem.
+
+        Valores monetários e datas das colunas conhecidas (SCHEMAS) são
+        gravados como números formatados, para que somas e filtros da
+        planilha continuem funcionando; os demais, como texto.
+
+        Args:
+            linhas: Linhas (textos, na ordem do cabeçalho) de cada aba.
+            cabecalhos: Cabeçalho de cada aba, usado nas colunas e nas abas novas.
+        """
+        ids = {worksheet.title: worksheet.id for worksheet in self.spreadsheet.worksheets()}
+        requisicoes = []
+        for aba, novas in linhas.items():
+            cabecalho = cabecalhos[aba]
+            if aba not in ids:
+                # ID escolhido aqui para que o appendCells possa referenciar a aba
+                # nova na mesma requisição; não pode repetir o de outra aba
+                id_aba = zlib.crc32(aba.encode("utf-8")) & 0x3FFFFFFF
+                while id_aba in ids.values():
+                    id_aba = (id_aba + 1) & 0x3FFFFFFF
+                ids[aba] = id_aba
+                requisicoes.append({"addSheet": {"properties": {
+                    "title": aba, "sheetId": ids[aba]}}})
+                novas = [cabecalho] + novas
+            tipos = {coluna.nome: coluna.tipo for coluna in SCHEMAS.get(aba, ())}
+            tipos_linha = [tipos.get(nome) for nome in cabecalho]
+            requisicoes.append({"appendCells": {
+                "sheetId": ids[aba],
+                "rows": [{"values": [_celula(valor, tipo)
+                                     for valor, tipo in zip(linha, tipos_linha)]}
+                         for linha in novas],
+                "fields": "userEnteredValue,userEnteredFormat.numberFormat",
+            }})
+        self.spreadsheet.batch_update({"requests": requisicoes})
+
+
+def _celula(texto: str, tipo: Optional[str]) -> Dict:
+    """Converte o texto de uma célula no CellData da API do Sheets."""
+    if tipo == MOEDA:
+        centavos = parse_brl([texto])[0]
+        if not pd.isna(centavos):
+            return {"userEnteredValue": {"numberValue": int(centavos) / 100},
+                    "userEnteredFormat": {"numberFormat": {
+                        "type": "CURRENCY", "pattern": '"R$" #,##0.00'}}}
+    elif tipo == DATA:
+        data = parse_datas([texto])[0]
+        if not pd.isna(data):
+            serial = (data.to_pydatetime() - _EPOCA_PLANILHA).days
+            return {"userEnteredValue": {"numberValue": serial},
+                    "userEnteredFormat": {"numberFormat": {
+                        "type": "DATE", "pattern": "dd/mm/yyyy"}}}
+    return {"userEnteredValue": {"stringValue": texto}}
+
+
+def formatar_celula(valor) -> str:
+    """
+    Converte o valor de uma célula local no texto que o Google Sheets exibiria
+    (datas dd/mm/aaaa e vírgula decimal).
+    """
+    if valor is None:
+        return ""
+    if isinstance(valor, (datetime.datetime, datetime.date)):
+        return valor.strftime("%d/%m/%Y")
+    if isinstance(valor, bool):
+        return "TRUE" if valor else "FALSE"
+    if isinstance(valor, float):
+        if valor != valor:  # NaN
+            return ""
+        if valor.is_integer():
+            return str(int(valor))
+        return repr(valor).replace(".", ",")
+    return str(valor)
+
+
+def desmembrar_lancamentos(linhas: List[List[str]]) -> Dict[str, List[List[str]]]:
+    """
+    Converte uma aba no layout de lançamentos nas abas resumo, receita e despesa.
+
+    Receita e despesa mantêm as colunas da aba, exceto o Tipo (os nomes
+    Data, Descrição, Valor e Categoria são aliases do schema de cada aba).
+    O resumo tem só o Saldo Restante: receitas menos despesas.
+
+    Args:
+        linhas: Valores da aba, com o cabeçalho na primeira linha.
+
+    Returns:
+        Dict[str, List[List[str]]]: Valores de cada aba derivada.
+    """
+    nomes = [normalizar_nome(titulo) for titulo in linhas[0]]
+    tipo, valor = nomes.index("tipo"), nomes.index("valor")
+    colunas = [i for i in range(len(nomes)) if i != tipo]
+    abas = {"receita": [[linhas[0][i] for i in colunas]]}
+    abas["despesa"] = [list(abas["receita"][0])]
+    for linha in linhas[1:]:
+        if not any(linha):
+            continue
+        aba = "receita" if normalizar_nome(linha[tipo]) in TIPOS_RECEITA else "despesa"
+        abas[aba].append([linha[i] for i in colunas])
+
+    totais = {aba: int(parse_brl([linha[colunas.index(valor)] for linha in abas[aba][1:]])
+                       .sum()) for aba in ("receita", "despesa")}
+    saldo = totais["receita"] - totais["despesa"]
+    sinal = "-" if saldo < 0 else ""
+    abas["resumo"] = [["Saldo Restante"], [f"{sinal}{abs(saldo) // 100},{abs(saldo) % 100:02d}"]]
+    return abas
+
+
+def _retangular(linhas: List[List[str]]) -> List[List[str]]:
+    """Remove linhas vazias finais e completa as linhas até a mesma largura."""
+    while linhas and not any(linhas[-1]):
+        linhas.pop()
+    largura = max((len(linha) for linha in linhas), default=0)
+    for linha in linhas:
+        linha.extend([""] * (largura - len(linha)))
+    return linhas
+
+
+class FileBackend:
+    """
+    Origem dos dados: arquivos locais com o mesmo layout da planilha.
+
+    Aceita uma pasta de trabalho .xlsx (uma aba por planilha) ou um diretório
+    com um arquivo .csv ou .parquet por aba (ex.: resumo.csv, despesa.parquet).
+    Os arquivos são lidos em modo somente leitura e linha a linha.
+
+    Se não houver abas receita e despesa, mas houver uma aba no layout de
+    lançamentos (COLUNAS_LANCAMENTOS, como a do template), as abas resumo,
+    receita e despesa são derivadas dela (ver desmembrar_lancamentos).
+    """
+
+    EXTENSOES_TABELA = (".csv", ".parquet")
+
+    def __init__(self, caminho: str):
+        """
+        Args:
+            caminho: Arquivo .xlsx ou diretório com arquivos .csv/.parquet.
+        """
+        if not os.path.exists(caminho):
+            raise FileNotFoundError(f"Arquivo de dados '{caminho}' não encontrado.")
+        self.caminho = caminho
+
+    def _arquivos(self) -> Dict[str, str]:
+        """Arquivos de cada aba, quando o caminho é um diretório."""
+        arquivos = {}
+        for nome in sorted(os.listdir(self.caminho)):
+            base, extensao = os.path.splitext(nome)
+            if extensao.lower() in self.EXTENSOES_TABELA:
+                arquivos.setdefault(base, os.path.join(self.caminho, nome))
+        return arquivos
+
+    def revision(self) -> Optional[str]:
+        """Revisão baseada na data de modificação e no tamanho dos arquivos."""
+        caminhos = list(self._arquivos().values()) if os.path.isdir(self.caminho) \
+            else [self.caminho]
+        estados = [os.stat(c) for c in caminhos]
+        modificado = max((e.st_mtime_ns for e in estados), default=0)
+        tamanho = sum(e.st_size for e in estados)
+        return f"{modificado}-{tamanho}-{len(estados)}"
+
+    def worksheets(self) -> Dict[str, object]:
+        """Retorna as abas disponíveis (nome -> caminho ou planilha do xlsx)."""
+        abas = self._abas()
+        lancamentos = self._aba_lancamentos(abas)
+        if lancamentos is not None:
+            abas.update(dict.fromkeys(ABAS_LANCAMENTOS, abas[lancamentos]))
+        return abas
+
+    def _abas(self) -> Dict[str, str]:
+        """Abas existentes nos arquivos (nome -> caminho)."""
+        if os.path.isdir(self.caminho):
+            return self._arquivos()
+        workbook = self._abrir_xlsx()
+        try:
+            return {nome: self.caminho for nome in workbook.sheetnames}
+        finally:
+            workbook.close()
+
+    def _aba_lancamentos(self, abas: Dict[str, str]) -> Optional[str]:
+        """Aba no layout de lançamentos, se não houver as abas receita e despesa."""
+        if "receita" in abas or "despesa" in abas:
+            return None
+        for nome in abas:
+            cabecalho = {normalizar_nome(titulo) for titulo in self._cabecalho(nome, abas)}
+            if cabecalho.issuperset(COLUNAS_LANCAMENTOS):
+                return nome
+        return None
+
+    def _cabecalho(self, nome: str, abas: Dict[str, str]) -> List[str]:
+        """Primeira linha de uma aba, sem ler o restante."""
+        caminho = abas[nome]
+        if caminho.lower().endswith(".csv"):
+            with open(caminho, newline="", encoding="utf-8-sig") as arquivo:
+                return next(csv.reader(arquivo, self._dialeto(arquivo)), [])
+        if caminho.lower().endswith(".parquet"):
+            import pyarrow.parquet as pq
+            return list(pq.read_schema(caminho).names)
+        workbook = self._abrir_xlsx()
+        try:
+            linha = next(workbook[nome].iter_rows(max_row=1, values_only=True), ())
+            return [formatar_celula(valor) for valor in linha]
+        finally:
+            workbook.close()
+
+    def _abrir_xlsx(self):
+        from openpyxl import load_workbook
+        return load_workbook(self.caminho, read_only=True, data_only=True)
+
+    def fetch_many(self, worksheet_names: List[str]) -> Dict[str, List[List[str]]]:
+        """
+        Lê várias abas dos arquivos locais.
+
+        Args:
+            worksheet_names: Nomes das abas existentes.
+
+        Returns:
+            Dict[str, List[List[str]]]: Valores de cada aba, no formato de get_all_values().
+        """
+        abas = self._abas()
+        lancamentos = self._aba_lancamentos(abas)
+        derivadas = [nome for nome in worksheet_names
+                     if lancamentos is not None and nome in ABAS_LANCAMENTOS]
+        if not derivadas:
+            return self._ler_abas(worksheet_names)
+        resultado = self._ler_abas([nome for nome in worksheet_names
+                                    if nome not in derivadas] + [lancamentos])
+        desmembradas = desmembrar_lancamentos(resultado.pop(lancamentos)) \
+            if resultado.get(lancamentos) else {}
+        for nome in derivadas:
+            resultado[nome] = desmembradas.get(nome, [])
+        return resultado
+
+    def _ler_abas(self, worksheet_names: List[str]) -> Dict[str, List[List[str]]]:
+        """Lê as abas como estão nos arquivos."""
+        if os.path.isdir(self.caminho):
+            arquivos = self._arquivos()
+            return {nome: self._ler_tabela(arquivos[nome]) for nome in worksheet_names}
+
+        workbook = self._abrir_xlsx()
+        try:
+            resultado = {}
+            for nome in worksheet_names:
+                resultado[nome] = _retangular([
+                    [formatar_celula(valor) for valor in linha]
+                    for linha in workbook[nome].iter_rows(values_only=True)
+                ])
+            return resultado
+        finally:
+            workbook.close()
+
+    def append_rows(self, linhas: Dict[str, List[List[str]]],
+                    cabecalhos: Dict[str, List[str]]):
+        """
+        Acrescenta linhas aos arquivos .csv de cada aba (criando os que não
+        existem). Pastas de trabalho .xlsx, arquivos .parquet e as abas
+        derivadas do layout de lançamentos são somente leitura.
+        """
+        if not os.path.isdir(self.caminho):
+            raise NotImplementedError("Gravação suportada apenas em diretórios de arquivos .csv.")
+        arquivos = self._arquivos()
+        if self._aba_lancamentos(arquivos) is not None \
+                and any(aba in ABAS_LANCAMENTOS for aba in linhas):
+            raise NotImplementedError("Gravação não suportada no layout de lançamentos.")
+        for aba, novas in linhas.items():
+            caminho = arquivos.get(aba, os.path.join(self.caminho, f"{aba}.csv"))
+            if not caminho.lower().endswith(".csv"):
+                raise NotImplementedError(f"A aba '{aba}' não é um arquivo .csv.")
+            existe = os.path.exists(caminho)
+            dialeto = csv.excel
+            if existe:
+                with open(caminho, newline="", encoding="utf-8-sig") as arquivo:
+                    dialeto = self._dialeto(arquivo)
+            with open(caminho, "a", newline="", encoding="utf-8") as arquivo:
+                escritor = csv.writer(arquivo, dialeto)
+                if not existe:
+                    escritor.writerow(cabecalhos[aba])
+                escritor.writerows(novas)
+
+    @staticmethod
+    def _dialeto(arquivo):
+        """Separador do .csv (vírgula, ponto e vírgula ou tabulação), pelo início do arquivo."""
+        amostra = arquivo.read(4096)
+        arquivo.seek(0)
+        try:
+            return csv.Sniffer().sniff(amostra, delimiters=",;\t")
+        except csv.Error:
+            return csv.excel
+
+    @staticmethod
+    def _ler_tabela(caminho: str) -> List[List[str]]:
+        """Lê um arquivo .csv ou .parquet, com o cabeçalho na primeira linha."""
+        if caminho.lower().endswith(".csv"):
+            with open(caminho, newline="", encoding="utf-8-sig") as arquivo:
+                return _retangular([linha for linha in csv.reader(arquivo,
+                                                                  FileBackend._dialeto(arquivo))])
+
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            logging.error("Leitura de arquivos .parquet requer o pacote 'pyarrow'.")
+            raise
+        arquivo = pq.ParquetFile(caminho)
+        linhas = [list(arquivo.schema_arrow.names)]
+        for lote in arquivo.iter_batches():
+            colunas = [coluna.to_pylist() for coluna in lote.columns]
+            linhas.extend([formatar_celula(v) for v in linha] for linha in zip(*colunas))
+        return _retangular(linhas)
@@ -0,0 +1,210 @@
+# ocb/data/batch_evaluator.py
+import csv
+import functools
+import itertools
+import json
+import logging
+from typing import Dict, Iterable, Iterator, List, Mapping, Optional, Tuple
+import numpy as np
+import pandas as pd
+from data.decision_maker import DecisionMaker
+from data.financial_analyzer import FinancialAnalyzer
+from data.instrumentation import metrics
+from data.sheet_parser import normalizar_nome, parse_brl
+
+# Compras avaliadas juntas em cada chamada vetorizada às regras
+TAMANHO_LOTE = 1000
+
+# Nomes aceitos para cada campo da compra (comparados sem acentos nem maiúsculas)
+CAMPOS = {
+    "valor_compra": ("valor compra", "valor da compra", "valor"),
+    "parcelas": ("parcelas",),
+    "categoria": ("categoria", "categoria da despesa"),
+    "forma_pagamento": ("forma pagamento", "forma de pagamento", "pagamento"),
+    "id": ("id",),
+}
+
+# Chave com o erro de leitura de uma linha da entrada
+_ERRO = "_erro"
+
+
+def ler_jsonl(linhas: Iterable[str]) -> Iterator[Dict]:
+    """Lê compras em JSON lines (um objeto por linha), sob demanda."""
+    for linha in linhas:
+        if not linha.strip():
+            continue
+        try:
+            registro = json.loads(linha)
+        except ValueError as e:
+            yield {_ERRO: f"JSON inválido: {e}"}
+            continue
+        yield registro if isinstance(registro, dict) else {_ERRO: "A linha não é um objeto JSON."}
+
+
+def ler_csv(linhas: Iterable[str]) -> Iterator[Dict]:
+    """Lê compras em CSV (vírgula ou ponto e vírgula), com o cabeçalho na primeira linha."""
+    linhas = iter(linhas)
+    cabecalho = next(linhas, "")
+    delimitador = ";" if cabecalho.count(";") > cabecalho.count(",") else ","
+    yield from csv.DictReader(itertools.chain([cabecalho], linhas), delimiter=delimitador)
+
+
+LEITORES = {"jsonl": ler_jsonl, "csv": ler_csv}
+
+
+@functools.lru_cache(maxsize=256)
+def _campo(chave: str) -> Tuple[Optional[str], int]:
+    """Campo canônico de uma chave da entrada e a prioridade do nome usado."""
+    nome = normalizar_nome(chave)
+    for campo, aliases in CAMPOS.items():
+        if nome in aliases:
+            return campo, aliases.index(nome)
+    return None, 0
+
+
+def _campos(registro: Mapping) -> Dict:
+    """Valores do registro pelos nomes canônicos de CAMPOS."""
+    # As chaves se repetem em todas as linhas: _campo normaliza cada uma uma única vez
+    campos = dict.fromkeys(CAMPOS)
+    prioridades = {}
+    for chave, valor in registro.items():
+        if chave is None or valor is None or valor == "":
+            continue
+        campo, prioridade = _campo(chave)
+        if campo is not None and prioridade < prioridades.get(campo, len(CAMPOS[campo])):
+            campos[campo] = valor
+            prioridades[campo] = prioridade
+    return campos
+
+
+def _json_estrito(registro: Dict) -> Dict:
+    """Troca valores não finitos (NaN de regras não aplicáveis) por None: JSON estrito."""
+    return {chave: None if isinstance(valor, float) and not np.isfinite(valor) else valor
+            for chave, valor in registro.items()}
+
+
+class BatchEvaluator:
+    """
+    Avaliação de compras em lote, sem interface gráfica.
+
+    O saldo, o limite, os agregados por categoria e o detector de anomalias
+    são lidos uma única vez, do snapshot já carregado pelo FinancialAnalyzer,
+    e valem para todo o lote. As compras são consumidas sob demanda, em
+    blocos de tamanho_lote avaliados com uma única chamada vetorizada ao
+    motor de regras, e os resultados são devolvidos à medida que cada bloco
+    fica pronto; a entrada pode ter qualquer tamanho.
+    """
+
+    def __init__(self, analyzer: FinancialAnalyzer, decision_maker: DecisionMaker,
+                 tamanho_lote: int = TAMANHO_LOTE):
+        """
+        Args:
+            analyzer: Analisador com o snapshot usado em todo o lote.
+            decision_maker: Decisão de compra (regras configuradas).
+            tamanho_lote: Compras avaliadas em cada chamada às regras.
+        """
+        self.analyzer = analyzer
+        self.decision_maker = decision_maker
+        self.tamanho_lote = tamanho_lote
+        self.saldo_atual = analyzer.get_current_balance()
+        self.limite_credito = analyzer.get_available_credit()
+
+    def avaliar(self, compras: Iterable[Mapping], trace: bool = False) -> Iterator[Dict]:
+        """
+        Avalia as compras, na ordem da entrada.
+
+        Args:
+            compras: Registros com valor_compra (ou valor) e, opcionalmente,
+                parcelas (padrão 1), categoria, forma_pagamento e id.
+            trace: Se True, cada resultado inclui o trace das regras.
+
+        Yields:
+            Dict: Por compra: linha (posição na entrada, a partir de 1), id
+            (se informado), os campos da compra, aprovada, sugestao e
+            justificativa; ou linha e erro, se o registro for inválido.
+        """
+        registros = enumerate(compras, start=1)
+        while True:
+            lote = list(itertools.islice(registros, self.tamanho_lote))
+            if not lote:
+                return
+            yield from self._avaliar_lote(lote, trace)
+
+    def _avaliar_lote(self, lote: List, trace: bool) -> List[Dict]:
+        with metrics.span("lote", compras=len(lote)):
+            resultados: List[Optional[Dict]] = [None] * len(lote)
+            validas, campos_validos = [], []
+            for i, (linha, registro) in enumerate(lote):
+                if _ERRO in registro:
+                    resultados[i] = {"linha": linha, "erro": registro[_ERRO]}
+                    continue
+                campos = _campos(registro)
+                if campos["valor_compra"] is None:
+                    resultados[i] = {"linha": linha, "erro": "Compra sem valor."}
+                    continue
+                validas.append(i)
+                campos_validos.append(campos)
+
+            if campos_validos:
+                compras = pd.DataFrame(campos_validos)
+                valores = self._valores(compras["valor_compra"])
+                # Sem o campo, a compra é à vista; um valor que não é número é inválido
+                ausentes = compras["parcelas"].isna().to_numpy()
+                booleanos = compras["parcelas"].map(lambda v: isinstance(v, bool)).to_numpy(bool)
+                parcelas = np.where(ausentes, 1, pd.to_numeric(
+                    compras["parcelas"].where(~booleanos), errors="coerce").to_numpy(dtype=float))
+                # Infinitos (ex.: 1e400 no JSON) são inválidos como os textos ilegíveis
+                valor_invalido = ~(np.isfinite(valores) & (valores > 0))
+                parcelas_invalidas = ~(np.isfinite(parcelas) & (parcelas >= 1)) \
+                    | (parcelas != np.floor(parcelas))
+                invalida = valor_invalido | parcelas_invalidas
+                categorias = compras["categoria"].fillna("").astype(str).to_numpy()
+                formas = compras["forma_pagamento"].fillna("").astype(str).to_numpy()
+                avaliacao = self.decision_maker.avaliar_compras({
+                    "valor_compra": valores,
+                    "parcelas": np.where(invalida, 1, parcelas),
+                    "saldo_atual": self.saldo_atual,
+                    "limite_credito": self.limite_credito,
+                    "forma_pagamento": formas,
+                    **self.analyzer.contexto_categorias(categorias, valores),
+                })
+                for j, i in enumerate(validas):
+                    linha = lote[i][0]
+                    if invalida[j]:
+                        resultados[i] = {"linha": linha, "erro": "Valor da compra inválido."
+                                         if valor_invalido[j] else "Número de parcelas inválido."}
+                        continue
+                    aprovada = bool(avaliacao.aprovada[j])
+                    resultado = {"linha": linha}
+                    if campos_validos[j]["id"] is not None:
+                        resultado["id"] = campos_validos[j]["id"]
+                    resultado.update({
+                        "valor_compra": float(valores[j]),
+                        "parcelas": int(parcelas[j]),
+                        "categoria": categorias[j],
+                        "forma_pagamento": formas[j],
+                        "aprovada": aprovada,
+                        "sugestao": "Compra aprovada!" if aprovada else "Compra negada!",
+                        "justificativa": avaliacao.justificativa(j),
+                    })
+                    if trace:
+                        resultado["trace"] = [_json_estrito(regra) for regra in avaliacao.trace(j)]
+                    resultados[i] = resultado
+
+        metrics.count("ocb_avaliacoes_total", len(lote))
+        erros = sum("erro" in r for r in resultados)
+        if erros:
+            logging.warning(f"{erros} compra(s) inválida(s) no lote.")
+        return resultados
+
+    @staticmethod
+    def _valores(coluna: pd.Series) -> np.ndarray:
+        """Valores em reais: números como estão, textos no formato da planilha."""
+        textos = coluna.map(lambda v: isinstance(v, str)).to_numpy(dtype=bool)
+        booleanos = coluna.map(lambda v: isinstance(v, bool)).to_numpy(dtype=bool)
+        valores = np.array(pd.to_numeric(coluna.where(~(textos | booleanos)), errors="coerce"),
+                           dtype=float)
+        if textos.any():
+            centavos = parse_brl(coluna[textos].tolist())
+            valores[textos] = np.array(pd.to_numeric(centavos, errors="coerce"), dtype=float) / 100
+        return valores
@@ -0,0 +1,303 @@
+# ocb/data/cash_flow.py
+import logging
+import re
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+from data.data_loader import DataLoader
+from data.sheet_parser import SheetTable, normalizar_nome
+
+# Horizonte padrão da projeção, em meses
+HORIZONTE_PADRAO = 24
+
+# Valores da coluna "Recorrente" interpretados como verdadeiro
+VALORES_RECORRENTES = {"sim", "s", "x", "true", "1", "mensal", "fixa", "fixo"}
+
+_PADRAO_PARCELA = re.compile(r"^\s*(\d+)\s*(?:/|de)\s*(\d+)\s*$")
+
+
+def indice_mes(datas: pd.Series) -> np.ndarray:
+    """Converte datas em um índice absoluto de meses (ano * 12 + mês - 1)."""
+    return (datas.dt.year * 12 + datas.dt.month - 1).to_numpy(dtype=float)
+
+
+def parse_parcelas(valores: pd.Series) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Interpreta a coluna de parcelas das despesas.
+
+    Aceita "3/10" ou "3 de 10" (parcela atual 3 de um total de 10) e "10"
+    (10 parcelas, sendo a da data da despesa a primeira).
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: Parcela atual e total de parcelas de
+        cada linha; linhas sem parcelamento têm total 0.
+    """
+    # Os textos se repetem muito ("1/10", "2/10"...): interpreta só os distintos
+    codigos, textos = pd.factorize(valores.astype("string").fillna(""))
+    textos = pd.Series(textos, dtype="string")
+    partes = textos.str.extract(_PADRAO_PARCELA)
+    atual = pd.to_numeric(partes[0], errors="coerce")
+    total = pd.to_numeric(partes[1], errors="coerce")
+    somente_total = pd.to_numeric(textos.str.strip(), errors="coerce")
+    so_total = atual.isna() & somente_total.notna()
+    atual = atual.mask(so_total, 1)
+    total = total.mask(so_total, somente_total)
+    atual = atual.fillna(0).to_numpy(dtype=np.int64)
+    total = total.fillna(0).to_numpy(dtype=np.int64)
+    total = np.where(total > 1, total, 0)
+    return np.minimum(atual, total)[codigos], total[codigos]
+
+
+def expandir_parcelas(inicio: np.ndarray, quantidade: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Expande linhas parceladas em uma entrada por parcela, sem laços em Python.
+
+    Args:
+        inicio: Mês (índice relativo) da primeira parcela restante de cada linha.
+        quantidade: Número de parcelas restantes de cada linha.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: Linha de origem e mês de cada parcela.
+    """
+    quantidade = np.maximum(quantidade, 0)
+    linhas = np.repeat(np.arange(quantidade.size), quantidade)
+    deslocamento = np.arange(linhas.size) - np.repeat(
+        np.cumsum(quantidade) - quantidade, quantidade)
+    return linhas, np.repeat(inicio, quantidade) + deslocamento
+
+
+class CashFlowProjection:
+    """
+    Projeção mês a mês do saldo a partir das abas Receita e Despesa.
+
+    Receitas e despesas recorrentes, lançamentos futuros e parcelas de
+    dívidas são expandidos uma única vez em arrays compactos (centavos, int64)
+    indexados pelo mês. O mês 0 é o mês corrente, cujo saldo é o saldo
+    restante informado; os fluxos passam a valer a partir do mês 1.
+    """
+
+    def __init__(self, receitas: SheetTable, despesas: SheetTable,
+                 saldo_inicial: float, mes_inicial: Optional[pd.Period] = None,
+                 horizonte_meses: int = HORIZONTE_PADRAO):
+        """
+        Monta a linha do tempo de saldos.
+
+        Args:
+            receitas: Aba Receita convertida.
+            despesas: Aba Despesa convertida.
+            saldo_inicial: Saldo restante no mês corrente, em reais.
+            mes_inicial: Mês corrente; se None, usa o mês atual.
+            horizonte_meses: Quantidade de meses projetados.
+        """
+        if horizonte_meses <= 0:
+            raise ValueError("O horizonte da projeção deve ser positivo.")
+        self.mes_inicial = mes_inicial or pd.Timestamp.today().to_period("M")
+        self.horizonte = horizonte_meses
+        self._base = self.mes_inicial.year * 12 + self.mes_inicial.month - 1
+
+        self.receitas = self._fluxo_mensal(receitas, "Valor da Receita",
+                                           "Data da Receita")
+        self.despesas = self._fluxo_mensal(despesas, "Valor da Despesa",
+                                           "Data da Despesa")
+        self._parcelas = self._expandir_dividas(despesas)
+        if self._parcelas is not None:
+            meses, valores = self._parcelas["mes"], self._parcelas["valor"]
+            visiveis = (meses >= 0) & (meses < self.horizonte)
+            self.despesas += np.bincount(meses[visiveis], weights=valores[visiveis],
+                                         minlength=self.horizonte).astype(np.int64)
+
+        liquido = self.receitas - self.despesas
+        liquido[0] = 0
+        self.saldo = int(round(saldo_inicial * 100)) + np.cumsum(liquido)
+
+    @classmethod
+    def from_loader(cls, data_loader: DataLoader, saldo_inicial: float,
+                    **kwargs) -> "CashFlowProjection":
+        """Cria a projeção carregando as abas Receita e Despesa em uma única requisição."""
+        data_loader.load_many(["receita", "despesa"])
+        return cls(data_loader.load_table("receita"),
+                   data_loader.load_table("despesa"), saldo_inicial, **kwargs)
+
+    def _meses_relativos(self, tabela: SheetTable,
+                         coluna_data: str) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Mês de cada linha relativo ao mês inicial e a máscara das linhas com
+        data válida. Sem a coluna de data, todas as linhas valem no mês 0.
+        """
+        if coluna_data not in tabela:
+            return np.zeros(len(tabela), dtype=np.int64), np.ones(len(tabela), dtype=bool)
+        meses = indice_mes(tabela.column(coluna_data)) - self._base
+        validas = ~np.isnan(meses)
+        return np.where(validas, meses, 0).astype(np.int64), validas
+
+    @staticmethod
+    def _recorrentes(tabela: SheetTable) -> np.ndarray:
+        """Máscara das linhas marcadas como recorrentes."""
+        if "Recorrente" not in tabela:
+            return np.zeros(len(tabela), dtype=bool)
+        valores = tabela.column("Recorrente").astype("string").fillna("")
+        return valores.map(normalizar_nome).isin(VALORES_RECORRENTES).to_numpy()
+
+    def _parcelado(self, tabela: SheetTable) -> np.ndarray:
+        """Máscara das linhas que são parcelas de dívidas."""
+        if "Parcelas" not in tabela:
+            return np.zeros(len(tabela), dtype=bool)
+        return parse_parcelas(tabela.column("Parcelas"))[1] > 0
+
+    def _fluxo_mensal(self, tabela: SheetTable, coluna_valor: str,
+                      coluna_data: str) -> np.ndarray:
+        """Soma, por mês, os lançamentos recorrentes e os avulsos futuros."""
+        fluxo = np.zeros(self.horizonte, dtype=np.int64)
+        if len(tabela) == 0 or coluna_valor not in tabela:
+            return fluxo
+        valores = tabela.centavos(coluna_valor)
+        meses, validas = self._meses_relativos(tabela, coluna_data)
+        if not validas.all():
+            # Sem data não há como saber o mês: a linha fica fora da projeção
+            logging.warning(f"{int((~validas).sum())} linha(s) com '{coluna_data}' vazia "
+                            f"ou inválida ignorada(s) na projeção.")
+        recorrente = self._recorrentes(tabela) & validas
+        parcelado = self._parcelado(tabela)
+
+        # Recorrentes: valem todo mês a partir do mês de início (diferença acumulada)
+        inicio = np.maximum(meses[recorrente & ~parcelado], 0)
+        dentro = inicio < self.horizonte
+        degraus = np.bincount(inicio[dentro],
+                              weights=valores[recorrente & ~parcelado][dentro],
+                              minlength=self.horizonte)
+        fluxo += np.cumsum(degraus).astype(np.int64)
+
+        # Avulsos: somente os lançamentos dentro do horizonte
+        avulso = validas & ~recorrente & ~parcelado & (meses >= 0) & (meses < self.horizonte)
+        fluxo += np.bincount(meses[avulso], weights=valores[avulso],
+                             minlength=self.horizonte).astype(np.int64)
+        return fluxo
+
+    def _expandir_dividas(self, despesas: SheetTable) -> Optional[Dict[str, np.ndarray]]:
+        """
+        Expande as despesas parceladas em uma entrada por parcela restante.
+
+        Planilhas que lançam cada parcela em uma linha ("1/10", "2/10"...)
+        repetem o mesmo plano: as linhas com a mesma descrição, o mesmo total
+        de parcelas e o mesmo mês da primeira parcela são um único plano,
+        expandido a partir da linha de menor parcela. Linhas sem data válida
+        são ignoradas.
+        """
+        if len(despesas) == 0 or "Parcelas" not in despesas \
+                or "Valor da Despesa" not in despesas:
+            return None
+        atual, total = parse_parcelas(despesas.column("Parcelas"))
+        meses, validas = self._meses_relativos(despesas, "Data da Despesa")
+        linhas_parceladas = np.flatnonzero((total > 0) & validas)
+        if linhas_parceladas.size == 0:
+            return None
+        atual = np.maximum(atual[linhas_parceladas], 1)
+        planos = pd.DataFrame({
+            "descricao": self._descricoes(despesas)[linhas_parceladas],
+            "total": total[linhas_parceladas],
+            "inicio": meses[linhas_parceladas] - (atual - 1),
+        })
+        ordem = np.argsort(atual, kind="stable")
+        primeiras = ordem[~planos.iloc[ordem].duplicated().to_numpy()]
+        primeiras.sort()
+        linhas_parceladas = linhas_parceladas[primeiras]
+        atual = atual[primeiras]
+        meses = meses[linhas_parceladas]
+        total = total[linhas_parceladas]
+        origem, mes = expandir_parcelas(meses, total - atual + 1)
+        linha = linhas_parceladas[origem]
+        return {
+            "linha": linha,
+            "mes": mes,
+            "numero": atual[origem] + (mes - meses[origem]),
+            "total": total[origem],
+            "valor": despesas.centavos("Valor da Despesa")[linha],
+        }
+
+    @staticmethod
+    def _descricoes(despesas: SheetTable) -> np.ndarray:
+        """Descrição normalizada de cada despesa ("" sem a coluna)."""
+        if "Descrição da Despesa" not in despesas:
+            return np.full(len(despesas), "", dtype=object)
+        codigos, distintas = pd.factorize(
+            despesas.column("Descrição da Despesa").astype("string").fillna(""))
+        # Normaliza só as descrições distintas, não cada linha
+        return np.array([normalizar_nome(d) for d in distintas] + [""],
+                        dtype=object)[codigos]
+
+    @property
+    def meses(self) -> pd.PeriodIndex:
+        """Meses cobertos pela projeção."""
+        return pd.period_range(self.mes_inicial, periods=self.horizonte, freq="M")
+
+    def to_frame(self) -> pd.DataFrame:
+        """Linha do tempo da projeção em reais, indexada pelo mês."""
+        return pd.DataFrame({
+            "receitas": self.receitas / 100,
+            "despesas": self.despesas / 100,
+            "saldo": self.saldo / 100,
+        }, index=self.meses)
+
+    def dividas(self, despesas: SheetTable) -> Tuple[List[Dict], List[Dict]]:
+        """
+        Lista as parcelas de dívidas do mês corrente e dos meses seguintes.
+
+        Args:
+            despesas: A mesma aba Despesa usada na projeção.
+
+        Returns:
+            Tuple[List[Dict], List[Dict]]: Dívidas atuais e dívidas futuras.
+        """
+        if self._parcelas is None:
+            return [], []
+        descricoes = despesas.column("Descrição da Despesa").astype("string") \
+            .fillna("").to_numpy() if "Descrição da Despesa" in despesas \
+            else np.full(len(despesas), "", dtype=object)
+        atuais, futuras = [], []
+        p = self._parcelas
+        for i in np.flatnonzero(p["mes"] >= 0):
+            divida = {
+                "descricao": descricoes[p["linha"][i]],
+                "valor": float(p["valor"][i]) / 100,
+                "parcela": int(p["numero"][i]),
+                "total_parcelas": int(p["total"][i]),
+                "mes": self.mes_inicial + int(p["mes"][i]),
+            }
+            (atuais if p["mes"][i] == 0 else futuras).append(divida)
+        return atuais, futuras
+
+    def mes_viavel(self, valor_compra: float, parcelas: int = 1,
+                   saldo_minimo: float = 0.0,
+                   percentual_saldo: Optional[float] = None) -> Optional[pd.Period]:
+        """
+        Retorna o primeiro mês em que a compra cabe no orçamento projetado.
+
+        Uma compra iniciada no mês m é viável se, a partir de m, o saldo
+        projetado menos as parcelas já pagas nunca fica abaixo do saldo mínimo.
+        Todos os meses candidatos são avaliados de uma vez (matriz m x t).
+
+        Args:
+            valor_compra: Valor total da compra, em reais.
+            parcelas: Número de parcelas mensais.
+            saldo_minimo: Saldo que deve ser preservado em todos os meses.
+            percentual_saldo: Se informado, exige também que a compra não
+                ultrapasse esse percentual do saldo projetado no mês da compra.
+
+        Returns:
+            Optional[pd.Period]: Primeiro mês viável, ou None se nenhum mês do
+            horizonte comportar a compra.
+        """
+        if parcelas <= 0:
+            raise ValueError("Número de parcelas inválido.")
+        valor = valor_compra * 100
+        t = np.arange(self.horizonte)
+        decorridas = np.clip(t[None, :] - t[:, None] + 1, 0, parcelas)
+        saldo_apos = self.saldo[None, :] - decorridas * (valor / parcelas)
+        viavel = ((saldo_apos >= saldo_minimo * 100) | (decorridas == 0)).all(axis=1)
+        if percentual_saldo is not None:
+            viavel &= valor <= percentual_saldo * self.saldo
+        candidatos = np.flatnonzero(viavel)
+        if candidatos.size == 0:
+            logging.info("Nenhum mês do horizonte comporta a compra.")
+            return None
+        return self.mes_inicial + int(candidatos[0])
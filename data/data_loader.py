@@ -1,92 +1,500 @@
 # ocb/data/data_loader.py
-from googleapiclient.discovery import build
 import logging
-import gspread
-from oauth2client.service_account import ServiceAccountCredentials
+import math
+import sys
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+from data.backends import FileBackend, GoogleSheetsBackend
+from data.google_clients import DEFAULT_SCOPES, get_client_pool
+from data.instrumentation import metrics
+from data.sheet_parser import SCHEMAS, SheetTable
+from data.snapshot_cache import Snapshot, SnapshotCache
 
 logging.basicConfig(level=logging.INFO,
                     format='%(asctime)s - %(levelname)s - %(message)s')
 
+# Tempo (em segundos) durante o qual um snapshot em memória é servido sem
+# consultar a revisão da planilha.
+DEFAULT_TTL = 30.0
+
+# Abas que compõem o layout padrão da planilha
+DEFAULT_WORKSHEETS = ("resumo", "receita", "despesa")
+
 
 class DataLoader:
-    def __init__(self, credentials_path: str, spreadsheet_name: str):
-        """Inicializa o DataLoader, autentica e busca o ID da planilha."""
+    def __init__(self, credentials_path: str, spreadsheet_name: str,
+                 cache: Optional[SnapshotCache] = None, ttl: float = DEFAULT_TTL,
+                 client=None, backend=None, cache_key: Optional[str] = None,
+                 scopes: Sequence[str] = DEFAULT_SCOPES):
+        """
+        Inicializa o DataLoader, autentica e busca o ID da planilha.
+
+        Args:
+            credentials_path: Caminho do arquivo de credenciais da conta de serviço.
+            spreadsheet_name: Nome da planilha no Google Drive.
+            cache: Cache persistente de snapshots; se None, o cache fica só em memória.
+            ttl: Segundos durante os quais um snapshot é servido sem revalidação.
+                Com float("inf"), só refresh revalida os dados, e as leituras
+                servem o snapshot em disco sem consultar a revisão.
+            client: Cliente compatível com gspread já autorizado (ex.: um cliente
+                falso para testes); se None, autentica com as credenciais.
+            backend: Origem dos dados (ex.: FileBackend para arquivos locais);
+                se None, usa a planilha do Google Sheets.
+            cache_key: Chave dos snapshots no cache persistente; se None, usa o
+                nome da planilha. Em modo multiusuário, identifica o usuário
+                para que planilhas homônimas não compartilhem dados.
+            scopes: Escopos da credencial (WRITE_SCOPES para registrar as
+                decisões na planilha).
+        """
         self.credentials_path = credentials_path
         self.spreadsheet_name = spreadsheet_name
+        self.cache = cache
+        self.cache_key = cache_key or spreadsheet_name
+        self.ttl = ttl
+        self.scopes = tuple(scopes)
+        # Linhas gravadas localmente e ainda não enviadas à planilha, por aba
+        # (WriteBackQueue.pendentes): reaplicadas a cada nova leitura da aba
+        self.write_overlay: Optional[Callable[[str], Optional[Tuple[List[str],
+                                                                     List[List[str]]]]]] = None
+
+        # Protege o estado interno quando o loader é usado por várias threads
+        self._lock = threading.RLock()
+        # Snapshots em memória e instante (monotônico) da última revalidação
+        self._memoria: Dict[str, Snapshot] = {}
+        self._validado_em: Dict[str, float] = {}
+        # Abas da planilha por título, consultadas uma única vez
+        self._worksheets: Optional[Dict[str, object]] = None
+        # Tabelas tipadas já convertidas, junto dos dados brutos de origem
+        self._tabelas: Dict[str, Tuple[list, SheetTable]] = {}
 
         # Autenticar e abrir a planilha aqui no __init__
-        self.spreadsheet = self.authenticate_and_open_spreadsheet()
+        self.spreadsheet = None
+        if backend is None:
+            if client is not None:
+                self.spreadsheet = client.open(spreadsheet_name)
+            else:
+                self.spreadsheet = self.authenticate_and_open_spreadsheet()
+            backend = GoogleSheetsBackend(self.spreadsheet)
+        self.backend = backend
+
+    @classmethod
+    def from_file(cls, caminho: str, **kwargs) -> "DataLoader":
+        """
+        Cria um DataLoader que lê as abas de arquivos locais, sem rede nem credenciais.
+
+        Args:
+            caminho: Pasta de trabalho .xlsx (ex.: templates/Meus Gastos OCB.xlsx)
+                ou diretório com um arquivo .csv/.parquet por aba.
+            **kwargs: Demais argumentos do DataLoader (cache, ttl).
+
+        Returns:
+            DataLoader: Loader com o mesmo contrato de load_data.
+        """
+        return cls(None, caminho, backend=FileBackend(caminho), **kwargs)
 
     def authenticate_and_open_spreadsheet(self):
-        """Autentica e abre a planilha do Google Sheets."""
-        scope = ['https://spreadsheets.google.com/feeds',
-                 'https://www.googleapis.com/auth/drive']
-        # Autenticação movida para dentro deste método
-        credentials = ServiceAccountCredentials.from_json_keyfile_name(
-            self.credentials_path, scope)
-        client = gspread.authorize(credentials)
-        return client.open(self.spreadsheet_name)
+        """
+        Autentica e abre a planilha do Google Sheets.
+
+        Credenciais, sessão HTTP e cliente vêm do pool do processo, e o ID da
+        planilha é resolvido uma única vez; as sessões seguintes abrem a
+        planilha direto pelo ID, sem nova autenticação nem busca no Drive.
+        """
+        client = get_client_pool().gspread_client(self.credentials_path, self.scopes)
+        spreadsheet_id = self._get_spreadsheet_id(self.spreadsheet_name)
+        if spreadsheet_id is None:
+            return client.open(self.spreadsheet_name)
+        return client.open_by_key(spreadsheet_id)
 
     def _get_spreadsheet_id(self, spreadsheet_name: str):
         """Encontra o ID da planilha pelo nome usando a API do Google Drive."""
-        if not self.service:
-            logging.error(
-                "Falha na autenticação. Não é possível buscar a planilha.")
-            return None
         try:
-            drive_service = build(
-                'drive', 'v3', credentials=self.service._credentials)
-            results = drive_service.files().list(
-                q=f"name='{
-                    spreadsheet_name}' and mimeType='application/vnd.google-apps.spreadsheet'",
-                fields="nextPageToken, files(id, name)"
-            ).execute()
-            files = results.get('files', [])
-
-            if not files:
-                logging.error(f"Planilha '{spreadsheet_name}' não encontrada.")
-                return None
-
-            if len(files) > 1:
-                logging.warning(f"Múltiplas planilhas com o nome '{
-                                spreadsheet_name}' encontradas. Usando a primeira.")
-
-            spreadsheet_id = files[0]['id']
-            logging.info(f"Planilha '{spreadsheet_name}' encontrada com ID: {
-                         spreadsheet_id}")
-            return spreadsheet_id
-
+            return get_client_pool().spreadsheet_id(self.credentials_path,
+                                                    spreadsheet_name, self.scopes)
         except Exception as e:
             logging.error(f"Erro ao buscar ID da planilha: {e}")
             return None
 
-    def load_data(self, worksheet_name):
-        """Carrega os dados de uma aba específica da planilha."""
+    def _get_revision(self) -> Optional[str]:
+        """
+        Retorna a revisão atual dos dados (horário da última modificação).
+
+        É uma consulta de metadados, bem mais barata que baixar as abas.
+
+        Returns:
+            Optional[str]: Revisão da planilha, ou None se não for possível obtê-la.
+        """
+        metrics.count("ocb_api_calls_total", chamada="revisao")
         try:
-            worksheet = self.spreadsheet.worksheet(worksheet_name)
-            data = worksheet.get_all_values()
+            with metrics.span("sheets.revisao"):
+                return self.backend.revision()
+        except Exception as e:
+            logging.warning(f"Não foi possível obter a revisão da planilha: {e}")
+            return None
+
+    def _worksheet_titles(self) -> Dict[str, object]:
+        """
+        Retorna as abas da planilha indexadas pelo título.
+
+        A consulta de metadados é feita uma única vez por DataLoader.
+        """
+        if self._worksheets is None:
+            metrics.count("ocb_api_calls_total", chamada="abas")
+            self._worksheets = self.backend.worksheets()
+        return self._worksheets
+
+    def _fetch_many(self, worksheet_names: List[str]) -> Dict[str, List[List[str]]]:
+        """Baixa várias abas de uma só vez a partir da origem dos dados."""
+        metrics.count("ocb_api_calls_total", chamada="batch_get")
+        with metrics.span("sheets.batch_get", abas=len(worksheet_names)):
+            return self.backend.fetch_many(worksheet_names)
+
+    def _com_pendentes(self, worksheet_name, data: List[List[str]]) -> List[List[str]]:
+        """Acrescenta aos dados lidos as linhas ainda não enviadas à planilha."""
+        pendentes = self.write_overlay(worksheet_name) if self.write_overlay else None
+        if not pendentes:
             return data
-        except gspread.exceptions.WorksheetNotFound:
-            print(f"Aviso: Aba '{worksheet_name}' não encontrada na planilha.")
-            return []
+        cabecalho, linhas = pendentes
+        return (data or [list(cabecalho)]) + linhas
+
+    def _store(self, worksheet_name, revisao, data) -> Snapshot:
+        """Guarda o snapshot de uma aba em memória e no cache persistente."""
+        data = self._com_pendentes(worksheet_name, data)
+        if self.cache is not None:
+            snapshot = self.cache.put(
+                self.cache_key, worksheet_name, revisao, data)
+        else:
+            snapshot = Snapshot(revisao, time.time(), data)
+        self._memoria[worksheet_name] = snapshot
+        self._validado_em[worksheet_name] = time.monotonic()
+        return snapshot
+
+    def _cached_snapshot(self, worksheet_name) -> Optional[Snapshot]:
+        """Retorna o snapshot da aba em memória ou, na falta dele, do disco."""
+        snapshot = self._memoria.get(worksheet_name)
+        if snapshot is None and self.cache is not None:
+            snapshot = self.cache.get(self.cache_key, worksheet_name)
+        return snapshot
+
+    def _is_valid(self, snapshot: Snapshot, revisao: Optional[str]) -> bool:
+        """Indica se um snapshot ainda corresponde ao conteúdo da planilha."""
+        if revisao is None:
+            # Sem revisão disponível, vale apenas o TTL do snapshot
+            return time.time() - snapshot.obtido_em < self.ttl
+        return snapshot.revisao == revisao
+
+    def load_data(self, worksheet_name):
+        """
+        Carrega os dados de uma aba específica da planilha.
+
+        Os dados são servidos do snapshot em memória enquanto o TTL não expira.
+        Depois disso, a revisão da planilha é consultada e a aba só é baixada
+        novamente se tiver sido modificada.
+        """
+        return self.load_many([worksheet_name])[worksheet_name]
+
+    def load_many(self, worksheet_names: List[str]) -> Dict[str, List[List[str]]]:
+        """
+        Carrega várias abas da planilha, baixando as desatualizadas em uma
+        única requisição.
+
+        Args:
+            worksheet_names: Nomes das abas a carregar.
+
+        Returns:
+            Dict[str, List[List[str]]]: Valores de cada aba; abas inexistentes
+            ou que falharam ao carregar retornam lista vazia.
+        """
+        with self._lock:
+            resultado = self._load_many(worksheet_names)
+        return {nome: resultado[nome] for nome in worksheet_names}
+
+    def _load_many(self, worksheet_names: List[str],
+                   revalidar: bool = False) -> Dict[str, List[List[str]]]:
+        resultado = {}
+        pendentes = []
+        agora = time.monotonic()
+        for nome in worksheet_names:
+            snapshot = self._memoria.get(nome)
+            validado_em = self._validado_em.get(nome)
+            if not revalidar and snapshot is not None and validado_em is not None \
+                    and agora - validado_em < self.ttl:
+                resultado[nome] = snapshot.dados
+            else:
+                pendentes.append(nome)
+        metrics.count("ocb_cache_hits_total", len(resultado), camada="memoria")
+        if not pendentes:
+            return resultado
+
+        # Com TTL infinito a revalidação fica a cargo de refresh (atualização em
+        # segundo plano): o snapshot em disco é servido sem consultar a revisão
+        sem_revisao = not revalidar and math.isinf(self.ttl)
+        revisao = None if sem_revisao else self._get_revision()
+        desatualizadas = {}
+        for nome in pendentes:
+            snapshot = self._cached_snapshot(nome)
+            # Na revalidação forçada, sem revisão disponível a aba é baixada de novo
+            valido = snapshot is not None and (sem_revisao or (
+                self._is_valid(snapshot, revisao) and not (revalidar and revisao is None)))
+            if valido:
+                self._memoria[nome] = snapshot
+                self._validado_em[nome] = time.monotonic()
+                resultado[nome] = snapshot.dados
+                metrics.count("ocb_cache_hits_total", camada="disco")
+            else:
+                desatualizadas[nome] = snapshot
+        metrics.count("ocb_cache_misses_total", len(desatualizadas), camada="disco")
+        if not desatualizadas:
+            return resultado
+        if sem_revisao:
+            # Aba sem snapshot algum: vai ser baixada, então registra a revisão
+            revisao = self._get_revision()
+
+        try:
+            existentes = self._worksheet_titles()
+            a_baixar = []
+            for nome in desatualizadas:
+                if nome in existentes:
+                    a_baixar.append(nome)
+                else:
+                    print(f"Aviso: Aba '{nome}' não encontrada na planilha.")
+                    resultado[nome] = self._com_pendentes(nome, [])
+            if a_baixar:
+                baixadas = self._fetch_many(a_baixar)
+                for nome in a_baixar:
+                    resultado[nome] = self._store(
+                        nome, revisao, baixadas.get(nome, [])).dados
         except Exception as e:
             print(f"Erro ao carregar dados da planilha: {e}")
-            return []
+            for nome, snapshot in desatualizadas.items():
+                if nome in resultado:
+                    continue
+                if snapshot is not None:
+                    logging.warning(
+                        f"Usando snapshot desatualizado da aba '{nome}'.")
+                    resultado[nome] = snapshot.dados
+                else:
+                    resultado[nome] = []
+        return resultado
+
+    def refresh(self, worksheet_names: Optional[List[str]] = None) -> List[str]:
+        """
+        Revalida as abas ignorando o TTL e baixa as que mudaram na planilha.
+
+        Usado pela atualização em segundo plano: as tabelas tipadas das abas
+        alteradas já são convertidas aqui, fora do caminho das requisições.
+
+        Args:
+            worksheet_names: Abas a revalidar; se None, as abas padrão.
+
+        Returns:
+            List[str]: Abas cujo conteúdo mudou.
+        """
+        nomes = list(worksheet_names or DEFAULT_WORKSHEETS)
+        with self._lock:
+            # Abas liberadas da memória (trim) são comparadas com o snapshot em disco
+            antes = {nome: self._cached_snapshot(nome) for nome in nomes}
+            self._load_many(nomes, revalidar=True)
+            alteradas = []
+            for nome in nomes:
+                atual, anterior = self._memoria.get(nome), antes[nome]
+                if atual is anterior:
+                    continue
+                if anterior is not None and atual is not None \
+                        and atual.dados == anterior.dados:
+                    # Conteúdo igual: mantém os dados (e a tabela já convertida)
+                    self._memoria[nome] = atual._replace(dados=anterior.dados)
+                    continue
+                alteradas.append(nome)
+                self.load_table(nome)
+        return alteradas
+
+    def append_local(self, worksheet_name: str, linhas: List[List[str]],
+                     cabecalho: Sequence[str],
+                     ao_aplicar: Optional[Callable[[], None]] = None) -> List[List[str]]:
+        """
+        Acrescenta linhas ao snapshot da aba em memória e no cache persistente,
+        sem acessar a planilha: as leituras seguintes já as enxergam.
+
+        Args:
+            worksheet_name: Nome da aba.
+            linhas: Linhas a acrescentar (textos, na ordem do cabeçalho).
+            cabecalho: Cabeçalho usado se a aba ainda não existir.
+            ao_aplicar: Chamado junto da alteração, sem que uma leitura da
+                planilha possa ocorrer entre os dois (ex.: para registrar as
+                linhas como pendentes de envio).
+
+        Returns:
+            List[List[str]]: Novo conteúdo da aba.
+        """
+        with self._lock:
+            atual = self.load_data(worksheet_name)
+            snapshot = self._memoria.get(worksheet_name)
+            # Aba nova: usa a revisão das demais para que o snapshot continue válido
+            revisao = snapshot.revisao if snapshot is not None else next(
+                (s.revisao for s in self._memoria.values()), None)
+            dados = (atual or [list(cabecalho)]) + [list(linha) for linha in linhas]
+            if self.cache is not None:
+                snapshot = self.cache.put(self.cache_key, worksheet_name, revisao, dados)
+            else:
+                snapshot = Snapshot(revisao, time.time(), dados)
+            self._memoria[worksheet_name] = snapshot
+            self._validado_em[worksheet_name] = time.monotonic()
+            if ao_aplicar is not None:
+                ao_aplicar()
+            return dados
+
+    def read_remote(self, worksheet_names: List[str]) -> Dict[str, List[List[str]]]:
+        """
+        Lê as abas direto da origem dos dados, sem cache nem linhas pendentes
+        (usado para conferir se uma gravação já foi aplicada).
+
+        Returns:
+            Dict[str, List[List[str]]]: Valores de cada aba; abas inexistentes
+            retornam lista vazia.
+        """
+        with self._lock:
+            self._worksheets = None
+            existentes = [nome for nome in worksheet_names if nome in self._worksheet_titles()]
+            baixadas = self._fetch_many(existentes) if existentes else {}
+        return {nome: baixadas.get(nome, []) for nome in worksheet_names}
+
+    def append_remote(self, linhas: Dict[str, List[List[str]]],
+                      cabecalhos: Dict[str, List[str]],
+                      ao_confirmar: Optional[Callable[[], None]] = None):
+        """
+        Envia linhas a várias abas da origem dos dados em uma única requisição.
+
+        Os snapshots locais não mudam: as linhas já foram aplicadas por
+        append_local, e a nova revisão da planilha as traz na próxima leitura.
+
+        Args:
+            linhas: Linhas de cada aba.
+            cabecalhos: Cabeçalho de cada aba (para as abas que serão criadas).
+            ao_confirmar: Chamado após o envio, antes de qualquer nova leitura
+                (ex.: para retirar as linhas da lista de pendentes).
+        """
+        with self._lock:
+            metrics.count("ocb_api_calls_total", chamada="batch_update")
+            with metrics.span("sheets.batch_update", abas=len(linhas)):
+                self.backend.append_rows(linhas, cabecalhos)
+            # Abas podem ter sido criadas: a lista é consultada de novo
+            self._worksheets = None
+            if ao_confirmar is not None:
+                ao_confirmar()
+
+    def load_all(self) -> Dict[str, List[List[str]]]:
+        """
+        Carrega as abas padrão (resumo, receita e despesa) em uma única requisição.
+
+        Returns:
+            Dict[str, List[List[str]]]: Valores de cada aba padrão.
+        """
+        return self.load_many(list(DEFAULT_WORKSHEETS))
+
+    def load_table(self, worksheet_name) -> SheetTable:
+        """
+        Carrega uma aba já convertida em colunas tipadas.
+
+        A conversão é feita uma única vez por snapshot: enquanto os dados da
+        aba não mudam, a mesma tabela é reaproveitada.
+
+        Args:
+            worksheet_name: Nome da aba.
+
+        Returns:
+            SheetTable: Conteúdo da aba com colunas acessíveis pelo nome.
+        """
+        with self._lock:
+            data = self.load_data(worksheet_name)
+            em_cache = self._tabelas.get(worksheet_name)
+            if em_cache is not None and em_cache[0] is data:
+                return em_cache[1]
+            with metrics.span("conversao", aba=worksheet_name):
+                tabela = SheetTable(data, SCHEMAS.get(worksheet_name, ()))
+            self._tabelas[worksheet_name] = (data, tabela)
+            return tabela
+
+    def invalidate(self, worksheet_name: Optional[str] = None):
+        """
+        Descarta os snapshots em cache, forçando uma nova leitura da planilha.
+
+        Args:
+            worksheet_name: Aba a invalidar; se None, invalida todas.
+        """
+        with self._lock:
+            if worksheet_name is None:
+                self._memoria.clear()
+                self._validado_em.clear()
+                self._worksheets = None
+                self._tabelas.clear()
+            else:
+                self._memoria.pop(worksheet_name, None)
+                self._validado_em.pop(worksheet_name, None)
+                self._tabelas.pop(worksheet_name, None)
+        if self.cache is not None:
+            self.cache.invalidate(self.cache_key, worksheet_name)
+
+    def release_memory(self):
+        """
+        Libera os snapshots e tabelas mantidos em memória, sem apagar o cache
+        persistente: a próxima leitura os recarrega do disco.
+        """
+        with self._lock:
+            self._memoria.clear()
+            self._validado_em.clear()
+            self._tabelas.clear()
+
+    def memory_bytes(self) -> int:
+        """
+        Estima a memória ocupada pelos snapshots e tabelas convertidas.
+
+        Returns:
+            int: Tamanho aproximado em bytes.
+        """
+        with self._lock:
+            total = 0
+            for snapshot in self._memoria.values():
+                # Cada célula é uma str; cada linha, uma lista de referências
+                total += sum(sys.getsizeof(linha) + sum(map(sys.getsizeof, linha))
+                             for linha in snapshot.dados)
+            for _, tabela in self._tabelas.values():
+                total += int(tabela.frame.memory_usage(deep=True).sum())
+            return total
 
     def extrair_salario_atual(self, data):
+        """Extrai o saldo restante dos dados brutos da aba Resumo."""
         try:
-            saldo_restante = float(data[0][4].replace(
-                ',', '.'))  # Indice 4 = Saldo Restante
+            resumo = data if isinstance(data, SheetTable) \
+                else SheetTable(data, SCHEMAS["resumo"])
+            saldo_restante = resumo.reais("Saldo Restante")
             logging.info(f"Saldo restante encontrado: {saldo_restante}")
             return saldo_restante
-        except (IndexError, TypeError, ValueError) as e:
+        except (KeyError, IndexError, TypeError, ValueError) as e:
             logging.error(f"Erro ao acessar 'Saldo Restante': {e}")
             return 0.0
 
     def extrair_dividas(self, data_despesas):
-        """Extrai as dívidas da aba Despesas."""
-        dividas_atuais = []
-        dividas_futuras = []
-        # (Implementação da lógica para extrair dívidas)
-        # ...
+        """
+        Extrai as dívidas parceladas da aba Despesas.
+
+        Args:
+            data_despesas: Dados brutos da aba Despesa (ou a SheetTable já convertida).
+
+        Returns:
+            Tuple[List[Dict], List[Dict]]: Parcelas que vencem no mês corrente
+            e parcelas dos meses seguintes.
+        """
+        from data.cash_flow import CashFlowProjection
+
+        try:
+            despesas = data_despesas if isinstance(data_despesas, SheetTable) \
+                else SheetTable(data_despesas, SCHEMAS["despesa"])
+            vazia = SheetTable([], SCHEMAS["receita"])
+            projecao = CashFlowProjection(vazia, despesas, 0.0, horizonte_meses=1)
+            dividas_atuais, dividas_futuras = projecao.dividas(despesas)
+        except (KeyError, TypeError, ValueError) as e:
+            logging.error(f"Erro ao extrair dívidas: {e}")
+            return [], []
         return dividas_atuais, dividas_futuras
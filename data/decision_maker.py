@@ -1,33 +1,84 @@
-from typing import Dict
-from transformers import pipeline, AutoTokenizer, AutoModelForSequenceClassification
-import torch
+from typing import Dict, Mapping, Optional
 import logging
+from data.instrumentation import metrics
+from data.inference_service import InferenceService, Resposta
+from data.rule_engine import LIMITE_PERCENTUAL_SALDO, RuleEngine
 
 
 class DecisionMaker:
     """
     Classe para gerar sugestões de compra personalizadas com base 
     em regras financeiras. 
+
+    As regras são avaliadas pelo RuleEngine; sem um conjunto de regras
+    configurado, vale a regra padrão de 30% do saldo atual.
+
+    Os modelos de IA (transformers/torch) ficam no InferenceService e só são
+    importados e carregados quando um caminho que depende deles é usado; a
+    regra financeira não precisa deles.
     """
 
-    def __init__(self):
-        """Inicializa o DecisionMaker e carrega os modelos de IA."""
+    def __init__(self, carregar_modelos: bool = False,
+                 regras: Optional[RuleEngine] = None,
+                 inference: Optional[InferenceService] = None,
+                 usar_ia: bool = False):
+        """
+        Inicializa o DecisionMaker.
+
+        Args:
+            carregar_modelos: Se True, carrega os modelos de IA imediatamente
+                em vez de esperar o primeiro uso.
+            regras: Motor de regras de decisão; se None, usa as regras padrão.
+            inference: Serviço de inferência compartilhado; se None, um serviço
+                próprio é criado (sem carregar modelos).
+            usar_ia: Se True, a sugestão inclui a resposta gerada pelo modelo.
+        """
         logging.info("Inicializando DecisionMaker...")
-        try:
-            logging.info("Carregando modelo de sentimento...")
-            self.sentiment_model = AutoModelForSequenceClassification.from_pretrained(
-                "nlptown/bert-base-multilingual-uncased-sentiment")
-            self.tokenizer = AutoTokenizer.from_pretrained(
-                "nlptown/bert-base-multilingual-uncased-sentiment")
-            logging.info("Modelo de sentimento carregado com sucesso!")
-        except Exception as e:
-            logging.error(f"Erro ao carregar o modelo de sentimento: {e}")
-            self.sentiment_model = None
-            self.tokenizer = None
+        self.regras = regras if regras is not None else RuleEngine()
+        self.inference = inference if inference is not None else InferenceService()
+        self.usar_ia = usar_ia
+        if carregar_modelos:
+            self.load_models()
+
+    def load_models(self) -> bool:
+        """
+        Carrega os modelos de IA do serviço de inferência. Chamadas repetidas
+        não recarregam os modelos.
+
+        Returns:
+            bool: True se os modelos estão disponíveis.
+        """
+        return self.inference.load_models()
+
+    @property
+    def sentiment_model(self):
+        """Modelo de sentimento, carregado no primeiro acesso."""
+        modelos = self.inference.modelos
+        return modelos["sentimento"] if modelos else None
+
+    @property
+    def tokenizer(self):
+        """Tokenizador do modelo de sentimento, carregado no primeiro acesso."""
+        modelos = self.inference.modelos
+        return modelos["tokenizer_sentimento"] if modelos else None
+
+    def avaliar_compras(self, contexto: Mapping[str, object]):
+        """
+        Avalia um lote de compras candidatas com as regras configuradas.
+
+        Args:
+            contexto: Variáveis das compras (escalares ou vetores), conforme
+                RuleEngine.avaliar.
+
+        Returns:
+            Avaliacao: Decisão e trace por regra de cada compra.
+        """
+        return self.regras.avaliar(contexto)
 
     def get_purchase_suggestion(self, saldo_atual: float, limite_credito: float,
                                 impacto_compra: str, valor_compra: float,
-                                parcelas: int, forma_pagamento: str) -> Dict[str, str]:
+                                parcelas: int, forma_pagamento: str,
+                                contexto: Optional[Mapping[str, object]] = None) -> Dict[str, str]:
         
         '''
         
@@ -40,9 +91,12 @@ class DecisionMaker:
                 valor_compra (float): Valor total da compra.
                 parcelas (int): Número de parcelas.
                 forma_pagamento (str): Forma de pagamento selecionada.
+                contexto (Mapping, opcional): Variáveis extras para as regras
+                    (ex.: gasto_categoria, orcamento_mes, taxa_juros).
 
             Returns:
-                Dict[str, str]: Um dicionário contendo a sugestão e a justificativa.
+                Dict[str, str]: Um dicionário contendo a sugestão, a justificativa
+                e o trace das regras avaliadas.
                 
         '''
             
@@ -58,76 +112,73 @@ class DecisionMaker:
                 
                 """
             
-            # Regra: Compra aprovada se o valor for menor ou igual a 30% do saldo atual
-            if valor_compra <= 0.30 * saldo_atual:
-                quest = prompt
+            # Regras configuradas (padrão: compra aprovada se o valor for
+            # menor ou igual a 30% do saldo atual)
+            with metrics.span("decisao.regras"):
+                avaliacao = self.avaliar_compras({
+                    "valor_compra": valor_compra,
+                    "parcelas": parcelas,
+                    "saldo_atual": saldo_atual,
+                    "limite_credito": limite_credito,
+                    "forma_pagamento": forma_pagamento,
+                    **(contexto or {}),
+                })
+            quest = prompt
+            if avaliacao.aprovada[0]:
                 suggestion = "Compra aprovada!"
-                justification = "O valor da compra está dentro do limite de 30% do seu saldo atual."
             else:
-                quest = prompt
                 suggestion = "Compra negada!"
-                justification = "O valor da compra ultrapassa o limite de 30% do seu saldo atual."
+            justification = avaliacao.justificativa(0)
             
-            '''
-            > Se usar Chat GPT use este trecho para enviar
-            logging.info(f"Prompt enviado ao GPT-2: {prompt}")
-
-            # Gera texto com o GPT-2
-            generator = pipeline("text-generation", model="gpt2")
-            response = generator(prompt, max_new_tokens=50, num_return_sequences=1)[0]["generated_text"]
-            logging.info(f"Resposta do GPT-2: {response}")
-            '''
-
-            return {
+            resultado = {
                 "resume":prompt,
-                "suggestion": suggestion, #Para analise de sentimento com ML use self._extract_suggestion(response),
-                "justification": justification #Para analise de sentimento com ML useself._extract_justification(response)
+                "suggestion": suggestion,
+                "justification": justification,
+                "trace": avaliacao.trace(0),
             }
 
+            # Resposta do modelo de linguagem (serviço local, em lote e com cache)
+            if self.usar_ia:
+                logging.info(f"Prompt enviado ao GPT-2: {quest}")
+                try:
+                    with metrics.span("decisao.ia"):
+                        resposta = self.inference.gerar(quest)
+                    logging.info(f"Resposta do GPT-2: {resposta.texto}")
+                    resultado["ai_suggestion"] = self._extract_suggestion(resposta)
+                    resultado["ai_justification"] = self._extract_justification(resposta.texto)
+                except Exception as e:
+                    logging.error(f"Erro ao gerar resposta do modelo: {e}")
+
+            return resultado
+
         except Exception as e:
             logging.error(f"Erro ao gerar sugestão: {e}")
             return {"suggestion": "Erro ao processar.", "justification": "Verifique os logs."}
 
-'''
-#No futuro a analise de sentimento sera feita atraves do nosso Modelo de ML usado no arquivo prediction_model
-
-    def _extract_suggestion(self, text: str) -> str:
+    def _extract_suggestion(self, resposta: Resposta) -> str:
         """
         Extrai a sugestão da resposta do GPT-2 usando análise de sentimentos.
 
         Args:
-            text (str): Resposta do GPT-2.
+            resposta (Resposta): Resposta do GPT-2, já classificada pelo
+                modelo de sentimento no mesmo lote da geração.
 
         Returns:
             str: Sugestão extraída (Aprovada, Negada, etc.).
         """
+        text = resposta.texto
+        sentiment = resposta.sentimento
 
-        if self.sentiment_model is None or self.tokenizer is None:
-            logging.error("Modelo de sentimento não carregado.")
-            return "Erro ao processar."
-
-        try:
-            # Análise de Sentimentos com modelo pré-treinado
-            inputs = self.tokenizer(text, return_tensors='pt')
-            with torch.no_grad():
-                outputs = self.sentiment_model(**inputs)
-            
-            sentiment = int(torch.argmax(outputs.logits)) + 1
-
-            # Define a sugestão com base no sentimento
-            if sentiment >= 4:
-                if "parcelar" in text.lower() and "não" not in text.lower():
-                    return "Compra aprovada! Sugestão: parcelar."
-                else:
-                    return "Compra aprovada!"
-            elif sentiment == 3:
-                return "Compra aprovada! Mas analise bem a compra."
+        # Define a sugestão com base no sentimento
+        if sentiment >= 4:
+            if "parcelar" in text.lower() and "não" not in text.lower():
+                return "Compra aprovada! Sugestão: parcelar."
             else:
-                return "Compra negada!"
-
-        except Exception as e:
-            logging.error(f"Erro ao extrair sugestão: {e}")
-            return "Erro ao processar."
+                return "Compra aprovada!"
+        elif sentiment == 3:
+            return "Compra aprovada! Mas analise bem a compra."
+        else:
+            return "Compra negada!"
 
     def _extract_justification(self, text: str) -> str:
         """
@@ -143,5 +194,3 @@ class DecisionMaker:
             if keyword in text.lower():
                 return text.split(keyword, 1)[1].strip()
         return "Sem justificativa explícita."
-
-'''
\ No newline at end of file
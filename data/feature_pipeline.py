@@ -0,0 +1,103 @@
+# ocb/data/feature_pipeline.py
+import numpy as np
+import pandas as pd
+from typing import List, Optional
+from data.sheet_parser import SheetTable
+
+# Janela (em meses) das médias móveis
+JANELA_PADRAO = 3
+
+
+def _normalizar_categoria(nome) -> str:
+    """Gera um sufixo de coluna estável a partir do nome da categoria."""
+    return "_".join(str(nome).strip().lower().split()) or "sem_categoria"
+
+
+class MonthlyFeaturePipeline:
+    """
+    Agrega as transações de receitas e despesas em features mensais.
+
+    Para cada mês são calculados os totais, as médias móveis, a tendência das
+    despesas e a participação de cada categoria no total do mês. Toda a
+    agregação é feita com groupby/rolling do pandas, sem laços por linha.
+    """
+
+    def __init__(self, janela: int = JANELA_PADRAO):
+        """
+        Args:
+            janela: Número de meses das médias móveis.
+        """
+        self.janela = janela
+        self.colunas: Optional[List[str]] = None
+
+    @staticmethod
+    def _por_mes(tabela: SheetTable, coluna_valor: str, coluna_data: str,
+                 coluna_categoria: str, prefixo: str) -> pd.DataFrame:
+        """Soma os valores (em reais) por mês e por categoria."""
+        if len(tabela) == 0 or coluna_valor not in tabela:
+            return pd.DataFrame()
+        valores = tabela.column(coluna_valor).astype("Float64").fillna(0) / 100
+        if coluna_data in tabela:
+            meses = tabela.column(coluna_data).dt.to_period("M")
+        else:
+            # Sem datas, todo o histórico conta como o mês corrente
+            meses = pd.Series(pd.Timestamp.today().to_period("M"),
+                              index=valores.index)
+        frame = pd.DataFrame({"mes": meses, "valor": valores.astype(float)})
+        if coluna_categoria in tabela:
+            frame["categoria"] = tabela.column(coluna_categoria) \
+                .astype("string").fillna("").map(_normalizar_categoria)
+        else:
+            frame["categoria"] = "sem_categoria"
+        frame = frame.dropna(subset=["mes"])
+
+        totais = frame.groupby("mes")["valor"].sum().rename(f"total_{prefixo}")
+        por_categoria = frame.pivot_table(index="mes", columns="categoria",
+                                          values="valor", aggfunc="sum",
+                                          fill_value=0.0, observed=True)
+        participacao = por_categoria.div(totais.where(totais != 0), axis=0).fillna(0.0)
+        participacao.columns = [f"part_{prefixo}_{c}" for c in participacao.columns]
+        return pd.concat([totais, participacao], axis=1)
+
+    def transform(self, receitas: SheetTable, despesas: SheetTable) -> pd.DataFrame:
+        """
+        Gera a matriz de features mensais.
+
+        Args:
+            receitas: Aba Receita convertida.
+            despesas: Aba Despesa convertida.
+
+        Returns:
+            pd.DataFrame: Uma linha por mês (PeriodIndex contínuo), ordenada.
+        """
+        mensal = pd.concat([
+            self._por_mes(receitas, "Valor da Receita", "Data da Receita",
+                          "Categoria da Receita", "receitas"),
+            self._por_mes(despesas, "Valor da Despesa", "Data da Despesa",
+                          "Categoria da Despesa", "despesas"),
+        ], axis=1)
+        if mensal.empty:
+            mensal = pd.DataFrame(index=pd.PeriodIndex(
+                [pd.Timestamp.today().to_period("M")], freq="M"))
+        for coluna in ("total_receitas", "total_despesas"):
+            if coluna not in mensal:
+                mensal[coluna] = 0.0
+
+        # Meses sem lançamentos entram com zero para manter a série contínua
+        meses = pd.period_range(mensal.index.min(), mensal.index.max(), freq="M")
+        mensal = mensal.reindex(meses).fillna(0.0)
+
+        rolagem = mensal[["total_receitas", "total_despesas"]].rolling(
+            self.janela, min_periods=1).mean()
+        mensal["media_receitas"] = rolagem["total_receitas"]
+        mensal["media_despesas"] = rolagem["total_despesas"]
+        mensal["saldo_mes"] = mensal["total_receitas"] - mensal["total_despesas"]
+        mensal["tendencia_despesas"] = mensal["total_despesas"].diff() \
+            .rolling(self.janela, min_periods=1).mean().fillna(0.0)
+        mensal["indice_mes"] = np.arange(len(mensal), dtype=float)
+
+        fixas = ["total_receitas", "total_despesas", "media_receitas",
+                 "media_despesas", "saldo_mes", "tendencia_despesas", "indice_mes"]
+        categorias = sorted(c for c in mensal.columns if c.startswith("part_"))
+        self.colunas = fixas + categorias
+        return mensal[self.colunas]
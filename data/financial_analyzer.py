@@ -1,5 +1,16 @@
+from data.anomaly_detector import AnomalyDetector
+from data.async_loader import AsyncDataLoader
+from data.cash_flow import HORIZONTE_PADRAO, CashFlowProjection
 from data.data_loader import DataLoader
+from data.decision_maker import LIMITE_PERCENTUAL_SALDO
+from data.payment_optimizer import FORMAS_CREDITO, PaymentOptimizer, PlanoPagamento
+from data.rule_engine import RuleEngine
+from data.sheet_parser import SheetTable
+from data.spending_rollups import SpendingRollups
+from typing import Dict, Optional, Sequence
 import logging
+import numpy as np
+import pandas as pd
 
 class FinancialAnalyzer:
     """
@@ -7,15 +18,121 @@ class FinancialAnalyzer:
     limite de crédito e simulação de compras.
     """
 
-    def __init__(self, data_loader: DataLoader):
+    def __init__(self, data_loader: DataLoader, resumo: SheetTable = None,
+                 rollups: Optional[SpendingRollups] = None,
+                 anomalias: Optional[AnomalyDetector] = None):
         """
         Inicializa o FinancialAnalyzer com os dados carregados.
 
         Args:
             data_loader: Instância de DataLoader com os dados da planilha.
+            resumo: Aba Resumo já carregada; se None, é carregada do data_loader.
+            rollups: Agregados de gastos compartilhados entre requisições; se
+                None, são criados sob demanda para este analisador.
+            anomalias: Detector de anomalias compartilhado entre requisições;
+                se None, é criado sob demanda para este analisador.
         """
         self.data_loader = data_loader
-        self.dados_resumo = self.data_loader.load_data("resumo") # Assume que 'resumo' é o nome da aba
+        if resumo is None:
+            resumo = self.data_loader.load_table("resumo") # Assume que 'resumo' é o nome da aba
+        self.resumo = resumo
+        self.rollups = rollups
+        self.anomalias = anomalias
+
+    @classmethod
+    async def create_async(cls, async_loader: AsyncDataLoader, **kwargs) -> "FinancialAnalyzer":
+        """
+        Cria o FinancialAnalyzer carregando a aba Resumo sem bloquear o loop de eventos.
+
+        Args:
+            async_loader: Instância de AsyncDataLoader com os dados da planilha.
+            **kwargs: Demais argumentos do FinancialAnalyzer (ex.: rollups).
+
+        Returns:
+            FinancialAnalyzer: Analisador pronto para uso.
+        """
+        resumo = await async_loader.load_table("resumo")
+        return cls(async_loader.data_loader, resumo=resumo, **kwargs)
+
+    def get_rollups(self) -> SpendingRollups:
+        """
+        Retorna os agregados de gastos atualizados com o snapshot atual da planilha.
+
+        Só os meses alterados desde a última atualização são recalculados.
+        """
+        if self.rollups is None:
+            self.rollups = SpendingRollups()
+        self.rollups.refresh_from_loader(self.data_loader)
+        return self.rollups
+
+    def get_anomalias(self) -> AnomalyDetector:
+        """
+        Retorna o detector de anomalias atualizado com o snapshot atual da planilha.
+
+        Só as despesas acrescentadas desde a última atualização são consumidas.
+        """
+        if self.anomalias is None:
+            self.anomalias = AnomalyDetector()
+        self.anomalias.refresh_from_loader(self.data_loader)
+        return self.anomalias
+
+    def percentual_orcamento_categoria(self, categoria: str) -> Optional[float]:
+        """
+        Retorna o percentual do orçamento do mês corrente já gasto na categoria.
+
+        Args:
+            categoria (str): Categoria de despesa (ex.: "Lazer").
+
+        Returns:
+            Optional[float]: Percentual (0-100), ou None se não houver receitas no mês.
+        """
+        return self.get_rollups().percentual_orcamento(categoria)
+
+    def contexto_categoria(self, categoria: str,
+                           valor_compra: Optional[float] = None) -> Dict[str, float]:
+        """
+        Variáveis de categoria usadas pelas regras de decisão.
+
+        Args:
+            categoria (str): Categoria de despesa da compra.
+            valor_compra (float, opcional): Valor da compra; se informado, o
+                contexto inclui também as variáveis do detector de anomalias.
+
+        Returns:
+            Dict[str, float]: gasto_categoria (já gasto no mês corrente) e
+            orcamento_mes (receitas do mês), em reais, e, com valor_compra,
+            escore_anomalia e razao_pico_categoria.
+        """
+        rollups = self.get_rollups()
+        contexto = {
+            "gasto_categoria": rollups.total_categoria(categoria),
+            "orcamento_mes": rollups.receitas_mes(),
+        }
+        if valor_compra is not None:
+            contexto.update(self.get_anomalias().contexto(categoria, valor_compra))
+        return contexto
+
+    def contexto_categorias(self, categorias: Sequence[str],
+                            valores_compra: Sequence[float]) -> Dict[str, np.ndarray]:
+        """
+        Versão vetorizada de contexto_categoria para um lote de compras.
+
+        Args:
+            categorias: Categoria de despesa de cada compra.
+            valores_compra: Valor de cada compra.
+
+        Returns:
+            Dict[str, np.ndarray]: As mesmas variáveis de contexto_categoria,
+            uma posição por compra (orcamento_mes é escalar).
+        """
+        rollups = self.get_rollups()
+        codigos, distintas = pd.factorize(pd.Series(categorias, dtype=object).fillna(""))
+        gastos = np.array([rollups.total_categoria(c) for c in distintas] + [0.0])
+        return {
+            "gasto_categoria": gastos[codigos],
+            "orcamento_mes": rollups.receitas_mes(),
+            **self.get_anomalias().contexto_lote(categorias, valores_compra),
+        }
 
     def get_current_balance(self):
         """
@@ -25,9 +142,9 @@ class FinancialAnalyzer:
             float: Saldo restante da conta, ou 0.0 em caso de erro.
         """
         try:
-            saldo_restante = float(self.dados_resumo[1][5].replace('.', '').replace(',', '.'))
+            saldo_restante = self.resumo.reais("Saldo Restante")
             return saldo_restante
-        except (IndexError, ValueError) as e:
+        except (KeyError, IndexError, ValueError) as e:
             logging.error(f"Erro ao acessar 'Saldo_Restante' na planilha: {e}")
             return 0.0
 
@@ -39,40 +156,191 @@ class FinancialAnalyzer:
             float: Limite de crédito disponível, ou 0.0 em caso de erro.
         """
         try:
-            #limite_total = float(self.dados_resumo[1][1].replace('.', '').replace(',', '.'))
-            #total_a_pagar = float(self.dados_resumo[1][6].replace('.', '').replace(',', '.'))
-            limite_disponivel = float(self.dados_resumo[1][6].replace('.', '').replace(',', '.'))
+            #limite_total = self.resumo.reais("Limite Total")
+            #total_a_pagar = self.resumo.reais("Total a Pagar")
+            limite_disponivel = self.resumo.reais("Limite Disponível")
             logging.info(f"Limite de crédito disponível: R$ {limite_disponivel:.2f}")
             return limite_disponivel
-        except (IndexError, ValueError) as e:
+        except (KeyError, IndexError, ValueError) as e:
             logging.error(f"Erro ao acessar dados de crédito na planilha: {e}")
             return 0.0
 
-    def simular_compra(self, valor_compra, parcelas):
+    def simular_compras(self, valores_compra: Sequence[float],
+                        parcelas: Sequence[int],
+                        formas_pagamento: Optional[Sequence[str]] = None,
+                        regras: Optional[RuleEngine] = None) -> pd.DataFrame:
         """
-        Simula o impacto de uma compra no orçamento.
+        Simula, de forma vetorizada, todas as combinações de valores,
+        parcelamentos e formas de pagamento.
+
+        O saldo e o limite são lidos uma única vez e a grade inteira é
+        calculada em uma passada de NumPy.
 
         Args:
-            valor_compra (float): Valor total da compra.
-            parcelas (int): Número de parcelas.
+            valores_compra: Valores totais de compra a simular.
+            parcelas: Números de parcelas a simular.
+            formas_pagamento: Formas de pagamento a simular; se None, a
+                simulação não distingue a forma de pagamento.
+            regras: Motor de regras usado na coluna aprovada; se None, vale a
+                regra padrão de 30% do saldo atual.
 
         Returns:
-            str: Descrição do impacto da compra no orçamento.
+            pd.DataFrame: Uma linha por combinação, com as colunas valor_compra,
+            parcelas, forma_pagamento, valor_parcela, novo_saldo,
+            comprometimento_saldo (fração do saldo usada pela parcela mensal),
+            limite_restante, a_vista_possivel e aprovada.
         """
         saldo_atual = self.get_current_balance()
-        valor_parcela = valor_compra / parcelas
+        limite_credito = self.get_available_credit()
+        if formas_pagamento is None:
+            formas_pagamento = [""]
+
+        valores = np.asarray(valores_compra, dtype=float)
+        qtd_parcelas = np.asarray(parcelas, dtype=int)
+        if (qtd_parcelas <= 0).any():
+            raise ValueError("Número de parcelas inválido.")
+        formas = np.asarray(formas_pagamento, dtype=object)
+
+        # Grade valores x parcelas x formas, achatada em vetores
+        v, p, f = np.meshgrid(np.arange(valores.size), np.arange(qtd_parcelas.size),
+                              np.arange(formas.size), indexing="ij")
+        valor = valores[v.ravel()]
+        n_parcelas = qtd_parcelas[p.ravel()]
+        forma = formas[f.ravel()]
+        credito = np.isin(forma, FORMAS_CREDITO)
+
+        valor_parcela = valor / n_parcelas
+        with np.errstate(divide="ignore", invalid="ignore"):
+            comprometimento = np.where(saldo_atual > 0,
+                                       valor_parcela / saldo_atual, np.inf)
+
+        return pd.DataFrame({
+            "valor_compra": valor,
+            "parcelas": n_parcelas,
+            "forma_pagamento": pd.Categorical(forma),
+            "valor_parcela": valor_parcela,
+            "novo_saldo": saldo_atual - valor,
+            "comprometimento_saldo": comprometimento,
+            "limite_restante": np.where(credito, limite_credito - valor,
+                                        limite_credito),
+            "a_vista_possivel": saldo_atual >= valor,
+            "aprovada": (regras or RuleEngine()).avaliar({
+                "valor_compra": valor,
+                "parcelas": n_parcelas,
+                "saldo_atual": saldo_atual,
+                "limite_credito": limite_credito,
+                "forma_pagamento": forma,
+            }).aprovada,
+        })
+
+    def matriz_aprovacao(self, valores_compra: Sequence[float],
+                         parcelas: Sequence[int],
+                         forma_pagamento: str = "") -> pd.DataFrame:
+        """
+        Retorna a matriz de viabilidade valores x parcelas para uma forma de pagamento.
+
+        Returns:
+            pd.DataFrame: Índice = valor da compra, colunas = parcelas,
+            células = compra aprovada (bool).
+        """
+        simulacao = self.simular_compras(valores_compra, parcelas, [forma_pagamento])
+        return simulacao.pivot(index="valor_compra", columns="parcelas",
+                               values="aprovada")
+
+    @staticmethod
+    def descrever_simulacao(simulacao) -> str:
+        """
+        Monta a descrição textual de uma linha do resultado de simular_compras.
+
+        Args:
+            simulacao: Linha (pd.Series ou mapeamento) retornada por simular_compras.
+
+        Returns:
+            str: Descrição do impacto da compra no orçamento.
+        """
+        valor_compra = simulacao["valor_compra"]
+        parcelas = int(simulacao["parcelas"])
+        valor_parcela = simulacao["valor_parcela"]
 
         impacto = "Compra à vista "
-        if saldo_atual >= valor_compra:
+        if simulacao["a_vista_possivel"]:
             impacto += "possível! " 
         else:
             impacto += "indisponível. "
 
         impacto += f"Parcelas de R$ {valor_parcela:.2f} por {parcelas} meses. "
-
-        novo_saldo = saldo_atual - valor_compra
-        impacto += f"Seu saldo após a compra seria de R$ {novo_saldo:.2f}."
+        impacto += f"Seu saldo após a compra seria de R$ {simulacao['novo_saldo']:.2f}."
         impacto += f"Sua compra de R$ {valor_compra:.2f} em {parcelas}x " \
-                   f"irá comprometer R$ {valor_compra/parcelas:.2f} do seu orçamento mensal."
+                   f"irá comprometer R$ {valor_parcela:.2f} do seu orçamento mensal."
+
+        return impacto
+
+    def simular_compra(self, valor_compra, parcelas):
+        """
+        Simula o impacto de uma compra no orçamento.
+
+        Args:
+            valor_compra (float): Valor total da compra.
+            parcelas (int): Número de parcelas.
+
+        Returns:
+            str: Descrição do impacto da compra no orçamento.
+        """
+        simulacao = self.simular_compras([valor_compra], [parcelas])
+        return self.descrever_simulacao(simulacao.iloc[0])
+
+    def projetar_fluxo_caixa(self, horizonte_meses: int = HORIZONTE_PADRAO) -> CashFlowProjection:
+        """
+        Projeta o saldo mês a mês a partir do saldo atual e das abas Receita e Despesa.
+
+        Args:
+            horizonte_meses (int): Quantidade de meses projetados.
+
+        Returns:
+            CashFlowProjection: Linha do tempo de receitas, despesas e saldo.
+        """
+        return CashFlowProjection.from_loader(
+            self.data_loader, self.get_current_balance(),
+            horizonte_meses=horizonte_meses)
+
+    def melhor_plano_pagamento(self, valor_compra: float,
+                               otimizador: Optional[PaymentOptimizer] = None,
+                               projecao: Optional[CashFlowProjection] = None,
+                               **kwargs) -> Optional[PlanoPagamento]:
+        """
+        Recomenda a forma de pagamento e o parcelamento de menor custo total
+        que mantêm o saldo projetado não negativo em todos os meses.
+
+        Args:
+            valor_compra (float): Valor total da compra.
+            otimizador: Condições de pagamento; se None, valem as padrão.
+            projecao: Projeção de fluxo de caixa já calculada; se None, é
+                calculada aqui. Reaproveitá-la deixa a busca em microssegundos.
+            **kwargs: Demais argumentos de PaymentOptimizer.otimizar
+                (formas_pagamento, regras, contexto).
+
+        Returns:
+            Optional[PlanoPagamento]: O melhor plano, ou None se nenhum couber.
+        """
+        if projecao is None:
+            projecao = self.projetar_fluxo_caixa()
+        return (otimizador or PaymentOptimizer()).otimizar(
+            valor_compra, projecao.saldo, self.get_available_credit(), **kwargs)
+
+    def quando_posso_comprar(self, valor_compra, parcelas=1,
+                             horizonte_meses: int = HORIZONTE_PADRAO) -> Optional[pd.Period]:
+        """
+        Calcula o primeiro mês em que a compra passa a caber no orçamento.
 
-        return impacto
\ No newline at end of file
+        Args:
+            valor_compra (float): Valor total da compra.
+            parcelas (int): Número de parcelas.
+            horizonte_meses (int): Quantidade de meses considerados.
+
+        Returns:
+            Optional[pd.Period]: Primeiro mês viável, ou None se a compra não
+            couber no horizonte.
+        """
+        projecao = self.projetar_fluxo_caixa(horizonte_meses)
+        return projecao.mes_viavel(valor_compra, parcelas,
+                                   percentual_saldo=LIMITE_PERCENTUAL_SALDO)
@@ -0,0 +1,227 @@
+# ocb/data/google_clients.py
+import datetime
+import logging
+import threading
+from typing import Dict, Optional, Sequence, Tuple
+from data.instrumentation import metrics
+
+# Escopos usados pelo DataLoader: leitura das planilhas e busca por nome no Drive
+DEFAULT_SCOPES = ("https://www.googleapis.com/auth/spreadsheets.readonly",
+                  "https://www.googleapis.com/auth/drive.metadata.readonly")
+
+# Escopos com gravação, usados quando as decisões são registradas na planilha
+WRITE_SCOPES = ("https://www.googleapis.com/auth/spreadsheets",
+                "https://www.googleapis.com/auth/drive.metadata.readonly")
+
+# O token é renovado quando faltar menos que isto para expirar
+TOKEN_REFRESH_MARGIN = datetime.timedelta(minutes=5)
+
+# Novas tentativas em 429/5xx, com espera exponencial (0,5s, 1s, 2s, ...);
+# gravações (POST) só são repetidas em 429
+MAX_RETRIES = 5
+RETRY_BACKOFF = 0.5
+RETRY_STATUS = (429, 500, 502, 503, 504)
+
+# Conexões HTTP mantidas abertas (keep-alive) por host
+POOL_SIZE = 10
+
+DRIVE_FILES_URL = "https://www.googleapis.com/drive/v3/files"
+
+
+def _retry_class():
+    """Retry do urllib3 que contabiliza cada nova tentativa nas métricas."""
+    from urllib3.util.retry import Retry
+
+    class RetryContado(Retry):
+        def increment(self, method=None, url=None, response=None, error=None, *args, **kwargs):
+            status = response.status if response is not None else type(error).__name__
+            metrics.count("ocb_api_retries_total", status=status)
+            return super().increment(method, url, response, error, *args, **kwargs)
+
+        def is_retry(self, method, status_code, has_retry_after=False):
+            # Gravações (POST, ex.: batchUpdate) não são idempotentes: um 5xx
+            # pode chegar depois de a gravação já ter sido aplicada. Só o 429
+            # garante que a requisição foi recusada e pode ser repetida
+            if method and method.upper() == "POST":
+                return status_code == 429
+            return super().is_retry(method, status_code, has_retry_after)
+
+    return RetryContado
+
+
+class GoogleClientPool:
+    """
+    Clientes das APIs do Google compartilhados por todo o processo.
+
+    Para cada arquivo de credenciais (e conjunto de escopos) mantém uma única
+    credencial, renovada antes de expirar, e uma única sessão HTTP autorizada
+    com conexões persistentes e novas tentativas com espera exponencial em
+    respostas 429/5xx. Sobre ela são criados, uma vez, o cliente gspread e o
+    serviço da API do Sheets; a resolução nome -> ID da planilha é memorizada.
+    """
+
+    def __init__(self, max_retries: int = MAX_RETRIES, backoff: float = RETRY_BACKOFF,
+                 pool_size: int = POOL_SIZE):
+        """
+        Args:
+            max_retries: Novas tentativas em respostas 429/5xx e falhas de conexão.
+            backoff: Fator da espera exponencial entre tentativas (segundos).
+            pool_size: Conexões mantidas abertas por host.
+        """
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.pool_size = pool_size
+        self._lock = threading.RLock()
+        self._credenciais: Dict[Tuple, object] = {}
+        self._sessoes: Dict[Tuple, object] = {}
+        self._gspread: Dict[Tuple, object] = {}
+        self._servicos: Dict[Tuple, object] = {}
+        self._ids: Dict[Tuple, str] = {}
+
+    @staticmethod
+    def _chave(credentials_path: str, scopes: Sequence[str]) -> Tuple:
+        return credentials_path, tuple(sorted(scopes))
+
+    def credentials(self, credentials_path: str, scopes: Sequence[str] = DEFAULT_SCOPES):
+        """
+        Retorna a credencial da conta de serviço, carregada uma única vez e
+        renovada proativamente quando está perto de expirar.
+        """
+        chave = self._chave(credentials_path, scopes)
+        with self._lock:
+            credenciais = self._credenciais.get(chave)
+            if credenciais is None:
+                metrics.count("ocb_client_pool_misses_total", recurso="credenciais")
+                from google.oauth2 import service_account
+                credenciais = service_account.Credentials.from_service_account_file(
+                    credentials_path, scopes=list(scopes))
+                self._credenciais[chave] = credenciais
+            self._renovar(chave, credenciais)
+            return credenciais
+
+    def _renovar(self, chave: Tuple, credenciais):
+        """Renova o token se ele não existe ou expira em menos de TOKEN_REFRESH_MARGIN."""
+        expira = credenciais.expiry
+        # google-auth guarda a expiração como datetime UTC sem fuso
+        agora = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+        if credenciais.token is None or expira is None \
+                or expira - agora < TOKEN_REFRESH_MARGIN:
+            from google.auth.transport.requests import Request
+            sessao = self._sessoes.get(chave)
+            metrics.count("ocb_token_refreshes_total")
+            credenciais.refresh(Request(sessao) if sessao is not None else Request())
+            logging.info("Token de acesso do Google renovado.")
+
+    def session(self, credentials_path: str, scopes: Sequence[str] = DEFAULT_SCOPES):
+        """
+        Retorna a sessão HTTP autorizada (requests.Session com keep-alive e
+        novas tentativas com espera exponencial em 429/5xx).
+        """
+        chave = self._chave(credentials_path, scopes)
+        with self._lock:
+            credenciais = self.credentials(credentials_path, scopes)
+            sessao = self._sessoes.get(chave)
+            if sessao is None:
+                from google.auth.transport.requests import AuthorizedSession
+                from requests.adapters import HTTPAdapter
+                sessao = AuthorizedSession(credenciais)
+                retry = _retry_class()(total=self.max_retries, backoff_factor=self.backoff,
+                              status_forcelist=RETRY_STATUS,
+                              respect_retry_after_header=True, raise_on_status=False)
+                adaptador = HTTPAdapter(max_retries=retry, pool_connections=self.pool_size,
+                                        pool_maxsize=self.pool_size)
+                sessao.mount("https://", adaptador)
+                self._sessoes[chave] = sessao
+            return sessao
+
+    def gspread_client(self, credentials_path: str, scopes: Sequence[str] = DEFAULT_SCOPES):
+        """Retorna o cliente gspread do processo, sobre a sessão compartilhada."""
+        chave = self._chave(credentials_path, scopes)
+        with self._lock:
+            sessao = self.session(credentials_path, scopes)
+            cliente = self._gspread.get(chave)
+            if cliente is None:
+                import gspread
+                cliente = gspread.Client(self._credenciais[chave], session=sessao)
+                self._gspread[chave] = cliente
+            return cliente
+
+    def sheets_service(self, credentials_path: str, scopes: Sequence[str] = DEFAULT_SCOPES):
+        """
+        Retorna o serviço da API do Sheets (googleapiclient), construído uma
+        única vez a partir do documento de descoberta embutido na biblioteca.
+        """
+        chave = self._chave(credentials_path, scopes)
+        with self._lock:
+            servico = self._servicos.get(chave)
+            if servico is None:
+                from googleapiclient.discovery import build
+                servico = build("sheets", "v4",
+                                credentials=self.credentials(credentials_path, scopes),
+                                cache_discovery=False, static_discovery=True)
+                self._servicos[chave] = servico
+            return servico
+
+    def spreadsheet_id(self, credentials_path: str, spreadsheet_name: str,
+                       scopes: Sequence[str] = DEFAULT_SCOPES) -> Optional[str]:
+        """
+        Encontra o ID da planilha pelo nome usando a API do Google Drive.
+
+        O resultado é memorizado: a busca no Drive é feita uma vez por processo.
+
+        Returns:
+            Optional[str]: ID da planilha, ou None se não encontrada.
+        """
+        chave = self._chave(credentials_path, scopes) + (spreadsheet_name,)
+        with self._lock:
+            if chave in self._ids:
+                metrics.count("ocb_cache_hits_total", camada="id_planilha")
+                return self._ids[chave]
+        nome = spreadsheet_name.replace("\\", "\\\\").replace("'", "\\'")
+        resposta = self.session(credentials_path, scopes).get(DRIVE_FILES_URL, params={
+            "q": f"name='{nome}' and mimeType='application/vnd.google-apps.spreadsheet' "
+                 "and trashed=false",
+            "fields": "files(id, name)",
+            "supportsAllDrives": "true",
+            "includeItemsFromAllDrives": "true",
+        })
+        resposta.raise_for_status()
+        files = resposta.json().get("files", [])
+
+        if not files:
+            logging.error(f"Planilha '{spreadsheet_name}' não encontrada.")
+            return None
+
+        if len(files) > 1:
+            logging.warning(f"Múltiplas planilhas com o nome '{spreadsheet_name}' "
+                            "encontradas. Usando a primeira.")
+
+        spreadsheet_id = files[0]["id"]
+        logging.info(f"Planilha '{spreadsheet_name}' encontrada com ID: {spreadsheet_id}")
+        with self._lock:
+            self._ids[chave] = spreadsheet_id
+        return spreadsheet_id
+
+    def clear(self):
+        """Descarta credenciais, sessões e IDs memorizados."""
+        with self._lock:
+            for sessao in self._sessoes.values():
+                sessao.close()
+            self._credenciais.clear()
+            self._sessoes.clear()
+            self._gspread.clear()
+            self._servicos.clear()
+            self._ids.clear()
+
+
+_pool: Optional[GoogleClientPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_client_pool() -> GoogleClientPool:
+    """Retorna o pool de clientes do Google compartilhado pelo processo."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = GoogleClientPool()
+        return _pool
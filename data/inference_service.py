@@ -0,0 +1,255 @@
+# ocb/data/inference_service.py
+import asyncio
+import importlib.util
+import logging
+import queue
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Dict, List, NamedTuple, Optional
+from data.instrumentation import metrics
+
+# Modelos usados na geração e na análise de sentimento das justificativas
+GENERATOR_MODEL_NAME = "gpt2"
+SENTIMENT_MODEL_NAME = "nlptown/bert-base-multilingual-uncased-sentiment"
+
+# Pacotes opcionais (requirements-ml.txt) necessários para a inferência
+ML_PACKAGES = ("torch", "transformers")
+
+
+def ml_disponivel() -> bool:
+    """Indica se os pacotes de IA estão instalados, sem importá-los."""
+    return all(importlib.util.find_spec(pacote) is not None for pacote in ML_PACKAGES)
+
+
+# Tamanho máximo de um lote e tempo máximo (s) de espera para completá-lo
+MAX_BATCH_SIZE = 8
+BATCH_WAIT = 0.01
+
+# Quantidade de respostas mantidas no cache LRU
+CACHE_SIZE = 1024
+
+# Tokens gerados por resposta
+MAX_NEW_TOKENS = 50
+
+
+class Resposta(NamedTuple):
+    """Resposta do modelo para um prompt."""
+    texto: str
+    # Nota de sentimento de 1 (muito negativo) a 5 (muito positivo)
+    sentimento: int
+
+
+def normalizar_prompt(prompt: str) -> str:
+    """Normaliza o prompt para uso como chave do cache (espaços e caixa)."""
+    return re.sub(r"\s+", " ", prompt).strip().casefold()
+
+
+class InferenceService:
+    """
+    Serviço de inferência local para as justificativas de compra.
+
+    Os modelos de geração e de sentimento são carregados uma única vez, a
+    partir dos pesos já baixados (local_files_only), e rodam somente na CPU,
+    com quantização dinâmica int8 das camadas lineares. Prompts enviados ao
+    mesmo tempo são agrupados em micro-lotes por uma thread de trabalho, e as
+    respostas ficam em um cache LRU indexado pelo prompt normalizado, de modo
+    que consultas repetidas não passam pelo modelo.
+    """
+
+    def __init__(self, generator_model: str = GENERATOR_MODEL_NAME,
+                 sentiment_model: str = SENTIMENT_MODEL_NAME,
+                 cache_dir: Optional[str] = None, local_files_only: bool = True,
+                 quantizar: bool = True, max_batch_size: int = MAX_BATCH_SIZE,
+                 batch_wait: float = BATCH_WAIT, cache_size: int = CACHE_SIZE,
+                 max_new_tokens: int = MAX_NEW_TOKENS):
+        """
+        Inicializa o serviço sem carregar os modelos (carregados no primeiro uso).
+
+        Args:
+            generator_model: Modelo de geração de texto.
+            sentiment_model: Modelo de classificação de sentimento.
+            cache_dir: Diretório dos pesos; se None, usa o cache do Hugging Face.
+            local_files_only: Se True, nunca baixa pesos da rede.
+            quantizar: Se True, aplica quantização dinâmica int8 nos modelos.
+            max_batch_size: Tamanho máximo de um micro-lote.
+            batch_wait: Tempo máximo (s) de espera para completar um lote.
+            cache_size: Quantidade de respostas mantidas no cache.
+            max_new_tokens: Tokens gerados por resposta.
+        """
+        self.generator_model = generator_model
+        self.sentiment_model = sentiment_model
+        self.cache_dir = cache_dir
+        self.local_files_only = local_files_only
+        self.quantizar = quantizar
+        self.max_batch_size = max_batch_size
+        self.batch_wait = batch_wait
+        self.cache_size = cache_size
+        self.max_new_tokens = max_new_tokens
+
+        self._modelos: Optional[Dict] = None
+        self._modelos_carregados = False
+        self._lock = threading.Lock()
+        self._cache: "OrderedDict[str, Resposta]" = OrderedDict()
+        # Prompts em processamento, para que pedidos idênticos compartilhem o resultado
+        self._pendentes: Dict[str, Future] = {}
+        self._fila: "queue.Queue" = queue.Queue()
+        self._worker: Optional[threading.Thread] = None
+
+    def _carregar(self, classe, nome: str):
+        return classe.from_pretrained(nome, cache_dir=self.cache_dir,
+                                      local_files_only=self.local_files_only)
+
+    def load_models(self) -> bool:
+        """
+        Carrega os modelos, importando torch/transformers apenas neste momento.
+        Chamadas repetidas não recarregam os modelos.
+
+        Returns:
+            bool: True se os modelos estão disponíveis.
+        """
+        with self._lock:
+            if self._modelos_carregados:
+                return self._modelos is not None
+            self._modelos_carregados = True
+            if not ml_disponivel():
+                logging.error("Sugestões com IA indisponíveis: instale os pacotes de "
+                              "requirements-ml.txt (torch e transformers).")
+                self._modelos = None
+                return False
+            try:
+                logging.info("Carregando modelos de geração e de sentimento...")
+                import torch
+                from transformers import (AutoModelForCausalLM,
+                                          AutoModelForSequenceClassification,
+                                          AutoTokenizer)
+                gerador = self._carregar(AutoModelForCausalLM, self.generator_model)
+                tokenizer_gerador = self._carregar(AutoTokenizer, self.generator_model)
+                # O GPT-2 não tem token de preenchimento; o lote é alinhado à esquerda
+                if tokenizer_gerador.pad_token is None:
+                    tokenizer_gerador.pad_token = tokenizer_gerador.eos_token
+                tokenizer_gerador.padding_side = "left"
+                sentimento = self._carregar(AutoModelForSequenceClassification,
+                                            self.sentiment_model)
+                tokenizer_sentimento = self._carregar(AutoTokenizer, self.sentiment_model)
+
+                gerador.eval()
+                sentimento.eval()
+                if self.quantizar:
+                    gerador = torch.quantization.quantize_dynamic(
+                        gerador, {torch.nn.Linear}, dtype=torch.qint8)
+                    sentimento = torch.quantization.quantize_dynamic(
+                        sentimento, {torch.nn.Linear}, dtype=torch.qint8)
+                self._modelos = {
+                    "gerador": gerador,
+                    "tokenizer_gerador": tokenizer_gerador,
+                    "sentimento": sentimento,
+                    "tokenizer_sentimento": tokenizer_sentimento,
+                }
+                logging.info("Modelos carregados com sucesso!")
+            except Exception as e:
+                logging.error(f"Erro ao carregar os modelos de IA: {e}")
+                self._modelos = None
+            return self._modelos is not None
+
+    @property
+    def modelos(self) -> Optional[Dict]:
+        """Modelos e tokenizadores, carregados no primeiro acesso."""
+        self.load_models()
+        return self._modelos
+
+    def submit(self, prompt: str) -> Future:
+        """
+        Enfileira um prompt para o próximo micro-lote.
+
+        Args:
+            prompt: Texto enviado ao modelo de geração.
+
+        Returns:
+            Future: Resolvido com a Resposta (ou com a exceção da inferência).
+        """
+        chave = normalizar_prompt(prompt)
+        with self._lock:
+            if chave in self._cache:
+                metrics.count("ocb_cache_hits_total", camada="inferencia")
+                self._cache.move_to_end(chave)
+                futuro = Future()
+                futuro.set_result(self._cache[chave])
+                return futuro
+            if chave in self._pendentes:
+                return self._pendentes[chave]
+            metrics.count("ocb_cache_misses_total", camada="inferencia")
+            futuro = Future()
+            self._pendentes[chave] = futuro
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._processar_fila,
+                                                name="ocb-inferencia", daemon=True)
+                self._worker.start()
+        self._fila.put((chave, prompt))
+        return futuro
+
+    def gerar(self, prompt: str, timeout: Optional[float] = None) -> Resposta:
+        """Gera a resposta para um prompt, bloqueando até o resultado."""
+        return self.submit(prompt).result(timeout)
+
+    async def gerar_async(self, prompt: str) -> Resposta:
+        """Gera a resposta para um prompt sem bloquear o loop de eventos."""
+        return await asyncio.wrap_future(self.submit(prompt))
+
+    def _processar_fila(self):
+        """Laço da thread de trabalho: forma micro-lotes e executa a inferência."""
+        while True:
+            lote = [self._fila.get()]
+            # Aguarda brevemente outros prompts para completar o lote
+            while len(lote) < self.max_batch_size:
+                try:
+                    lote.append(self._fila.get(timeout=self.batch_wait))
+                except queue.Empty:
+                    break
+            chaves = [chave for chave, _ in lote]
+            metrics.observe("ocb_inference_batch_size", len(lote))
+            try:
+                with metrics.span("inferencia.lote", tamanho=len(lote)):
+                    respostas = self._inferir([prompt for _, prompt in lote])
+            except Exception as e:
+                logging.error(f"Erro na inferência do lote: {e}")
+                with self._lock:
+                    futuros = [self._pendentes.pop(chave) for chave in chaves]
+                for futuro in futuros:
+                    futuro.set_exception(e)
+                continue
+            with self._lock:
+                futuros = [self._pendentes.pop(chave) for chave in chaves]
+                for chave, resposta in zip(chaves, respostas):
+                    self._cache[chave] = resposta
+                    self._cache.move_to_end(chave)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+            for futuro, resposta in zip(futuros, respostas):
+                futuro.set_result(resposta)
+
+    def _inferir(self, prompts: List[str]) -> List[Resposta]:
+        """Gera os textos e classifica o sentimento de um lote de prompts."""
+        modelos = self.modelos
+        if modelos is None:
+            raise RuntimeError("Modelos de IA não disponíveis.")
+        import torch
+
+        tokenizer = modelos["tokenizer_gerador"]
+        entradas = tokenizer(prompts, return_tensors="pt", padding=True)
+        with torch.inference_mode():
+            saidas = modelos["gerador"].generate(
+                **entradas, max_new_tokens=self.max_new_tokens, do_sample=False,
+                pad_token_id=tokenizer.pad_token_id)
+        # Mantém só o texto gerado, sem o prompt
+        textos = tokenizer.batch_decode(saidas[:, entradas["input_ids"].shape[1]:],
+                                        skip_special_tokens=True)
+
+        entradas = modelos["tokenizer_sentimento"](
+            textos, return_tensors="pt", padding=True, truncation=True)
+        with torch.inference_mode():
+            logits = modelos["sentimento"](**entradas).logits
+        sentimentos = (torch.argmax(logits, dim=-1) + 1).tolist()
+        return [Resposta(texto.strip(), int(sentimento))
+                for texto, sentimento in zip(textos, sentimentos)]
@@ -0,0 +1,272 @@
+# ocb/data/instrumentation.py
+import collections
+import contextlib
+import contextvars
+import json
+import os
+import sys
+import threading
+import time
+from typing import Dict, Iterator, Optional, Tuple
+
+# Instrumentação ligada por padrão? (OCB_METRICAS=1)
+ENABLED_BY_DEFAULT = os.environ.get("OCB_METRICAS") == "1"
+
+# Limites (em segundos) dos baldes dos histogramas
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Quantidade de spans mantidos para o trace em JSON
+MAX_TRACE_EVENTS = 10000
+
+Labels = Tuple[Tuple[str, str], ...]
+
+# Span corrente da tarefa/thread, para registrar o aninhamento
+_span_atual: contextvars.ContextVar = contextvars.ContextVar("ocb_span", default=None)
+
+
+def _labels(labels: Dict[str, object]) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+class _Histograma:
+    __slots__ = ("buckets", "contagens", "soma", "total")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.contagens = [0] * len(buckets)
+        self.soma = 0.0
+        self.total = 0
+
+    def observar(self, valor: float):
+        for i, limite in enumerate(self.buckets):
+            if valor <= limite:
+                self.contagens[i] += 1
+                break
+        self.soma += valor
+        self.total += 1
+
+
+class Metrics:
+    """
+    Contadores, histogramas e spans de tempo do pipeline de requisições.
+
+    Desligada, cada chamada é um teste de booleano seguido de retorno (span
+    devolve um contexto nulo compartilhado), de modo que a instrumentação
+    pode ficar nos caminhos críticos. Ligada, os dados podem ser exportados
+    no formato texto do Prometheus ou como um trace JSON (formato Trace Event,
+    aberto no chrome://tracing ou no Perfetto).
+    """
+
+    def __init__(self, enabled: bool = ENABLED_BY_DEFAULT, buckets=DEFAULT_BUCKETS):
+        self.enabled = enabled
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._contadores: Dict[Tuple[str, Labels], float] = collections.defaultdict(float)
+        self._histogramas: Dict[Tuple[str, Labels], _Histograma] = {}
+        self._eventos: collections.deque = collections.deque(maxlen=MAX_TRACE_EVENTS)
+        self._inicio = time.perf_counter()
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def reset(self):
+        """Descarta todas as medições."""
+        with self._lock:
+            self._contadores.clear()
+            self._histogramas.clear()
+            self._eventos.clear()
+
+    def count(self, nome: str, valor: float = 1, **labels):
+        """Incrementa um contador (ex.: count("ocb_cache_hits_total", camada="memoria"))."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._contadores[(nome, _labels(labels))] += valor
+
+    def observe(self, nome: str, valor: float, **labels):
+        """Registra uma observação em um histograma."""
+        if not self.enabled:
+            return
+        chave = (nome, _labels(labels))
+        with self._lock:
+            histograma = self._histogramas.get(chave)
+            if histograma is None:
+                histograma = self._histogramas[chave] = _Histograma(self.buckets)
+            histograma.observar(valor)
+
+    def span(self, nome: str, **atributos):
+        """
+        Mede o tempo de um trecho:
+
+            with metrics.span("analise"):
+                ...
+
+        A duração vai para o histograma ocb_span_seconds{span=nome} e para o trace.
+        """
+        if not self.enabled:
+            return _NULO
+        return self._span(nome, atributos)
+
+    @contextlib.contextmanager
+    def _span(self, nome: str, atributos: Dict) -> Iterator[None]:
+        pai = _span_atual.get()
+        token = _span_atual.set(nome)
+        inicio = time.perf_counter()
+        erro = None
+        try:
+            yield
+        except BaseException as e:
+            erro = type(e).__name__
+            raise
+        finally:
+            duracao = time.perf_counter() - inicio
+            _span_atual.reset(token)
+            self.observe("ocb_span_seconds", duracao, span=nome)
+            args = {k: str(v) for k, v in atributos.items()}
+            if pai is not None:
+                args["pai"] = pai
+            if erro is not None:
+                args["erro"] = erro
+            with self._lock:
+                self._eventos.append({
+                    "name": nome, "ph": "X", "pid": os.getpid(),
+                    "tid": threading.get_ident(),
+                    "ts": (inicio - self._inicio) * 1e6, "dur": duracao * 1e6,
+                    "args": args,
+                })
+
+    def export_prometheus(self) -> str:
+        """Exporta contadores e histogramas no formato texto do Prometheus."""
+        def rotulos(labels: Labels, extra: Labels = ()) -> str:
+            pares = labels + extra
+            if not pares:
+                return ""
+            return "{" + ",".join(f'{k}="{v}"' for k, v in pares) + "}"
+
+        linhas = []
+        with self._lock:
+            contadores = sorted(self._contadores.items())
+            histogramas = sorted(self._histogramas.items(), key=lambda item: item[0])
+            vistos = set()
+            for (nome, labels), valor in contadores:
+                if nome not in vistos:
+                    linhas.append(f"# TYPE {nome} counter")
+                    vistos.add(nome)
+                linhas.append(f"{nome}{rotulos(labels)} {valor:g}")
+            for (nome, labels), histograma in histogramas:
+                if nome not in vistos:
+                    linhas.append(f"# TYPE {nome} histogram")
+                    vistos.add(nome)
+                acumulado = 0
+                for limite, contagem in zip(histograma.buckets, histograma.contagens):
+                    acumulado += contagem
+                    linhas.append(f"{nome}_bucket{rotulos(labels, (('le', f'{limite:g}'),))} "
+                                  f"{acumulado}")
+                linhas.append(f"{nome}_bucket{rotulos(labels, (('le', '+Inf'),))} "
+                              f"{histograma.total}")
+                linhas.append(f"{nome}_sum{rotulos(labels)} {histograma.soma:.6f}")
+                linhas.append(f"{nome}_count{rotulos(labels)} {histograma.total}")
+        return "\n".join(linhas) + "\n"
+
+    def export_trace(self, caminho: Optional[str] = None) -> Dict:
+        """
+        Exporta os spans registrados no formato Trace Event (JSON).
+
+        Args:
+            caminho: Se informado, grava o trace neste arquivo.
+
+        Returns:
+            Dict: O trace ({"traceEvents": [...]}).
+        """
+        with self._lock:
+            trace = {"traceEvents": list(self._eventos), "displayTimeUnit": "ms"}
+        if caminho is not None:
+            with open(caminho, "w", encoding="utf-8") as arquivo:
+                json.dump(trace, arquivo)
+        return trace
+
+
+class _SpanNulo:
+    """Contexto sem efeito, devolvido por span() com a instrumentação desligada."""
+    __slots__ = ()
+
+    def __enter__(self):
+        return None
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULO = _SpanNulo()
+
+
+class SamplingProfiler:
+    """
+    Profiler por amostragem, opcional: uma thread lê a pilha de todas as
+    outras threads a cada intervalo e acumula as pilhas no formato "folded"
+    (uma linha por pilha com a contagem), usado por flamegraph.pl e speedscope.
+    Não altera o código medido; o custo é proporcional à frequência.
+    """
+
+    def __init__(self, intervalo: float = 0.005):
+        """
+        Args:
+            intervalo: Segundos entre as amostras.
+        """
+        self.intervalo = intervalo
+        self.amostras: collections.Counter = collections.Counter()
+        self._parar = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._parar.clear()
+        self._thread = threading.Thread(target=self._amostrar, name="ocb-profiler",
+                                        daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._parar.set()
+        self._thread.join()
+        self._thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+    def _amostrar(self):
+        proprio = threading.get_ident()
+        while not self._parar.wait(self.intervalo):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == proprio:
+                    continue
+                pilha = []
+                while frame is not None:
+                    codigo = frame.f_code
+                    pilha.append(f"{codigo.co_name} ({os.path.basename(codigo.co_filename)}"
+                                 f":{codigo.co_firstlineno})")
+                    frame = frame.f_back
+                self.amostras[";".join(reversed(pilha))] += 1
+
+    def folded(self) -> str:
+        """Pilhas acumuladas no formato folded."""
+        return "\n".join(f"{pilha} {contagem}"
+                         for pilha, contagem in self.amostras.most_common()) + "\n"
+
+    def save(self, caminho: str):
+        with open(caminho, "w", encoding="utf-8") as arquivo:
+            arquivo.write(self.folded())
+
+
+# Instância compartilhada pelo processo
+metrics = Metrics()
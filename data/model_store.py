@@ -0,0 +1,90 @@
+# ocb/data/model_store.py
+import hashlib
+import logging
+import os
+import pickle
+import tempfile
+from typing import Any, Optional
+import pandas as pd
+
+# Diretório padrão dos modelos persistidos
+DEFAULT_MODEL_DIR = ".ocb_models"
+
+
+def hash_dados(*frames: pd.DataFrame) -> str:
+    """
+    Calcula uma assinatura estável do conteúdo de um ou mais DataFrames.
+
+    Args:
+        frames: DataFrames usados no treinamento.
+
+    Returns:
+        str: Hash SHA-256 (hexadecimal) das colunas e dos valores.
+    """
+    resumo = hashlib.sha256()
+    for frame in frames:
+        resumo.update(repr(list(frame.columns)).encode("utf-8"))
+        resumo.update(pd.util.hash_pandas_object(frame, index=True).values.tobytes())
+    return resumo.hexdigest()
+
+
+class ModelStore:
+    """
+    Armazena em disco modelos treinados e seus pipelines de features.
+
+    Cada estado é salvo sob a chave do hash dos dados que o originaram e
+    também como o estado mais recente do namespace, a partir do qual novos
+    dados podem ser incorporados incrementalmente.
+    """
+
+    def __init__(self, diretorio: str = DEFAULT_MODEL_DIR):
+        """
+        Inicializa o repositório de modelos.
+
+        Args:
+            diretorio: Diretório onde os modelos serão gravados.
+        """
+        self.diretorio = diretorio
+        os.makedirs(diretorio, exist_ok=True)
+
+    def _caminho(self, namespace: str, chave: str) -> str:
+        return os.path.join(self.diretorio, f"{namespace}-{chave}.pkl")
+
+    def load(self, namespace: str, chave: str) -> Optional[Any]:
+        """
+        Carrega um estado salvo.
+
+        Args:
+            namespace: Grupo do modelo (ex.: "limites").
+            chave: Hash dos dados ou "latest".
+
+        Returns:
+            Optional[Any]: Estado salvo, ou None se não existir ou estiver corrompido.
+        """
+        caminho = self._caminho(namespace, chave)
+        if not os.path.exists(caminho):
+            return None
+        try:
+            with open(caminho, "rb") as arquivo:
+                return pickle.load(arquivo)
+        except Exception as e:
+            logging.warning(f"Modelo salvo em '{caminho}' ignorado: {e}")
+            return None
+
+    def load_latest(self, namespace: str) -> Optional[Any]:
+        """Carrega o estado mais recente do namespace."""
+        return self.load(namespace, "latest")
+
+    def save(self, namespace: str, chave: str, estado: Any):
+        """
+        Salva um estado sob a chave informada e como o mais recente do namespace.
+
+        A gravação é atômica: o arquivo é escrito em um temporário e renomeado.
+        """
+        conteudo = pickle.dumps(estado, protocol=pickle.HIGHEST_PROTOCOL)
+        for destino in (chave, "latest"):
+            descritor, temporario = tempfile.mkstemp(dir=self.diretorio,
+                                                     suffix=".tmp")
+            with os.fdopen(descritor, "wb") as arquivo:
+                arquivo.write(conteudo)
+            os.replace(temporario, self._caminho(namespace, destino))
@@ -0,0 +1,238 @@
+# ocb/data/payment_optimizer.py
+import json
+import logging
+from typing import Mapping, NamedTuple, Optional, Sequence
+import numpy as np
+import pandas as pd
+from data.rule_engine import RuleEngine
+from data.sheet_parser import normalizar_nome
+
+# Formas de pagamento que consomem o limite do cartão de crédito
+FORMAS_CREDITO = ("Cartão de Crédito",)
+
+# Maior parcelamento considerado
+MAX_PARCELAS = 24
+
+# Condições padrão: desconto no Pix e no dinheiro, cartão de crédito sem juros
+# até 12x e com juros (tabela Price, taxa mensal) de 13x a 24x
+CONDICOES_PADRAO = [
+    {"forma_pagamento": "Pix", "desconto": 0.05},
+    {"forma_pagamento": "Dinheiro", "desconto": 0.05},
+    {"forma_pagamento": "Cartão de Débito"},
+    {"forma_pagamento": "Cartão de Crédito", "parcelas_max": 12},
+    {"forma_pagamento": "Cartão de Crédito", "parcelas_min": 13,
+     "parcelas_max": MAX_PARCELAS, "taxa_juros": 0.0199},
+]
+
+
+class CondicaoPagamento(NamedTuple):
+    """Faixa de parcelamento de uma forma de pagamento, com juros e desconto."""
+    forma_pagamento: str
+    parcelas_min: int = 1
+    parcelas_max: int = 1
+    # Taxa de juros mensal (tabela Price) e desconto sobre o valor da compra
+    taxa_juros: float = 0.0
+    desconto: float = 0.0
+
+
+class PlanoPagamento(NamedTuple):
+    """Plano de pagamento escolhido pelo otimizador."""
+    forma_pagamento: str
+    parcelas: int
+    valor_parcela: float
+    custo_total: float
+    taxa_juros: float
+    desconto: float
+    # Menor saldo projetado no horizonte, já descontadas as parcelas
+    saldo_minimo: float
+
+    def descrever(self, valor_compra: float) -> str:
+        """Descrição textual do plano para a interface."""
+        if self.parcelas == 1:
+            texto = f"{self.forma_pagamento} à vista, R$ {self.custo_total:.2f}"
+        else:
+            texto = (f"{self.forma_pagamento} em {self.parcelas}x de "
+                     f"R$ {self.valor_parcela:.2f} (total R$ {self.custo_total:.2f})")
+        if self.custo_total < valor_compra:
+            texto += f", economia de R$ {valor_compra - self.custo_total:.2f}"
+        elif self.custo_total > valor_compra:
+            texto += f", R$ {self.custo_total - valor_compra:.2f} de juros"
+        return texto + "."
+
+
+class PaymentOptimizer:
+    """
+    Escolhe o plano de pagamento mais barato para uma compra.
+
+    As condições (formas de pagamento, faixas de parcelas, juros e descontos)
+    são expandidas uma única vez em vetores com um candidato por forma e
+    número de parcelas. Cada busca avalia todos os candidatos de uma vez,
+    com NumPy, sobre a linha do tempo de saldos da projeção de fluxo de
+    caixa (matriz candidatos x meses): é escolhido o de menor custo total
+    entre os que mantêm o saldo projetado não negativo em todos os meses e
+    cabem no limite do cartão. Com poucas dezenas de candidatos, a busca
+    leva microssegundos e pode ser refeita a cada tecla digitada.
+    """
+
+    def __init__(self, condicoes: Optional[Sequence[Mapping]] = None):
+        """
+        Args:
+            condicoes: Condições de pagamento (dicionários com forma_pagamento
+                e, opcionalmente, parcelas_min, parcelas_max, taxa_juros e
+                desconto); se None, valem as CONDICOES_PADRAO.
+        """
+        self.condicoes = [self._compilar(c) for c in
+                          (CONDICOES_PADRAO if condicoes is None else condicoes)]
+        formas, parcelas, taxas, descontos = [], [], [], []
+        for condicao in self.condicoes:
+            n = np.arange(condicao.parcelas_min, condicao.parcelas_max + 1)
+            formas += [condicao.forma_pagamento] * n.size
+            parcelas.append(n)
+            taxas.append(np.full(n.size, condicao.taxa_juros))
+            descontos.append(np.full(n.size, condicao.desconto))
+        self.formas = np.array(formas, dtype=object)
+        self.parcelas = np.concatenate(parcelas) if parcelas else np.zeros(0, dtype=int)
+        self.taxas = np.concatenate(taxas) if taxas else np.zeros(0)
+        self.descontos = np.concatenate(descontos) if descontos else np.zeros(0)
+        self.credito = np.isin(self.formas, FORMAS_CREDITO)
+        self._formas_normalizadas = np.array([normalizar_nome(f) for f in formas], dtype=object)
+        # Custo total por real de compra: desconto, juros da tabela Price ou nenhum
+        with np.errstate(divide="ignore", invalid="ignore"):
+            fator_price = np.where(self.taxas > 0,
+                                   self.taxas / (1 - (1 + self.taxas) ** -self.parcelas),
+                                   1 / self.parcelas)
+        self.fator_custo = fator_price * self.parcelas * (1 - self.descontos)
+
+    @classmethod
+    def from_file(cls, caminho: str) -> "PaymentOptimizer":
+        """
+        Carrega as condições de um arquivo JSON: uma lista de condições ou
+        um objeto com a chave "condicoes".
+        """
+        with open(caminho, encoding="utf-8") as arquivo:
+            conteudo = json.load(arquivo)
+        condicoes = conteudo.get("condicoes", []) if isinstance(conteudo, dict) else conteudo
+        otimizador = cls(condicoes)
+        logging.info(f"{len(otimizador)} planos de pagamento carregados de '{caminho}'.")
+        return otimizador
+
+    @staticmethod
+    def _compilar(definicao: Mapping) -> CondicaoPagamento:
+        """Valida uma condição declarada."""
+        forma = definicao.get("forma_pagamento")
+        if not forma:
+            raise ValueError("Condição de pagamento sem 'forma_pagamento'.")
+        minimo = int(definicao.get("parcelas_min", 1))
+        maximo = int(definicao.get("parcelas_max", minimo))
+        if not 1 <= minimo <= maximo <= MAX_PARCELAS:
+            raise ValueError(f"Faixa de parcelas inválida para '{forma}': {minimo}-{maximo}.")
+        taxa = float(definicao.get("taxa_juros", 0.0))
+        desconto = float(definicao.get("desconto", 0.0))
+        if taxa < 0 or not 0 <= desconto < 1:
+            raise ValueError(f"Juros ou desconto inválidos para '{forma}'.")
+        return CondicaoPagamento(forma, minimo, maximo, taxa, desconto)
+
+    def __len__(self) -> int:
+        return self.parcelas.size
+
+    def avaliar(self, valor_compra: float, saldos: np.ndarray, limite_credito: float,
+                formas_pagamento: Optional[Sequence[str]] = None,
+                regras: Optional[RuleEngine] = None,
+                contexto: Optional[Mapping] = None) -> pd.DataFrame:
+        """
+        Avalia todos os planos de pagamento de uma compra.
+
+        A compra começa no mês corrente (mês 0 da projeção); a parcela k é
+        paga no mês k - 1, como em CashFlowProjection.mes_viavel. Se o
+        parcelamento passa do fim da projeção, o último saldo projetado é
+        repetido nos meses seguintes, para que todas as parcelas contem.
+
+        Args:
+            valor_compra: Valor da compra, em reais.
+            saldos: Saldo projetado mês a mês, em centavos (CashFlowProjection.saldo).
+            limite_credito: Limite disponível no cartão, em reais.
+            formas_pagamento: Se informadas, só estas formas são consideradas.
+            regras: Se informado, os planos também precisam ser aprovados
+                pelas regras de bloqueio (com a taxa de juros de cada plano).
+            contexto: Variáveis adicionais para as regras (ex.: contexto_categoria).
+
+        Returns:
+            pd.DataFrame: Um plano por linha, com as colunas forma_pagamento,
+            parcelas, taxa_juros, desconto, valor_parcela, custo_total,
+            saldo_minimo e viavel.
+        """
+        if valor_compra <= 0:
+            raise ValueError("Valor da compra inválido.")
+        custo = valor_compra * self.fator_custo
+        parcela = custo / self.parcelas
+
+        # Horizonte estendido até a última parcela do maior parcelamento
+        saldos = np.asarray(saldos, dtype=float)
+        meses = max(len(saldos), int(self.parcelas.max(initial=0)))
+        if len(saldos) and meses > len(saldos):
+            saldos = np.concatenate([saldos, np.full(meses - len(saldos), saldos[-1])])
+
+        # Parcelas já pagas em cada mês do horizonte (candidatos x meses)
+        t = np.arange(len(saldos))
+        pagas = np.minimum(t[None, :] + 1, self.parcelas[:, None])
+        saldo_apos = saldos[None, :] / 100 - pagas * parcela[:, None]
+        saldo_minimo = saldo_apos.min(axis=1) if len(saldos) else np.zeros(len(self))
+
+        viavel = (saldo_minimo >= 0) & (~self.credito | (valor_compra <= limite_credito))
+        if formas_pagamento is not None:
+            viavel &= np.isin(self._formas_normalizadas,
+                              [normalizar_nome(f) for f in formas_pagamento])
+        if regras is not None:
+            viavel &= regras.avaliar({
+                "valor_compra": valor_compra,
+                "parcelas": self.parcelas,
+                "saldo_atual": float(saldos[0]) / 100 if len(saldos) else 0.0,
+                "limite_credito": limite_credito,
+                "forma_pagamento": self.formas,
+                "taxa_juros": self.taxas,
+                **(contexto or {}),
+            }).aprovada
+
+        return pd.DataFrame({
+            "forma_pagamento": self.formas,
+            "parcelas": self.parcelas,
+            "taxa_juros": self.taxas,
+            "desconto": self.descontos,
+            "valor_parcela": parcela,
+            "custo_total": custo,
+            "saldo_minimo": saldo_minimo,
+            "viavel": viavel,
+        })
+
+    def otimizar(self, valor_compra: float, saldos: np.ndarray, limite_credito: float,
+                 **kwargs) -> Optional[PlanoPagamento]:
+        """
+        Retorna o plano viável de menor custo total.
+
+        Entre planos de mesmo custo (ex.: 1x a 12x sem juros), prefere o que
+        deixa a maior folga no saldo projetado.
+
+        Args:
+            **kwargs: Demais argumentos de avaliar (formas_pagamento, regras, contexto).
+
+        Returns:
+            Optional[PlanoPagamento]: O melhor plano, ou None se nenhum for viável.
+        """
+        planos = self.avaliar(valor_compra, saldos, limite_credito, **kwargs)
+        candidatos = np.flatnonzero(planos["viavel"].to_numpy())
+        if candidatos.size == 0:
+            return None
+        # Centavos arredondados: diferenças de ponto flutuante não desempatam
+        custo = np.round(planos["custo_total"].to_numpy()[candidatos], 2)
+        folga = planos["saldo_minimo"].to_numpy()[candidatos]
+        melhor = candidatos[np.lexsort((-folga, custo))[0]]
+        linha = planos.iloc[melhor]
+        return PlanoPagamento(
+            forma_pagamento=linha["forma_pagamento"],
+            parcelas=int(linha["parcelas"]),
+            valor_parcela=float(linha["valor_parcela"]),
+            custo_total=float(linha["custo_total"]),
+            taxa_juros=float(linha["taxa_juros"]),
+            desconto=float(linha["desconto"]),
+            saldo_minimo=float(linha["saldo_minimo"]),
+        )
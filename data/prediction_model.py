@@ -1,19 +1,111 @@
+import numpy as np
 import pandas as pd
-from sklearn.model_selection import train_test_split
-from sklearn.linear_model import LinearRegression
-from typing import List, Dict
+from typing import List, Dict, Optional
 import logging
+from data.feature_pipeline import MonthlyFeaturePipeline
+from data.instrumentation import metrics
+from data.model_store import ModelStore, hash_dados
+from data.sheet_parser import (DESPESA_SCHEMA, RECEITA_SCHEMA, RESUMO_SCHEMA,
+                               SheetTable)
 
 # Configurar o logger para exibir mensagens informativas
 logging.basicConfig(level=logging.INFO)
 
+# Alvos previstos pelo modelo multi-saída
+TARGETS = ["credit_limit", "debit_limit"]
+
+# Versão do formato do estado salvo; estados de outra versão são descartados
+VERSAO_ESTADO = 3
+
+
+def _mesma_amostra(anterior, atual) -> bool:
+    """Indica se a contribuição (features, alvos) de um mês não mudou."""
+    return np.array_equal(anterior[0], atual[0]) and np.array_equal(anterior[1], atual[1])
+
+
+class IncrementalLinearRegression:
+    """
+    Regressão linear (mínimos quadrados com intercepto) treinada de forma incremental.
+
+    Mantém apenas as estatísticas suficientes (contagem, somas e produtos
+    cruzados), de modo que novas amostras são incorporadas com partial_fit
+    sem retreinar a partir do histórico completo.
+    """
+
+    def __init__(self):
+        self.n = 0
+        self.soma_x = None
+        self.soma_y = None
+        self.xtx = None
+        self.xty = None
+        self.coef_ = None
+        self.intercept_ = None
+
+    def partial_fit(self, X, y, sample_weight=None) -> "IncrementalLinearRegression":
+        """
+        Incorpora novas amostras ao modelo.
+
+        Args:
+            X: Matriz de features (n_amostras x n_features).
+            y: Alvo (n_amostras) ou alvos (n_amostras x n_alvos).
+            sample_weight: Peso de cada amostra; peso -1 remove uma amostra
+                incorporada anteriormente.
+
+        Returns:
+            IncrementalLinearRegression: O próprio modelo.
+        """
+        X = np.asarray(X, dtype=float)
+        y = np.asarray(y, dtype=float)
+        if y.ndim == 1:
+            y = y[:, None]
+        w = np.ones(X.shape[0]) if sample_weight is None \
+            else np.asarray(sample_weight, dtype=float)
+        if self.soma_x is None:
+            self.soma_x = np.zeros(X.shape[1])
+            self.soma_y = np.zeros(y.shape[1])
+            self.xtx = np.zeros((X.shape[1], X.shape[1]))
+            self.xty = np.zeros((X.shape[1], y.shape[1]))
+        self.n += w.sum()
+        self.soma_x += w @ X
+        self.soma_y += w @ y
+        self.xtx += (X * w[:, None]).T @ X
+        self.xty += (X * w[:, None]).T @ y
+        if self.n > 0:
+            self._solve()
+        return self
+
+    def _solve(self):
+        """Recalcula coeficientes e intercepto a partir das estatísticas suficientes."""
+        media_x = self.soma_x / self.n
+        media_y = self.soma_y / self.n
+        cov_xx = self.xtx - self.n * np.outer(media_x, media_x)
+        cov_xy = self.xty - self.n * np.outer(media_x, media_y)
+        coef = np.linalg.lstsq(cov_xx, cov_xy, rcond=None)[0]
+        self.coef_ = coef.T
+        self.intercept_ = media_y - media_x @ coef
+
+    def predict(self, X) -> np.ndarray:
+        """Prevê o(s) alvo(s) para as features informadas."""
+        if self.n <= 0:
+            raise ValueError("Modelo ainda não treinado.")
+        previsao = np.asarray(X, dtype=float) @ self.coef_.T + self.intercept_
+        return previsao[:, 0] if previsao.shape[1] == 1 else previsao
+
 
 class PredictionModel:
     """
     Treina e utiliza um modelo de Machine Learning para prever limites de crédito e débito.
+
+    As transações são agregadas por mês (MonthlyFeaturePipeline) e um único
+    estimador multi-saída é ajustado para os dois limites de uma vez.
+
+    Com um ModelStore, os modelos treinados são persistidos em disco sob o hash
+    dos dados: dados inalterados recarregam o modelo instantaneamente e meses
+    novos ou alterados são atualizados de forma incremental no último modelo salvo.
     """
 
-    def __init__(self, receitas: List[Dict], despesas: List[Dict], resumo: List[Dict]):
+    def __init__(self, receitas: List[Dict], despesas: List[Dict], resumo: List[Dict],
+                 model_store: Optional[ModelStore] = None, namespace: str = "limites"):
         """
         Inicializa o PredictionModel.
 
@@ -21,96 +113,164 @@ class PredictionModel:
             receitas: Lista de dicionários contendo dados de receitas.
             despesas: Lista de dicionários contendo dados de despesas.
             resumo: Lista de dicionários contendo dados do resumo.
+            model_store: Repositório de modelos persistidos; se None, treina em memória.
+            namespace: Nome sob o qual os modelos são persistidos.
         """
         logging.info("Inicializando modelo de previsão.")
         self.receitas = pd.DataFrame(receitas)
         self.despesas = pd.DataFrame(despesas)
         self.resumo = pd.DataFrame(resumo)
-        # Treinar os modelos durante a inicialização
-        self.model_credito = self._train_model("credit_limit")
-        self.model_debito = self._train_model("debit_limit")
+        self.model_store = model_store
+        self.namespace = namespace
+        self.pipeline = MonthlyFeaturePipeline()
+
+        # As features são preparadas uma única vez e reutilizadas na previsão
+        with metrics.span("previsao.features"):
+            self._dados = self._prepare_data()
+        self.features = self.pipeline.colunas
+        self.chave_dados = hash_dados(self.receitas, self.despesas, self.resumo)
+
+        with metrics.span("previsao.treino"):
+            estado = self._load_state()
+        self.model = estado["modelo"]
 
     def _prepare_data(self) -> pd.DataFrame:
         """
         Prepara os dados para o treinamento do modelo.
 
         Returns:
-            pd.DataFrame: DataFrame com as features de entrada para o modelo.
+            pd.DataFrame: Uma linha por mês com as features de entrada e as
+            colunas alvo ('credit_limit' e 'debit_limit').
         """
+        receitas = SheetTable.from_frame(self.receitas, RECEITA_SCHEMA)
+        despesas = SheetTable.from_frame(self.despesas, DESPESA_SCHEMA)
+        data = self.pipeline.transform(receitas, despesas)
 
-        # Criar uma CÓPIA do DataFrame 'self.receitas'
-        receitas = self.receitas.copy()
-
-        # Converter as colunas 'Valor da Receita' para numérico, tratando erros
-        receitas['Valor da Receita'] = pd.to_numeric(
-            receitas['Valor da Receita'], errors='coerce')
-        self.despesas['Valor da Despesa'] = pd.to_numeric(
-            self.despesas['Valor da Despesa'], errors='coerce')
-
-        # Aplicar One-Hot Encoding na CÓPIA do DataFrame 'receitas'
-        receitas = pd.get_dummies(receitas, columns=['Categoria da Receita'])
-
-        # Calcula o total de receitas e despesas
-        total_receitas = receitas['Valor da Receita'].sum()
-        total_despesas = self.despesas['Valor da Despesa'].sum()
-
-        # Crie um DataFrame com as features
-        data = pd.DataFrame({
-            'total_receitas': [total_receitas],
-            'total_despesas': [total_despesas],
-            # Adicione outras features relevantes aqui, como médias, proporções, etc.
-        })
-
-        # Extraia os valores das colunas e converta para float
-        data['credit_limit'] = float(self.resumo['credit_limit'].iloc[0].replace(
-            ',', '.')) if 'credit_limit' in self.resumo else None
-        data['debit_limit'] = float(self.resumo['debit_limit'].iloc[0].replace(
-            ',', '.')) if 'debit_limit' in self.resumo else None
+        alvos = self._targets(data.index)
+        for target_column in TARGETS:
+            data[target_column] = alvos[target_column]
 
         # Verificar e tratar valores NaN
         if data.isnull().values.any():
             logging.warning(
                 "Existem valores NaN no DataFrame. Substituindo por 0.")
-            data.fillna(0, inplace=True)  # Substituir NaN por 0
+            data = data.fillna(0)  # Substituir NaN por 0
 
         return data
 
-    def _train_model(self, target_column: str) -> LinearRegression:
+    def _targets(self, meses: pd.PeriodIndex) -> pd.DataFrame:
         """
-        Treina um modelo de regressão linear para prever o limite de crédito ou débito.
+        Alinha os limites do resumo aos meses das features.
 
-        Args:
-            target_column: Nome da coluna alvo no DataFrame de dados ('credit_limit' ou 'debit_limit').
+        Se o resumo tiver uma coluna de data, cada mês recebe o último limite
+        informado até ele; caso contrário, o limite atual vale para todos os meses.
+        """
+        alvos = pd.DataFrame(index=meses, columns=TARGETS, dtype=float)
+        if self.resumo.empty:
+            return alvos
+        resumo = SheetTable.from_frame(self.resumo, RESUMO_SCHEMA)
+        valores = {alvo: resumo.column(alvo).astype("Float64") / 100
+                   for alvo in TARGETS if alvo in resumo}
+        if not valores:
+            return alvos
+        historico = pd.DataFrame(valores).astype(float)
+        if "Data de Referência" in resumo \
+                and resumo.column("Data de Referência").notna().any():
+            historico.index = resumo.column("Data de Referência").dt.to_period("M")
+            historico = historico[historico.index.notna()]
+            historico = historico.groupby(level=0).last().sort_index()
+            alinhado = historico.reindex(historico.index.union(meses)).ffill().bfill()
+            return alinhado.reindex(meses).reindex(columns=TARGETS)
+        for alvo, serie in historico.items():
+            alvos[alvo] = serie.iloc[-1]
+        return alvos
 
-        Returns:
-            LinearRegression: Modelo treinado.
+    def _new_state(self) -> Dict:
+        """Cria um estado vazio: modelo não treinado e pipeline de features."""
+        return {
+            "versao": VERSAO_ESTADO,
+            "pipeline": self.pipeline,
+            "features": list(self.features),
+            "modelo": IncrementalLinearRegression(),
+            # Contribuição (features e alvos) de cada mês incorporado ao modelo
+            "amostras": {},
+        }
+
+    def _load_state(self) -> Dict:
         """
-        data = self._prepare_data()
+        Obtém o modelo para os dados atuais.
 
-        # Verificar se a coluna alvo existe
-        if target_column not in data.columns:
-            raise ValueError(
-                f"Coluna alvo '{target_column}' não encontrada nos dados.")
+        Procura primeiro o estado salvo para o hash dos dados; na falta dele,
+        parte do último estado salvo e incorpora apenas os meses novos.
+        """
+        estado = None
+        if self.model_store is not None:
+            estado = self.model_store.load(self.namespace, self.chave_dados)
+            if self._compatible(estado):
+                logging.info("Modelos carregados do disco.")
+                metrics.count("ocb_cache_hits_total", camada="modelo")
+                return estado
+            estado = self.model_store.load_latest(self.namespace)
+        if not self._compatible(estado):
+            estado = self._new_state()
 
-        # Adaptar as features conforme necessário
-        features = ["total_receitas", "total_despesas"]
-        X = data[features]
+        self._update_state(estado)
+        if self.model_store is not None:
+            self.model_store.save(self.namespace, self.chave_dados, estado)
+        return estado
 
-        # Defina a coluna alvo (limite de crédito ou débito)
-        y = data[target_column]
+    def _compatible(self, estado) -> bool:
+        """Indica se um estado salvo pode ser reutilizado com as features atuais."""
+        return estado is not None and estado.get("versao") == VERSAO_ESTADO \
+            and estado.get("features") == self.features
 
-        # Divisão treino/teste
-        # X_train, _, y_train, _ = train_test_split(
-        #    X, y, test_size=0.1, random_state=42)
+    def _update_state(self, estado: Dict):
+        """
+        Atualiza o modelo do estado com os meses novos ou alterados.
 
-        X_train = X
-        y_train = y
+        As features de um mês dependem dos meses anteriores, então lançamentos
+        novos ou editados podem mudar a linha de qualquer mês, não só a do mais
+        recente. Cada mês cuja linha mudou tem a contribuição antiga removida
+        (peso -1) e a atual incorporada; meses que deixaram de existir são só
+        removidos. Se a maior parte dos meses mudou, o modelo é refeito do zero.
+        """
+        anteriores = estado["amostras"]
+        X = self._dados[self.features].to_numpy(dtype=float)
+        y = self._dados[TARGETS].to_numpy(dtype=float)
+        meses = self._dados.index.astype(str)
+        atuais = {mes: (X[i], y[i]) for i, mes in enumerate(meses)}
 
-        # Criação e treinamento do modelo
-        model = LinearRegression()
-        model.fit(X_train, y_train)
+        alterados = np.array([mes not in anteriores or not _mesma_amostra(anteriores[mes],
+                                                                           atuais[mes])
+                              for mes in meses], dtype=bool)
+        removidos = [amostra for mes, amostra in anteriores.items()
+                     if mes not in atuais or not _mesma_amostra(amostra, atuais[mes])]
+        if len(removidos) > len(meses) // 2:
+            logging.info("Histórico alterado em muitos meses: refazendo o modelo.")
+            estado["modelo"] = IncrementalLinearRegression()
+            alterados[:] = True
+        elif removidos:
+            estado["modelo"].partial_fit(np.array([X_mes for X_mes, _ in removidos]),
+                                         np.array([y_mes for _, y_mes in removidos]),
+                                         sample_weight=-np.ones(len(removidos)))
+        if alterados.any():
+            self._train_model(estado["modelo"], alterados)
+        estado["amostras"] = atuais
+        logging.info(f"Modelo atualizado: {int(alterados.sum())} mês(es) incorporado(s), "
+                     f"{len(removidos)} removido(s).")
 
-        return model
+    def _train_model(self, model: IncrementalLinearRegression, linhas: np.ndarray):
+        """
+        Ajusta o estimador multi-saída com as linhas (meses) selecionadas.
+
+        Args:
+            model: Modelo a atualizar incrementalmente.
+            linhas: Máscara booleana dos meses a incorporar.
+        """
+        data = self._dados[linhas]
+        X = data[self.features].to_numpy(dtype=float)
+        y = data[TARGETS].to_numpy(dtype=float)
+        model.partial_fit(X, y)
 
     def predict_limits(self) -> (float, float):
         """
@@ -120,11 +280,8 @@ class PredictionModel:
             Tuple[float, float]: Limite de crédito previsto, Limite de débito previsto.
         """
 
-        # Utiliza os modelos já treinados na inicialização
-        data = self._prepare_data()
-        limite_credito = self.model_credito.predict(
-            data[["total_receitas", "total_despesas"]])[0]
-        limite_debito = self.model_debito.predict(
-            data[["total_receitas", "total_despesas"]])[0]
+        # Utiliza o modelo e as features do mês mais recente já preparadas
+        X = self._dados[self.features].iloc[[-1]]
+        limite_credito, limite_debito = self.model.predict(X)[0]
 
         return limite_credito, limite_debito
@@ -0,0 +1,112 @@
+# ocb/data/refresh_scheduler.py
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Dict, List, Optional
+from data.async_loader import AsyncDataLoader
+
+# Intervalo padrão (em segundos) entre as verificações da planilha
+DEFAULT_REFRESH_INTERVAL = 60.0
+
+# Evento publicado quando a planilha muda: abas alteradas e horário
+Evento = Dict[str, object]
+Ouvinte = Callable[[Evento], Awaitable[None]]
+
+
+class RefreshScheduler:
+    """
+    Atualiza os dados da planilha em segundo plano.
+
+    Uma tarefa por loader (no modo servidor, uma por usuário) revalida a
+    planilha a cada intervalo, no pool de threads de E/S. Quando o conteúdo muda, os snapshots do
+    DataLoader, as tabelas convertidas e os agregados registrados são
+    recalculados fora do caminho das requisições, e as sessões abertas
+    recebem um evento "saldo atualizado".
+    """
+
+    def __init__(self, data_loader: AsyncDataLoader,
+                 intervalo: float = DEFAULT_REFRESH_INTERVAL):
+        """
+        Args:
+            data_loader: Loader compartilhado pelas sessões.
+            intervalo: Segundos entre as verificações da planilha.
+        """
+        self.data_loader = data_loader
+        self.intervalo = intervalo
+        self._derivados: List[Callable[[], object]] = []
+        self._ouvintes: List[Ouvinte] = []
+        self._tarefa: Optional[asyncio.Task] = None
+        self._lock: Optional[asyncio.Lock] = None
+
+    def add_derived(self, funcao: Callable[[], object]):
+        """
+        Registra um recálculo executado (no pool de E/S) quando os dados mudam,
+        ex.: rollups.refresh_from_loader.
+        """
+        self._derivados.append(funcao)
+
+    def subscribe(self, ouvinte: Ouvinte):
+        """Registra uma corrotina chamada a cada atualização dos dados."""
+        self._ouvintes.append(ouvinte)
+
+    def unsubscribe(self, ouvinte: Ouvinte):
+        """Remove um ouvinte (ex.: quando a sessão é encerrada)."""
+        if ouvinte in self._ouvintes:
+            self._ouvintes.remove(ouvinte)
+
+    @property
+    def running(self) -> bool:
+        return self._tarefa is not None and not self._tarefa.done()
+
+    def start(self):
+        """Inicia a tarefa de atualização no loop de eventos atual (idempotente)."""
+        if not self.running:
+            self._tarefa = asyncio.get_running_loop().create_task(self._executar())
+
+    async def stop(self):
+        """Interrompe a tarefa de atualização."""
+        if self.running:
+            self._tarefa.cancel()
+            try:
+                await self._tarefa
+            except asyncio.CancelledError:
+                pass
+        self._tarefa = None
+
+    async def _executar(self):
+        while True:
+            try:
+                await self.refresh_now()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.error(f"Erro na atualização em segundo plano: {e}")
+            await asyncio.sleep(self.intervalo)
+
+    async def refresh_now(self) -> List[str]:
+        """
+        Revalida a planilha imediatamente e notifica os ouvintes se ela mudou.
+
+        Returns:
+            List[str]: Abas cujo conteúdo mudou.
+        """
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            alteradas = await self.data_loader.refresh()
+            if not alteradas:
+                return alteradas
+            logging.info(f"Planilha atualizada em segundo plano: {', '.join(alteradas)}.")
+            for funcao in self._derivados:
+                await self.data_loader.run(funcao)
+        await self._publicar({"abas": alteradas, "atualizado_em": time.time()})
+        return alteradas
+
+    async def _publicar(self, evento: Evento):
+        """Entrega o evento a todos os ouvintes; a falha de um não afeta os demais."""
+        resultados = await asyncio.gather(
+            *(ouvinte(evento) for ouvinte in list(self._ouvintes)),
+            return_exceptions=True)
+        for resultado in resultados:
+            if isinstance(resultado, Exception):
+                logging.warning(f"Falha ao notificar sessão: {resultado}")
@@ -0,0 +1,355 @@
+# ocb/data/rule_engine.py
+import json
+import logging
+from typing import Callable, Dict, List, Mapping, NamedTuple, Optional, Sequence, Tuple
+import numpy as np
+from data.sheet_parser import normalizar_nome
+
+# Severidades: regras "bloqueio" negam a compra; regras "alerta" só avisam
+BLOQUEIO = "bloqueio"
+ALERTA = "alerta"
+
+# Percentual máximo do saldo atual que uma compra pode comprometer
+LIMITE_PERCENTUAL_SALDO = 0.30
+
+# Regras padrão: reproduzem a regra original de 30% do saldo atual
+REGRAS_PADRAO = [
+    {
+        "nome": "percentual_saldo",
+        "tipo": "percentual_saldo",
+        "percentual": LIMITE_PERCENTUAL_SALDO,
+        "mensagem_aprovada": "O valor da compra está dentro do limite de "
+                             "{percentual:.0%} do seu saldo atual.",
+        "mensagem_negada": "O valor da compra ultrapassa o limite de "
+                           "{percentual:.0%} do seu saldo atual.",
+    },
+    # Alertas do detector de anomalias; só se aplicam quando o contexto traz
+    # o escore e a razão de pico (AnomalyDetector.contexto)
+    {
+        "nome": "valor_incomum",
+        "tipo": "anomalia_valor",
+        "severidade": ALERTA,
+        "mensagem_negada": "Atenção: o valor está bem acima do que você costuma "
+                           "gastar nesta categoria.",
+    },
+    {
+        "nome": "pico_categoria",
+        "tipo": "pico_categoria",
+        "severidade": ALERTA,
+        "mensagem_negada": "Atenção: com esta compra o gasto do mês na categoria "
+                           "chega a {valor:.1f}x o habitual.",
+    },
+]
+
+
+# Tipos de regra. Cada tipo lista as variáveis do contexto de que precisa,
+# os parâmetros (com o valor padrão, ou None se obrigatório) e uma função que
+# devolve o valor medido e o limite permitido (aprovada se valor <= limite).
+# Os parâmetros chegam como colunas (k x 1), uma linha por regra do mesmo
+# tipo, e as variáveis como vetores (n): o resultado tem forma k x n.
+
+def _percentual_saldo(ctx, p):
+    return ctx["valor_compra"], p["percentual"] * ctx["saldo_atual"]
+
+
+def _saldo_minimo(ctx, p):
+    # Saldo que sobra após pagar a primeira parcela não pode ficar abaixo do mínimo
+    valor_parcela = ctx["valor_compra"] / ctx["parcelas"]
+    return p["minimo"], ctx["saldo_atual"] - valor_parcela
+
+
+def _limite_credito(ctx, p):
+    return ctx["valor_compra"], p["percentual"] * ctx["limite_credito"]
+
+
+def _percentual_categoria(ctx, p):
+    gasto = ctx["gasto_categoria"] + ctx["valor_compra"] / ctx["parcelas"]
+    return gasto, p["percentual"] * ctx["orcamento_mes"]
+
+
+def _parcelas_maximas(ctx, p):
+    return ctx["parcelas"], p["maximo"]
+
+
+def _juros_maximo(ctx, p):
+    # Custo total dos juros (tabela Price) como fração do valor da compra
+    taxa = ctx["taxa_juros"]
+    n = ctx["parcelas"]
+    fator = np.where(taxa > 0, taxa / (1 - (1 + taxa) ** -n), 1 / n)
+    return fator * n - 1, p["percentual"]
+
+
+def _anomalia_valor(ctx, p):
+    return ctx["escore_anomalia"], p["limiar"]
+
+
+def _pico_categoria(ctx, p):
+    return ctx["razao_pico_categoria"], p["fator"]
+
+
+class TipoRegra(NamedTuple):
+    funcao: Callable
+    variaveis: Tuple[str, ...]
+    parametros: Dict[str, Optional[float]]
+
+
+TIPOS_REGRA: Dict[str, TipoRegra] = {
+    "percentual_saldo": TipoRegra(_percentual_saldo, ("valor_compra", "saldo_atual"),
+                                  {"percentual": None}),
+    "saldo_minimo": TipoRegra(_saldo_minimo, ("valor_compra", "parcelas", "saldo_atual"),
+                              {"minimo": None}),
+    "limite_credito": TipoRegra(_limite_credito, ("valor_compra", "limite_credito"),
+                                {"percentual": 1.0}),
+    "percentual_categoria": TipoRegra(_percentual_categoria,
+                                      ("valor_compra", "parcelas", "gasto_categoria",
+                                       "orcamento_mes"), {"percentual": None}),
+    "parcelas_maximas": TipoRegra(_parcelas_maximas, ("parcelas",), {"maximo": None}),
+    "juros_maximo": TipoRegra(_juros_maximo, ("parcelas", "taxa_juros"),
+                              {"percentual": None}),
+    "anomalia_valor": TipoRegra(_anomalia_valor, ("escore_anomalia",), {"limiar": 3.5}),
+    "pico_categoria": TipoRegra(_pico_categoria, ("razao_pico_categoria",), {"fator": 2.0}),
+}
+
+
+class Regra(NamedTuple):
+    """Regra compilada, pronta para ser avaliada sobre vetores de compras."""
+    nome: str
+    tipo_nome: str
+    tipo: TipoRegra
+    parametros: Dict
+    severidade: str
+    # Formas de pagamento (normalizadas) às quais a regra se aplica; None = todas
+    formas: Optional[frozenset]
+    mensagem_aprovada: str
+    mensagem_negada: str
+
+
+class Avaliacao:
+    """
+    Resultado da avaliação de um lote de compras.
+
+    Attributes:
+        regras: Regras avaliadas, na ordem do arquivo.
+        valores: Valor medido por regra e compra (n_regras x n_compras).
+        limites: Limite permitido por regra e compra.
+        aplicavel: Se a regra se aplica à compra (forma de pagamento e dados disponíveis).
+        aprovadas_regra: Se a compra passou em cada regra (regras não aplicáveis passam).
+        aprovada: Se a compra passou em todas as regras de bloqueio.
+    """
+
+    def __init__(self, regras: List[Regra], valores: np.ndarray, limites: np.ndarray,
+                 aplicavel: np.ndarray):
+        self.regras = regras
+        self.valores = valores
+        self.limites = limites
+        self.aplicavel = aplicavel
+        self.aprovadas_regra = ~aplicavel | (valores <= limites)
+        bloqueio = np.array([r.severidade == BLOQUEIO for r in regras], dtype=bool)
+        self.aprovada = self.aprovadas_regra[bloqueio].all(axis=0)
+
+    def __len__(self) -> int:
+        return self.aprovada.size
+
+    def trace(self, indice: int = 0) -> List[Dict]:
+        """
+        Explica a decisão de uma compra, regra a regra.
+
+        Args:
+            indice: Posição da compra no lote.
+
+        Returns:
+            List[Dict]: Para cada regra: nome, severidade, aplicavel, aprovada,
+            valor, limite e mensagem.
+        """
+        trace = []
+        for i, regra in enumerate(self.regras):
+            aplicavel = bool(self.aplicavel[i, indice])
+            aprovada = bool(self.aprovadas_regra[i, indice])
+            valor = float(self.valores[i, indice])
+            limite = float(self.limites[i, indice])
+            mensagem = ""
+            if aplicavel:
+                modelo = regra.mensagem_aprovada if aprovada else regra.mensagem_negada
+                mensagem = modelo.format(valor=valor, limite=limite, **regra.parametros)
+            trace.append({
+                "regra": regra.nome,
+                "severidade": regra.severidade,
+                "aplicavel": aplicavel,
+                "aprovada": aprovada,
+                "valor": valor,
+                "limite": limite,
+                "mensagem": mensagem,
+            })
+        return trace
+
+    def justificativa(self, indice: int = 0) -> str:
+        """
+        Resume a decisão de uma compra: as regras que a negaram ou, se aprovada,
+        os alertas disparados ou as regras atendidas.
+        """
+        trace = [t for t in self.trace(indice) if t["aplicavel"]]
+        if not self.aprovada[indice]:
+            mensagens = [t["mensagem"] for t in trace
+                         if not t["aprovada"] and t["severidade"] == BLOQUEIO]
+        else:
+            mensagens = [t["mensagem"] for t in trace if not t["aprovada"]] \
+                or [t["mensagem"] for t in trace]
+        return " ".join(m for m in mensagens if m) \
+            or "Todas as regras de decisão foram atendidas."
+
+
+class RuleEngine:
+    """
+    Motor de regras de decisão de compra.
+
+    As regras são declaradas em uma lista de dicionários (ou em um arquivo
+    JSON) e compiladas uma única vez em um plano de avaliação vetorizado:
+    regras do mesmo tipo são agrupadas e avaliadas juntas, com NumPy, sobre o
+    lote inteiro de compras, de modo que milhares de compras candidatas são
+    avaliadas em uma chamada.
+    """
+
+    def __init__(self, regras: Optional[Sequence[Mapping]] = None):
+        """
+        Args:
+            regras: Definições das regras; se None, usa REGRAS_PADRAO.
+
+        Raises:
+            ValueError: Se alguma regra for inválida.
+        """
+        self.definicoes = list(REGRAS_PADRAO if regras is None else regras)
+        self.regras = [self._compilar(definicao) for definicao in self.definicoes]
+        self.variaveis = sorted({v for r in self.regras for v in r.tipo.variaveis})
+        self.plano = self._planejar(self.regras)
+
+    @classmethod
+    def from_file(cls, caminho: str) -> "RuleEngine":
+        """
+        Carrega as regras de um arquivo JSON (uma lista de regras ou um
+        objeto com a chave "regras").
+        """
+        with open(caminho, encoding="utf-8") as arquivo:
+            conteudo = json.load(arquivo)
+        if isinstance(conteudo, dict):
+            conteudo = conteudo.get("regras", [])
+        logging.info(f"{len(conteudo)} regra(s) de decisão carregadas de '{caminho}'.")
+        return cls(conteudo)
+
+    @staticmethod
+    def _compilar(definicao: Mapping) -> Regra:
+        """Valida uma definição de regra e a converte em Regra."""
+        nome_tipo = definicao.get("tipo")
+        if nome_tipo not in TIPOS_REGRA:
+            raise ValueError(f"Tipo de regra desconhecido: '{nome_tipo}'.")
+        tipo = TIPOS_REGRA[nome_tipo]
+        nome = definicao.get("nome", nome_tipo)
+        faltando = [p for p, padrao in tipo.parametros.items()
+                    if padrao is None and p not in definicao]
+        if faltando:
+            raise ValueError(f"Regra '{nome}' sem o(s) parâmetro(s): {', '.join(faltando)}.")
+        severidade = definicao.get("severidade", BLOQUEIO)
+        if severidade not in (BLOQUEIO, ALERTA):
+            raise ValueError(f"Severidade inválida na regra '{nome}': '{severidade}'.")
+
+        reservadas = {"nome", "tipo", "severidade", "formas_pagamento",
+                      "mensagem_aprovada", "mensagem_negada"}
+        parametros = {**{p: padrao for p, padrao in tipo.parametros.items()
+                         if padrao is not None},
+                      **{k: v for k, v in definicao.items() if k not in reservadas}}
+        for p in tipo.parametros:
+            try:
+                parametros[p] = float(parametros[p])
+            except (TypeError, ValueError):
+                raise ValueError(f"Parâmetro '{p}' inválido na regra '{nome}'.")
+        formas = definicao.get("formas_pagamento")
+        return Regra(
+            nome=nome,
+            tipo_nome=nome_tipo,
+            tipo=tipo,
+            parametros=parametros,
+            severidade=severidade,
+            formas=frozenset(normalizar_nome(f) for f in formas) if formas else None,
+            mensagem_aprovada=definicao.get("mensagem_aprovada", ""),
+            mensagem_negada=definicao.get(
+                "mensagem_negada",
+                f"Regra '{nome}' violada ({{valor:.2f}} acima de {{limite:.2f}})."),
+        )
+
+    @staticmethod
+    def _planejar(regras: List[Regra]) -> List[Tuple]:
+        """
+        Agrupa as regras por tipo: cada grupo é avaliado com uma única chamada
+        NumPy, com os parâmetros das regras empilhados em colunas.
+
+        Returns:
+            List[Tuple]: (tipo, índices das regras, parâmetros k x 1, formas de cada regra).
+        """
+        grupos: Dict[str, List[int]] = {}
+        for i, regra in enumerate(regras):
+            grupos.setdefault(regra.tipo_nome, []).append(i)
+        plano = []
+        for nome_tipo, indices in grupos.items():
+            tipo = TIPOS_REGRA[nome_tipo]
+            parametros = {p: np.array([[regras[i].parametros[p]] for i in indices])
+                          for p in tipo.parametros}
+            formas = [regras[i].formas for i in indices]
+            plano.append((tipo, np.array(indices), parametros, formas))
+        return plano
+
+    def avaliar(self, contexto: Mapping[str, object]) -> Avaliacao:
+        """
+        Avalia um lote de compras.
+
+        Args:
+            contexto: Variáveis das compras, escalares ou vetores do mesmo
+                tamanho: valor_compra, parcelas, saldo_atual, limite_credito,
+                forma_pagamento, gasto_categoria, orcamento_mes, taxa_juros,
+                escore_anomalia, razao_pico_categoria.
+                Regras cujas variáveis estão ausentes (ou NaN) não se aplicam.
+
+        Returns:
+            Avaliacao: Resultado por regra e por compra.
+        """
+        numericas = {nome: np.asarray(valor, dtype=float)
+                     for nome, valor in contexto.items()
+                     if nome != "forma_pagamento" and valor is not None}
+        formas = contexto.get("forma_pagamento")
+        # O tamanho do lote pode vir só das formas de pagamento
+        forma_shape = np.shape(formas) if formas is not None else ()
+        tamanho = np.broadcast_shapes(*(v.shape for v in numericas.values()),
+                                      forma_shape, (1,))
+        numericas = {nome: np.broadcast_to(valor, tamanho)
+                     for nome, valor in numericas.items()}
+
+        mascaras_forma: Dict[frozenset, np.ndarray] = {}
+        if formas is not None:
+            formas = np.broadcast_to(np.asarray(formas, dtype=object), tamanho)
+            # Normaliza só as formas distintas, não cada compra
+            distintas, inverso = np.unique(formas.astype(str), return_inverse=True)
+            distintas = [normalizar_nome(f) for f in distintas]
+            inverso = inverso.reshape(tamanho)
+
+        n_regras = len(self.regras)
+        valores = np.zeros((n_regras,) + tamanho)
+        limites = np.zeros((n_regras,) + tamanho)
+        aplicavel = np.zeros((n_regras,) + tamanho, dtype=bool)
+        with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+            for tipo, indices, parametros, formas_regras in self.plano:
+                if any(v not in numericas for v in tipo.variaveis):
+                    continue
+                valor, limite = tipo.funcao(numericas, parametros)
+                valores[indices] = valor
+                limites[indices] = limite
+                mascara = ~(np.isnan(valores[indices]) | np.isnan(limites[indices]))
+                for j, formas_regra in enumerate(formas_regras):
+                    if formas_regra is None:
+                        continue
+                    if formas is None:
+                        mascara[j] = False
+                        continue
+                    if formas_regra not in mascaras_forma:
+                        aceitas = np.array([f in formas_regra for f in distintas])
+                        mascaras_forma[formas_regra] = aceitas[inverso]
+                    mascara[j] &= mascaras_forma[formas_regra]
+                aplicavel[indices] = mascara
+        return Avaliacao(self.regras, valores, limites, aplicavel)
@@ -0,0 +1,297 @@
+# ocb/data/sheet_parser.py
+import logging
+import unicodedata
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+import numpy as np
+import pandas as pd
+
+# Tipos de coluna suportados
+MOEDA = "moeda"          # valores em reais, armazenados em centavos (Int64)
+DATA = "data"            # datas dd/mm/aaaa, armazenadas como datetime64
+CATEGORIA = "categoria"  # textos repetitivos, armazenados como pd.Categorical
+TEXTO = "texto"          # textos livres
+
+
+class Coluna(NamedTuple):
+    """Definição de uma coluna esperada em uma aba da planilha."""
+
+    nome: str
+    tipo: str
+    aliases: Tuple[str, ...] = ()
+
+
+RESUMO_SCHEMA = (
+    Coluna("Data de Referência", DATA, ("Data", "Mês", "Referência")),
+    Coluna("Limite Total", MOEDA, ("Limite", "Limite do Cartão")),
+    Coluna("Saldo Restante", MOEDA, ("Saldo", "Saldo Atual")),
+    Coluna("Limite Disponível", MOEDA, ("Limite de Crédito Disponível",
+                                        "Limite Disponivel Cartão")),
+    Coluna("Total a Pagar", MOEDA, ("Fatura", "Total da Fatura")),
+    Coluna("credit_limit", MOEDA, ("Limite de Crédito",)),
+    Coluna("debit_limit", MOEDA, ("Limite de Débito",)),
+)
+
+RECEITA_SCHEMA = (
+    Coluna("Data da Receita", DATA, ("Data",)),
+    Coluna("Descrição da Receita", TEXTO, ("Descrição",)),
+    Coluna("Valor da Receita", MOEDA, ("Valor",)),
+    Coluna("Categoria da Receita", CATEGORIA, ("Categoria",)),
+    Coluna("Recorrente", CATEGORIA, ("Fixa", "Receita Fixa")),
+)
+
+DESPESA_SCHEMA = (
+    Coluna("Data da Despesa", DATA, ("Data", "Vencimento")),
+    Coluna("Descrição da Despesa", TEXTO, ("Descrição",)),
+    Coluna("Valor da Despesa", MOEDA, ("Valor", "Valor da Parcela")),
+    Coluna("Categoria da Despesa", CATEGORIA, ("Categoria",)),
+    Coluna("Forma de Pagamento", CATEGORIA, ("Pagamento", "Tipo")),
+    Coluna("Parcelas", TEXTO, ("Parcela", "Nº da Parcela")),
+    Coluna("Recorrente", CATEGORIA, ("Fixa", "Despesa Fixa")),
+)
+
+# Aba criada pelo OCB para registrar as compras avaliadas
+SIMULACOES_SCHEMA = (
+    Coluna("Data da Simulação", DATA, ("Data",)),
+    Coluna("Valor da Compra", MOEDA, ("Valor",)),
+    Coluna("Categoria", CATEGORIA),
+    Coluna("Forma de Pagamento", CATEGORIA, ("Pagamento",)),
+    Coluna("Parcelas", TEXTO),
+    Coluna("Sugestão", CATEGORIA, ("Decisão",)),
+    Coluna("Justificativa", TEXTO),
+)
+
+# Schema de cada aba do layout padrão
+SCHEMAS = {
+    "resumo": RESUMO_SCHEMA,
+    "receita": RECEITA_SCHEMA,
+    "despesa": DESPESA_SCHEMA,
+    "simulações": SIMULACOES_SCHEMA,
+}
+
+
+def normalizar_nome(nome: str) -> str:
+    """
+    Normaliza um título de coluna para comparação.
+
+    Remove acentos, ignora maiúsculas/minúsculas e trata "_" como espaço, de
+    modo que "Saldo_Restante" e "saldo restante" sejam equivalentes.
+    """
+    sem_acentos = unicodedata.normalize("NFKD", str(nome))
+    sem_acentos = "".join(c for c in sem_acentos if not unicodedata.combining(c))
+    return " ".join(sem_acentos.replace("_", " ").casefold().split())
+
+
+def parse_brl(valores: Iterable) -> pd.Series:
+    """
+    Converte valores monetários no formato brasileiro para centavos.
+
+    Aceita "R$ 1.234,56", "1234,56", "1.234" (milhar) e "12.5" (ponto decimal).
+    O ponto só é tratado como separador de milhar quando há vírgula decimal
+    ou quando agrupa exatamente três dígitos (ex.: "1.500" = 1500 reais).
+    Valores infinitos, fora da faixa do Int64 ou com ponto depois da vírgula
+    decimal são inválidos.
+
+    Args:
+        valores: Sequência de textos (ou números) a converter.
+
+    Returns:
+        pd.Series: Valores em centavos (Int64), com <NA> para entradas inválidas.
+    """
+    serie = pd.Series(valores)
+    if pd.api.types.is_numeric_dtype(serie):
+        return _para_centavos(serie.astype(float))
+    textos = serie.astype("string").str.strip()
+    textos = textos.str.replace(r"[R$\s]", "", regex=True)
+    # Ponto depois da vírgula decimal (ex.: "1,5.3") não é um valor válido
+    textos = textos.mask(textos.str.contains(r",.*\.", regex=True).fillna(False))
+    com_virgula = textos.str.contains(",", regex=False).fillna(False)
+    so_milhar = textos.str.fullmatch(r"-?\d{1,3}(\.\d{3})+").fillna(False)
+    textos = textos.where(~(com_virgula | so_milhar),
+                          textos.str.replace(".", "", regex=False))
+    textos = textos.str.replace(",", ".", regex=False)
+    reais = pd.to_numeric(textos, errors="coerce")
+    return _para_centavos(pd.Series(reais, dtype=float))
+
+
+# Maior valor em centavos representável em Int64 (com folga para o arredondamento)
+_MAX_CENTAVOS = 2.0 ** 63 - 1024
+
+
+def _para_centavos(reais: pd.Series) -> pd.Series:
+    """Reais (float) em centavos Int64; infinitos e valores fora do Int64 viram <NA>."""
+    centavos = (reais * 100).round()
+    validos = np.isfinite(centavos) & (centavos.abs() <= _MAX_CENTAVOS)
+    return centavos.where(validos).astype("Int64")
+
+
+def parse_datas(valores: Iterable) -> pd.Series:
+    """
+    Converte datas no formato dd/mm/aaaa.
+
+    Args:
+        valores: Sequência de textos com datas.
+
+    Returns:
+        pd.Series: Datas como datetime64, com NaT para entradas inválidas.
+    """
+    textos = pd.Series(valores, dtype="string").str.strip()
+    return pd.to_datetime(textos, format="%d/%m/%Y", errors="coerce")
+
+
+def formatar_brl(reais: float) -> str:
+    """Formata um valor em reais como na planilha (ex.: 'R$ 1.234,56')."""
+    centavos = int(round(abs(reais) * 100))
+    texto = f"R$ {centavos // 100:,}".replace(",", ".") + f",{centavos % 100:02d}"
+    return "-" + texto if reais < 0 else texto
+
+
+def centavos_para_reais(centavos) -> float:
+    """Converte um valor em centavos para reais."""
+    return float(centavos) / 100
+
+
+class SheetTable:
+    """
+    Representação tipada e colunar de uma aba da planilha.
+
+    O conteúdo bruto de get_all_values() é convertido uma única vez: a
+    primeira linha é o cabeçalho e as colunas são acessadas pelo nome (ou
+    por um de seus aliases), nunca pela posição.
+    """
+
+    def __init__(self, linhas: List[List[str]], schema: Iterable[Coluna] = ()):
+        """
+        Converte as linhas brutas de uma aba em colunas tipadas.
+
+        Args:
+            linhas: Valores da aba, com o cabeçalho na primeira linha.
+            schema: Colunas esperadas e seus tipos; colunas fora do schema
+                são mantidas como texto.
+        """
+        cabecalho = linhas[0] if linhas else []
+        self._build(cabecalho, pd.DataFrame(linhas[1:], dtype="string"), schema)
+
+    @classmethod
+    def from_frame(cls, frame: pd.DataFrame, schema: Iterable[Coluna] = ()) -> "SheetTable":
+        """
+        Cria a tabela a partir de um DataFrame cujas colunas são o cabeçalho da aba.
+
+        Args:
+            frame: Linhas da aba, com os títulos das colunas como nomes.
+            schema: Colunas esperadas e seus tipos.
+        """
+        tabela = cls.__new__(cls)
+        bruto = frame.astype("string")
+        bruto.columns = pd.RangeIndex(len(frame.columns))
+        for posicao, dtype in enumerate(frame.dtypes):
+            if pd.api.types.is_numeric_dtype(dtype):
+                # Números usam vírgula decimal, para não confundir com milhar
+                bruto[posicao] = bruto[posicao].str.replace(".", ",", regex=False)
+        tabela._build(list(frame.columns), bruto, schema)
+        return tabela
+
+    @classmethod
+    def from_records(cls, registros: List[Dict], schema: Iterable[Coluna] = ()) -> "SheetTable":
+        """
+        Cria a tabela a partir de uma lista de dicionários (um por linha).
+
+        Args:
+            registros: Linhas da aba como dicionários {coluna: valor}.
+            schema: Colunas esperadas e seus tipos.
+        """
+        return cls.from_frame(pd.DataFrame(registros), schema)
+
+    def _build(self, cabecalho: List[str], bruto: pd.DataFrame,
+               schema: Iterable[Coluna]):
+        """Converte as colunas brutas (indexadas pela posição) nas colunas tipadas."""
+        self.schema = tuple(schema)
+        self._indice: Dict[str, str] = {}
+        for coluna in self.schema:
+            for nome in (coluna.nome,) + coluna.aliases:
+                self._indice.setdefault(normalizar_nome(nome), coluna.nome)
+        tipos = {coluna.nome: coluna.tipo for coluna in self.schema}
+
+        if not bruto.empty:
+            # Descarta linhas totalmente vazias, comuns no fim das abas
+            preenchidas = bruto.fillna("").apply(
+                lambda coluna: coluna.str.strip() != "").any(axis=1)
+            bruto = bruto[preenchidas].reset_index(drop=True)
+
+        colunas = {}
+        for posicao, titulo in enumerate(cabecalho):
+            if not str(titulo).strip():
+                continue
+            nome = self._indice.get(normalizar_nome(titulo), str(titulo).strip())
+            if nome in colunas:
+                logging.warning(f"Coluna '{titulo}' duplicada; usando a primeira.")
+                continue
+            self._indice.setdefault(normalizar_nome(titulo), nome)
+            valores = bruto[posicao] if posicao in bruto.columns \
+                else pd.Series([pd.NA] * len(bruto), dtype="string")
+            colunas[nome] = self._converter(valores, tipos.get(nome, TEXTO))
+        self.frame = pd.DataFrame(colunas, index=pd.RangeIndex(len(bruto)))
+
+    @staticmethod
+    def _converter(valores: pd.Series, tipo: str) -> pd.Series:
+        """Converte uma coluna de textos para o tipo declarado no schema."""
+        if tipo == MOEDA:
+            return parse_brl(valores)
+        if tipo == DATA:
+            return parse_datas(valores)
+        if tipo == CATEGORIA:
+            return valores.str.strip().astype("category")
+        return valores
+
+    def __len__(self) -> int:
+        return len(self.frame)
+
+    def __contains__(self, nome: str) -> bool:
+        return self.resolve(nome) is not None
+
+    def resolve(self, nome: str) -> Optional[str]:
+        """Retorna o nome canônico da coluna, ou None se ela não existir."""
+        canonico = self._indice.get(normalizar_nome(nome))
+        return canonico if canonico in self.frame.columns else None
+
+    def column(self, nome: str) -> pd.Series:
+        """
+        Retorna uma coluna tipada pelo nome.
+
+        Raises:
+            KeyError: Se a coluna não existir na aba.
+        """
+        canonico = self.resolve(nome)
+        if canonico is None:
+            raise KeyError(f"Coluna '{nome}' não encontrada.")
+        return self.frame[canonico]
+
+    def value(self, nome: str, linha: int = 0):
+        """
+        Retorna o valor de uma coluna em uma linha de dados (0 = primeira).
+
+        Raises:
+            KeyError: Se a coluna não existir.
+            IndexError: Se a linha não existir.
+        """
+        coluna = self.column(nome)
+        if not -len(coluna) <= linha < len(coluna):
+            raise IndexError(f"Linha {linha} inexistente na coluna '{nome}'.")
+        return coluna.iloc[linha]
+
+    def reais(self, nome: str, linha: int = 0) -> float:
+        """
+        Retorna um valor monetário em reais.
+
+        Raises:
+            KeyError: Se a coluna não existir.
+            IndexError: Se a linha não existir.
+            ValueError: Se a célula estiver vazia ou não for numérica.
+        """
+        centavos = self.value(nome, linha)
+        if pd.isna(centavos):
+            raise ValueError(f"Valor inválido na coluna '{nome}'.")
+        return centavos_para_reais(centavos)
+
+    def centavos(self, nome: str) -> np.ndarray:
+        """Retorna uma coluna monetária como array int64 (vazios viram 0)."""
+        return self.column(nome).fillna(0).to_numpy(dtype=np.int64)
@@ -0,0 +1,122 @@
+# ocb/data/snapshot_cache.py
+import json
+import logging
+import sqlite3
+import threading
+import time
+from typing import List, NamedTuple, Optional
+
+
+class Snapshot(NamedTuple):
+    """Cópia local do conteúdo de uma aba da planilha."""
+
+    revisao: Optional[str]
+    obtido_em: float
+    dados: List[List[str]]
+
+
+class SnapshotCache:
+    """
+    Cache persistente em disco (SQLite) com o conteúdo bruto das abas da planilha.
+
+    Cada aba é guardada junto com a revisão da planilha (horário da última
+    modificação) em que foi lida, permitindo que o DataLoader revalide o cache
+    com uma consulta barata de metadados em vez de baixar a aba inteira.
+    """
+
+    def __init__(self, caminho: str = ":memory:"):
+        """
+        Inicializa o cache e cria a tabela de snapshots, se necessário.
+
+        Args:
+            caminho: Caminho do arquivo SQLite (":memory:" para cache volátil).
+        """
+        self.caminho = caminho
+        self._lock = threading.Lock()
+        self._conexao = sqlite3.connect(caminho, check_same_thread=False)
+        self._conexao.execute(
+            """
+            CREATE TABLE IF NOT EXISTS snapshots (
+                planilha  TEXT NOT NULL,
+                aba       TEXT NOT NULL,
+                revisao   TEXT,
+                obtido_em REAL NOT NULL,
+                dados     TEXT NOT NULL,
+                PRIMARY KEY (planilha, aba)
+            )
+            """
+        )
+        self._conexao.commit()
+
+    def get(self, planilha: str, aba: str) -> Optional[Snapshot]:
+        """
+        Retorna o snapshot armazenado de uma aba.
+
+        Args:
+            planilha: Identificador da planilha.
+            aba: Nome da aba.
+
+        Returns:
+            Optional[Snapshot]: Snapshot salvo, ou None se não houver.
+        """
+        with self._lock:
+            linha = self._conexao.execute(
+                "SELECT revisao, obtido_em, dados FROM snapshots "
+                "WHERE planilha = ? AND aba = ?",
+                (planilha, aba),
+            ).fetchone()
+        if linha is None:
+            return None
+        try:
+            return Snapshot(linha[0], linha[1], json.loads(linha[2]))
+        except ValueError as e:
+            logging.warning(f"Snapshot corrompido para a aba '{aba}': {e}")
+            return None
+
+    def put(self, planilha: str, aba: str, revisao: Optional[str],
+            dados: List[List[str]]) -> Snapshot:
+        """
+        Armazena (ou substitui) o snapshot de uma aba.
+
+        Args:
+            planilha: Identificador da planilha.
+            aba: Nome da aba.
+            revisao: Revisão da planilha no momento da leitura.
+            dados: Valores da aba, como retornados por get_all_values().
+
+        Returns:
+            Snapshot: O snapshot armazenado.
+        """
+        snapshot = Snapshot(revisao, time.time(), dados)
+        with self._lock:
+            self._conexao.execute(
+                "INSERT OR REPLACE INTO snapshots "
+                "(planilha, aba, revisao, obtido_em, dados) VALUES (?, ?, ?, ?, ?)",
+                (planilha, aba, revisao, snapshot.obtido_em,
+                 json.dumps(dados, ensure_ascii=False)),
+            )
+            self._conexao.commit()
+        return snapshot
+
+    def invalidate(self, planilha: str, aba: Optional[str] = None):
+        """
+        Remove snapshots do cache.
+
+        Args:
+            planilha: Identificador da planilha.
+            aba: Nome da aba a invalidar; se None, invalida todas as abas da planilha.
+        """
+        with self._lock:
+            if aba is None:
+                self._conexao.execute(
+                    "DELETE FROM snapshots WHERE planilha = ?", (planilha,))
+            else:
+                self._conexao.execute(
+                    "DELETE FROM snapshots WHERE planilha = ? AND aba = ?",
+                    (planilha, aba))
+            self._conexao.commit()
+
+    def close(self):
+        """Fecha a conexão com o arquivo de cache."""
+        with self._lock:
+            self._conexao.close()
@@ -0,0 +1,250 @@
+# ocb/data/spending_rollups.py
+import logging
+import threading
+from typing import Dict, Optional, Tuple
+import numpy as np
+import pandas as pd
+from data.data_loader import DataLoader
+from data.sheet_parser import SheetTable, normalizar_nome
+
+# Formas de pagamento contabilizadas como uso do cartão de crédito
+FORMAS_CARTAO = {"cartao de credito", "credito", "cartao"}
+
+
+def _mes_atual() -> pd.Period:
+    return pd.Timestamp.today().to_period("M")
+
+
+class SpendingRollups:
+    """
+    Agregados materializados de gastos por categoria e por período.
+
+    Mantém somas e contagens de despesas por (mês, categoria), os totais
+    mensais de receitas e despesas, o saldo acumulado e o uso do cartão de
+    crédito. Os agregados são calculados com groupby e, a cada atualização,
+    apenas os meses cujas linhas mudaram são recalculados; as consultas são
+    buscas O(1) em dicionários.
+    """
+
+    def __init__(self):
+        # (mês, categoria normalizada) -> (soma em centavos, quantidade)
+        self._por_categoria: Dict[Tuple[pd.Period, str], Tuple[int, int]] = {}
+        # mês -> total de despesas / despesas no cartão / receitas (centavos)
+        self._despesas_mes: Dict[pd.Period, int] = {}
+        self._cartao_mes: Dict[pd.Period, int] = {}
+        self._receitas_mes: Dict[pd.Period, int] = {}
+        # mês -> saldo acumulado (receitas - despesas) até o mês, em centavos
+        self._saldo_acumulado: Dict[pd.Period, int] = {}
+        # Os mesmos saldos em ordem, para meses sem lançamentos (busca binária)
+        self._meses_saldo = np.zeros(0, dtype=np.int64)
+        self._saldos = np.zeros(0, dtype=np.int64)
+        # Assinatura das linhas de cada mês, para detectar meses alterados
+        self._assinaturas: Dict[str, Dict[pd.Period, int]] = {"despesa": {}, "receita": {}}
+        self._limite_cartao: Optional[int] = None
+        self._origem: Tuple = ()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _meses(tabela: SheetTable, coluna_data: str) -> pd.Series:
+        """Mês de cada linha (linhas sem data contam no mês corrente)."""
+        if coluna_data not in tabela:
+            return pd.Series(_mes_atual(), index=tabela.frame.index)
+        return tabela.column(coluna_data).dt.to_period("M").fillna(_mes_atual())
+
+    @staticmethod
+    def _assinar(tabela: SheetTable, meses: pd.Series) -> Dict[pd.Period, int]:
+        """Assinatura de cada mês: soma dos hashes das suas linhas."""
+        if len(tabela) == 0:
+            return {}
+        hashes = pd.util.hash_pandas_object(tabela.frame, index=False)
+        return hashes.groupby(meses).sum().to_dict()
+
+    @staticmethod
+    def _alterados(antigas: Dict, novas: Dict) -> set:
+        """Meses incluídos, removidos ou com linhas diferentes."""
+        return {mes for mes in set(antigas) | set(novas)
+                if antigas.get(mes) != novas.get(mes)}
+
+    def refresh(self, despesas: SheetTable, receitas: Optional[SheetTable] = None,
+                resumo: Optional[SheetTable] = None) -> set:
+        """
+        Atualiza os agregados, recalculando só os meses que mudaram.
+
+        Args:
+            despesas: Aba Despesa convertida.
+            receitas: Aba Receita convertida (para o saldo acumulado).
+            resumo: Aba Resumo convertida (para o limite do cartão).
+
+        Returns:
+            set: Meses recalculados.
+        """
+        with self._lock:
+            receitas = receitas if receitas is not None else SheetTable([])
+            if resumo is not None and "Limite Total" in resumo and len(resumo):
+                limite = resumo.value("Limite Total")
+                self._limite_cartao = None if pd.isna(limite) else int(limite)
+
+            meses_despesa = self._meses(despesas, "Data da Despesa")
+            assinaturas = self._assinar(despesas, meses_despesa)
+            alterados_despesa = self._alterados(self._assinaturas["despesa"], assinaturas)
+            self._assinaturas["despesa"] = assinaturas
+            if alterados_despesa:
+                self._recalcular_despesas(despesas, meses_despesa, alterados_despesa)
+
+            meses_receita = self._meses(receitas, "Data da Receita")
+            assinaturas = self._assinar(receitas, meses_receita)
+            alterados_receita = self._alterados(self._assinaturas["receita"], assinaturas)
+            self._assinaturas["receita"] = assinaturas
+            if alterados_receita:
+                self._recalcular_receitas(receitas, meses_receita, alterados_receita)
+
+            alterados = alterados_despesa | alterados_receita
+            if alterados:
+                self._recalcular_saldo()
+                logging.info(f"Agregados recalculados para {len(alterados)} mês(es).")
+            return alterados
+
+    def refresh_from_loader(self, data_loader: DataLoader) -> set:
+        """
+        Atualiza os agregados a partir do DataLoader.
+
+        Se as tabelas do loader forem as mesmas da última atualização (mesmo
+        snapshot), nada é recalculado.
+        """
+        data_loader.load_many(["resumo", "receita", "despesa"])
+        tabelas = tuple(data_loader.load_table(nome)
+                        for nome in ("despesa", "receita", "resumo"))
+        if len(self._origem) == len(tabelas) \
+                and all(a is b for a, b in zip(self._origem, tabelas)):
+            return set()
+        self._origem = tabelas
+        return self.refresh(*tabelas)
+
+    def _recalcular_despesas(self, despesas: SheetTable, meses: pd.Series, alterados: set):
+        """Recalcula os agregados de despesas apenas dos meses alterados."""
+        for mes in alterados:
+            self._despesas_mes.pop(mes, None)
+            self._cartao_mes.pop(mes, None)
+        self._por_categoria = {chave: valor for chave, valor in self._por_categoria.items()
+                               if chave[0] not in alterados}
+        if len(despesas) == 0 or "Valor da Despesa" not in despesas:
+            return
+
+        selecionadas = meses.isin(alterados).to_numpy()
+        frame = pd.DataFrame({
+            "mes": meses[selecionadas].reset_index(drop=True),
+            "valor": despesas.centavos("Valor da Despesa")[selecionadas],
+        })
+        frame["categoria"] = self._normalizadas(despesas, "Categoria da Despesa",
+                                                selecionadas)
+        frame["cartao"] = self._normalizadas(despesas, "Forma de Pagamento",
+                                             selecionadas).isin(FORMAS_CARTAO).to_numpy()
+
+        por_categoria = frame.groupby(["mes", "categoria"])["valor"].agg(["sum", "count"])
+        for (mes, categoria), soma, quantidade in zip(
+                por_categoria.index, por_categoria["sum"], por_categoria["count"]):
+            self._por_categoria[(mes, categoria)] = (int(soma), int(quantidade))
+        self._despesas_mes.update(
+            {mes: int(v) for mes, v in frame.groupby("mes")["valor"].sum().items()})
+        cartao = frame[frame["cartao"]].groupby("mes")["valor"].sum()
+        self._cartao_mes.update({mes: int(v) for mes, v in cartao.items()})
+
+    def _recalcular_receitas(self, receitas: SheetTable, meses: pd.Series, alterados: set):
+        """Recalcula os totais de receitas apenas dos meses alterados."""
+        for mes in alterados:
+            self._receitas_mes.pop(mes, None)
+        if len(receitas) == 0 or "Valor da Receita" not in receitas:
+            return
+        selecionadas = meses.isin(alterados).to_numpy()
+        totais = pd.Series(receitas.centavos("Valor da Receita")[selecionadas]) \
+            .groupby(meses[selecionadas].reset_index(drop=True)).sum()
+        self._receitas_mes.update({mes: int(v) for mes, v in totais.items()})
+
+    def _recalcular_saldo(self):
+        """Recalcula o saldo acumulado mês a mês (custo proporcional ao número de meses)."""
+        meses = sorted(set(self._despesas_mes) | set(self._receitas_mes))
+        liquido = np.array([self._receitas_mes.get(m, 0) - self._despesas_mes.get(m, 0)
+                            for m in meses], dtype=np.int64)
+        self._saldos = np.cumsum(liquido)
+        self._meses_saldo = np.array([m.ordinal for m in meses], dtype=np.int64)
+        self._saldo_acumulado = dict(zip(meses, self._saldos.tolist()))
+
+    @staticmethod
+    def _normalizadas(tabela: SheetTable, coluna: str, selecionadas: np.ndarray) -> pd.Series:
+        """Valores normalizados de uma coluna categórica nas linhas selecionadas."""
+        if coluna not in tabela:
+            return pd.Series([""] * int(selecionadas.sum()), dtype=object)
+        valores = tabela.column(coluna)[selecionadas].astype("category")
+        # Normaliza só as categorias distintas, não cada linha
+        mapa = {c: normalizar_nome(c) for c in valores.cat.categories}
+        return valores.map(mapa).astype(object).fillna("").reset_index(drop=True)
+
+    # Consultas O(1)
+
+    def total_categoria(self, categoria: str, mes: Optional[pd.Period] = None) -> float:
+        """Total gasto (em reais) na categoria no mês (padrão: mês corrente)."""
+        soma, _ = self._por_categoria.get((mes or _mes_atual(), normalizar_nome(categoria)),
+                                          (0, 0))
+        return soma / 100
+
+    def contagem_categoria(self, categoria: str, mes: Optional[pd.Period] = None) -> int:
+        """Quantidade de despesas na categoria no mês."""
+        return self._por_categoria.get((mes or _mes_atual(), normalizar_nome(categoria)),
+                                       (0, 0))[1]
+
+    def media_categoria(self, categoria: str, mes: Optional[pd.Period] = None) -> float:
+        """Valor médio (em reais) das despesas da categoria no mês."""
+        soma, quantidade = self._por_categoria.get(
+            (mes or _mes_atual(), normalizar_nome(categoria)), (0, 0))
+        return soma / quantidade / 100 if quantidade else 0.0
+
+    def total_mes(self, mes: Optional[pd.Period] = None) -> float:
+        """Total de despesas (em reais) do mês."""
+        return self._despesas_mes.get(mes or _mes_atual(), 0) / 100
+
+    def receitas_mes(self, mes: Optional[pd.Period] = None) -> float:
+        """Total de receitas (em reais) do mês."""
+        return self._receitas_mes.get(mes or _mes_atual(), 0) / 100
+
+    def media_semanal(self, mes: Optional[pd.Period] = None) -> float:
+        """Gasto médio por semana (em reais) no mês."""
+        mes = mes or _mes_atual()
+        return self.total_mes(mes) / (mes.days_in_month / 7)
+
+    def saldo_acumulado(self, mes: Optional[pd.Period] = None) -> float:
+        """
+        Saldo acumulado (receitas - despesas, em reais) até o mês. Em meses sem
+        lançamentos, vale o saldo do último mês anterior com lançamentos.
+        """
+        mes = mes or _mes_atual()
+        saldo = self._saldo_acumulado.get(mes)
+        if saldo is None:
+            posicao = np.searchsorted(self._meses_saldo, mes.ordinal, side="right")
+            saldo = int(self._saldos[posicao - 1]) if posicao else 0
+        return saldo / 100
+
+    def percentual_orcamento(self, categoria: str, mes: Optional[pd.Period] = None,
+                             orcamento: Optional[float] = None) -> Optional[float]:
+        """
+        Percentual do orçamento mensal já gasto na categoria.
+
+        Args:
+            categoria: Categoria de despesa.
+            mes: Mês consultado (padrão: mês corrente).
+            orcamento: Orçamento mensal em reais; se None, usa as receitas do mês.
+
+        Returns:
+            Optional[float]: Percentual (0-100), ou None se não houver orçamento.
+        """
+        mes = mes or _mes_atual()
+        if orcamento is None:
+            orcamento = self._receitas_mes.get(mes, 0) / 100
+        if not orcamento:
+            return None
+        return 100 * self.total_categoria(categoria, mes) / orcamento
+
+    def utilizacao_cartao(self, mes: Optional[pd.Period] = None) -> Optional[float]:
+        """Fração do limite total do cartão usada no mês, ou None sem limite conhecido."""
+        if not self._limite_cartao:
+            return None
+        return self._cartao_mes.get(mes or _mes_atual(), 0) / self._limite_cartao
@@ -0,0 +1,309 @@
+# ocb/data/tenants.py
+import asyncio
+import json
+import logging
+from collections import OrderedDict
+from typing import Dict, List, Mapping, NamedTuple, Optional
+from data.anomaly_detector import AnomalyDetector
+from data.async_loader import AsyncDataLoader
+from data.cash_flow import CashFlowProjection
+from data.data_loader import DataLoader
+from data.financial_analyzer import FinancialAnalyzer
+from data.google_clients import DEFAULT_SCOPES, WRITE_SCOPES
+from data.model_store import ModelStore
+from data.refresh_scheduler import DEFAULT_REFRESH_INTERVAL, RefreshScheduler
+from data.snapshot_cache import SnapshotCache
+from data.spending_rollups import SpendingRollups
+from data.write_back import WriteBackQueue, WriteJournal
+
+# Limites padrão do registro: quantidade de usuários e memória estimada total
+DEFAULT_MAX_TENANTS = 256
+DEFAULT_MAX_MEMORY = 512 * 1024 * 1024
+
+
+class TenantSpec(NamedTuple):
+    """Configuração de um usuário: planilha do Google ou arquivo local."""
+    tenant_id: str
+    credentials_path: Optional[str] = None
+    spreadsheet_name: Optional[str] = None
+    local_path: Optional[str] = None
+
+
+def load_tenant_specs(caminho: str) -> Dict[str, TenantSpec]:
+    """
+    Lê o arquivo JSON de usuários do modo servidor.
+
+    Formato: {"<id>": {"credenciais": "...", "planilha": "..."}} ou
+    {"<id>": {"arquivo": "dados/casa.xlsx"}}.
+
+    Returns:
+        Dict[str, TenantSpec]: Configuração de cada usuário, pelo ID.
+    """
+    with open(caminho, encoding="utf-8") as arquivo:
+        conteudo = json.load(arquivo)
+    specs = {}
+    for tenant_id, config in conteudo.items():
+        if not config.get("arquivo") and not config.get("planilha"):
+            raise ValueError(f"Usuário '{tenant_id}' sem 'planilha' nem 'arquivo'.")
+        specs[tenant_id] = TenantSpec(tenant_id, config.get("credenciais"),
+                                      config.get("planilha"), config.get("arquivo"))
+    logging.info(f"{len(specs)} usuário(s) configurado(s) em '{caminho}'.")
+    return specs
+
+
+class Tenant:
+    """
+    Estado isolado de um usuário: loader, agregados, detector de anomalias,
+    atualização em segundo plano, modelo de previsão e, se habilitada, a fila
+    de gravação na planilha. Nada é compartilhado entre usuários além do
+    cache em disco e do journal (onde os registros são separados pelo ID do
+    usuário) e do pool de clientes do Google.
+    """
+
+    def __init__(self, spec: TenantSpec, data_loader: AsyncDataLoader,
+                 refresh_interval: float = DEFAULT_REFRESH_INTERVAL,
+                 model_store: Optional[ModelStore] = None,
+                 journal: Optional[WriteJournal] = None):
+        self.spec = spec
+        self.data_loader = data_loader
+        self.rollups = SpendingRollups()
+        self.anomalias = AnomalyDetector()
+        self.model_store = model_store
+        self.write_back = WriteBackQueue(data_loader.data_loader, journal) \
+            if journal is not None else None
+        self.scheduler = RefreshScheduler(data_loader, refresh_interval)
+        self._derivados = [
+            lambda: self.rollups.refresh_from_loader(self.data_loader.data_loader),
+            lambda: self.anomalias.refresh_from_loader(self.data_loader.data_loader),
+            self._descartar_derivados,
+            self.update_memory,
+        ]
+        for funcao in self._derivados:
+            self.scheduler.add_derived(funcao)
+        # Sessões abertas; usuários com sessões não são removidos do registro
+        self.sessions = 0
+        self.memory = 0
+        self._prediction_model = None
+        self._projecao: Optional[CashFlowProjection] = None
+
+    @property
+    def tenant_id(self) -> str:
+        return self.spec.tenant_id
+
+    async def analyzer(self) -> FinancialAnalyzer:
+        """Cria o FinancialAnalyzer do usuário, com os agregados do usuário."""
+        analyzer = await FinancialAnalyzer.create_async(self.data_loader, rollups=self.rollups,
+                                                        anomalias=self.anomalias)
+        if not self.memory:
+            # Dados recarregados depois de um trim: atualiza a estimativa
+            await self.data_loader.run(self.update_memory)
+        return analyzer
+
+    def prediction_model(self):
+        """
+        Retorna o modelo de previsão do usuário, treinado no primeiro uso e
+        persistido sob um namespace próprio do usuário.
+        """
+        if self._prediction_model is None:
+            from data.prediction_model import PredictionModel
+            dados = self.data_loader.data_loader.load_all()
+            registros = {nome: [dict(zip(linhas[0], linha)) for linha in linhas[1:]]
+                         if linhas else [] for nome, linhas in dados.items()}
+            self._prediction_model = PredictionModel(
+                registros["receita"], registros["despesa"], registros["resumo"],
+                model_store=self.model_store, namespace=f"limites-{self.tenant_id}")
+        return self._prediction_model
+
+    def cash_flow(self) -> CashFlowProjection:
+        """
+        Retorna a projeção de fluxo de caixa do usuário, calculada uma vez por
+        versão dos dados (o otimizador de pagamento a consulta a cada tecla).
+        """
+        if self._projecao is None:
+            analyzer = FinancialAnalyzer(self.data_loader.data_loader, rollups=self.rollups)
+            self._projecao = analyzer.projetar_fluxo_caixa()
+        return self._projecao
+
+    def registrar(self, metodo: str, *args, **kwargs):
+        """
+        Registra uma compra ou simulação na planilha (WriteBackQueue.registrar_*)
+        e recalcula na hora os agregados, que já enxergam a nova linha.
+        Bloqueante: executar no pool de E/S.
+        """
+        if self.write_back is None:
+            raise RuntimeError("Gravação na planilha não habilitada.")
+        linha = getattr(self.write_back, metodo)(*args, **kwargs)
+        for funcao in self._derivados:
+            funcao()
+        return linha
+
+    def _descartar_derivados(self):
+        """
+        Os dados mudaram: a projeção é recalculada e o modelo é retreinado
+        (incrementalmente) no próximo uso.
+        """
+        self._prediction_model = None
+        self._projecao = None
+
+    def update_memory(self) -> int:
+        """Recalcula a estimativa de memória ocupada pelo usuário."""
+        self.memory = self.data_loader.data_loader.memory_bytes()
+        return self.memory
+
+    def trim(self):
+        """
+        Libera os dados em memória; eles são recarregados do disco quando
+        necessários, sem consultar a planilha (o loader tem TTL infinito e a
+        revalidação fica com a atualização em segundo plano).
+        """
+        self.data_loader.data_loader.release_memory()
+        self._descartar_derivados()
+        self.memory = 0
+
+    async def close(self):
+        """
+        Interrompe a atualização em segundo plano, envia as gravações
+        pendentes e libera a memória.
+        """
+        await self.scheduler.stop()
+        if self.write_back is not None:
+            await self.write_back.stop()
+        self.trim()
+
+
+class TenantRegistry:
+    """
+    Registro dos usuários ativos do processo, em um LRU limitado.
+
+    Cada sessão é vinculada ao seu usuário e recebe um Tenant próprio. Quando
+    a quantidade de usuários ou a memória estimada passa dos limites, os
+    usuários sem sessões abertas, do menos para o mais recentemente usado,
+    são encerrados e removidos; se todos tiverem sessões, seus dados em
+    memória são liberados (e recarregados do cache em disco quando usados).
+    """
+
+    def __init__(self, specs: Mapping[str, TenantSpec],
+                 cache: Optional[SnapshotCache] = None,
+                 refresh_interval: float = DEFAULT_REFRESH_INTERVAL,
+                 max_tenants: int = DEFAULT_MAX_TENANTS,
+                 max_memory: int = DEFAULT_MAX_MEMORY,
+                 model_store: Optional[ModelStore] = None,
+                 journal: Optional[WriteJournal] = None):
+        """
+        Args:
+            specs: Configuração de cada usuário, pelo ID.
+            cache: Cache de snapshots em disco compartilhado.
+            refresh_interval: Intervalo da atualização em segundo plano.
+            max_tenants: Quantidade máxima de usuários mantidos.
+            max_memory: Memória estimada máxima (bytes) do conjunto dos usuários.
+            model_store: Repositório dos modelos de previsão.
+            journal: Journal das gravações na planilha; se informado, as
+                compras e simulações podem ser registradas na planilha
+                (credenciais com permissão de escrita).
+        """
+        self.specs = dict(specs)
+        self.cache = cache
+        self.refresh_interval = refresh_interval
+        self.max_tenants = max_tenants
+        self.max_memory = max_memory
+        self.model_store = model_store
+        self.journal = journal
+        self._tenants: "OrderedDict[str, Tenant]" = OrderedDict()
+        self._criando: Dict[str, asyncio.Future] = {}
+        self._lock = asyncio.Lock()
+
+    def __len__(self) -> int:
+        return len(self._tenants)
+
+    def __contains__(self, tenant_id: str) -> bool:
+        return tenant_id in self._tenants
+
+    @property
+    def memory(self) -> int:
+        return sum(tenant.memory for tenant in self._tenants.values())
+
+    async def _criar(self, spec: TenantSpec) -> Tenant:
+        """Cria o loader do usuário (autenticação fora do loop de eventos)."""
+        # Com a atualização em segundo plano, o TTL não expira nas requisições
+        opcoes = dict(cache=self.cache, ttl=float("inf"), cache_key=spec.tenant_id,
+                      scopes=WRITE_SCOPES if self.journal is not None else DEFAULT_SCOPES)
+        if spec.local_path:
+            data_loader = AsyncDataLoader(DataLoader.from_file(spec.local_path, **opcoes))
+        else:
+            data_loader = await AsyncDataLoader.create(
+                spec.credentials_path, spec.spreadsheet_name, **opcoes)
+        return Tenant(spec, data_loader, self.refresh_interval, self.model_store,
+                      self.journal)
+
+    async def get(self, tenant_id: str) -> Tenant:
+        """
+        Retorna o Tenant do usuário, criando-o se necessário, e o marca como
+        o mais recentemente usado.
+
+        Raises:
+            KeyError: Se o usuário não estiver configurado.
+        """
+        if tenant_id not in self.specs:
+            raise KeyError(f"Usuário '{tenant_id}' não configurado.")
+        async with self._lock:
+            tenant = self._tenants.get(tenant_id)
+            if tenant is not None:
+                self._tenants.move_to_end(tenant_id)
+                return tenant
+            criacao = self._criando.get(tenant_id)
+            if criacao is None:
+                # Sessões simultâneas do mesmo usuário aguardam a mesma criação
+                criacao = asyncio.ensure_future(self._criar(self.specs[tenant_id]))
+                self._criando[tenant_id] = criacao
+        try:
+            tenant = await asyncio.shield(criacao)
+        finally:
+            self._criando.pop(tenant_id, None)
+        async with self._lock:
+            if tenant_id not in self._tenants:
+                self._tenants[tenant_id] = tenant
+                tenant.scheduler.start()
+                if tenant.write_back is not None:
+                    tenant.write_back.start()
+            tenant = self._tenants[tenant_id]
+            self._tenants.move_to_end(tenant_id)
+        await self.enforce_limits()
+        return tenant
+
+    async def acquire(self, tenant_id: str) -> Tenant:
+        """Vincula uma sessão ao usuário; o usuário não é removido enquanto ela durar."""
+        tenant = await self.get(tenant_id)
+        tenant.sessions += 1
+        return tenant
+
+    async def release(self, tenant: Tenant):
+        """Desvincula uma sessão encerrada e reaplica os limites."""
+        tenant.sessions = max(0, tenant.sessions - 1)
+        await self.enforce_limits()
+
+    async def enforce_limits(self):
+        """Remove ou reduz usuários até respeitar os limites de quantidade e memória."""
+        async with self._lock:
+            removidos: List[Tenant] = []
+            for tenant_id in list(self._tenants):
+                if len(self._tenants) <= self.max_tenants and self.memory <= self.max_memory:
+                    break
+                tenant = self._tenants[tenant_id]
+                if tenant.sessions == 0:
+                    removidos.append(self._tenants.pop(tenant_id))
+            # Todos os restantes têm sessões: só libera os dados em memória
+            for tenant in self._tenants.values():
+                if self.memory <= self.max_memory:
+                    break
+                tenant.trim()
+        for tenant in removidos:
+            logging.info(f"Usuário '{tenant.tenant_id}' removido do cache.")
+            await tenant.close()
+
+    async def close(self):
+        """Encerra todos os usuários."""
+        async with self._lock:
+            tenants = list(self._tenants.values())
+            self._tenants.clear()
+        for tenant in tenants:
+            await tenant.close()
@@ -0,0 +1,387 @@
+# ocb/data/write_back.py
+import asyncio
+import datetime
+import json
+import logging
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Mapping, NamedTuple, Optional, Set, Tuple
+import pandas as pd
+from data.async_loader import get_io_executor
+from data.data_loader import DataLoader
+from data.instrumentation import metrics
+from data.sheet_parser import DATA, MOEDA, SCHEMAS, formatar_brl, normalizar_nome, \
+    parse_brl, parse_datas
+
+# Linhas pendentes a partir das quais o envio é antecipado
+MAX_PENDENTES = 20
+
+# Segundos entre os envios periódicos das linhas pendentes
+DEFAULT_FLUSH_INTERVAL = 10.0
+
+# Abas em que as decisões são registradas
+ABA_SIMULACOES = "simulações"
+ABA_DESPESAS = "despesa"
+
+
+class Pendente(NamedTuple):
+    """Linha gravada no journal e ainda não enviada à planilha."""
+    id: int
+    aba: str
+    linha: List[str]
+    cabecalho: List[str]
+    # Já incluída em um envio sem confirmação (a gravação pode ter sido aplicada)
+    enviada: bool = False
+
+
+def _comparavel(texto: str, tipo: Optional[str]):
+    """Valor de uma célula independente da formatação (moeda em centavos, datas)."""
+    if tipo == MOEDA:
+        valor = parse_brl([texto])[0]
+    elif tipo == DATA:
+        valor = parse_datas([texto])[0]
+    else:
+        return str(texto).strip()
+    return str(texto).strip() if pd.isna(valor) else valor
+
+
+def _mesma_linha(remota: List[str], local: List[str], tipos: List[Optional[str]]) -> bool:
+    """Se a linha lida da planilha é a linha gravada (a API omite células vazias no fim)."""
+    remota = list(remota) + [""] * (len(local) - len(remota))
+    return all(_comparavel(a, tipo) == _comparavel(b, tipo)
+               for a, b, tipo in zip(remota, local, tipos))
+
+
+class WriteJournal:
+    """
+    Journal local (SQLite) das linhas ainda não enviadas à planilha.
+
+    Cada linha é gravada antes de ser aplicada localmente e removida só
+    depois de confirmada pela planilha: se o processo for encerrado com
+    linhas pendentes, elas são reenviadas na próxima execução. Linhas cujo
+    envio falhou sem confirmação ficam marcadas como enviadas, para que a
+    planilha seja conferida antes de um novo envio.
+    """
+
+    def __init__(self, caminho: str = ":memory:"):
+        """
+        Args:
+            caminho: Caminho do arquivo SQLite (pode ser o mesmo do SnapshotCache).
+        """
+        self.caminho = caminho
+        self._lock = threading.Lock()
+        self._conexao = sqlite3.connect(caminho, check_same_thread=False)
+        self._conexao.execute(
+            """
+            CREATE TABLE IF NOT EXISTS gravacoes (
+                id        INTEGER PRIMARY KEY AUTOINCREMENT,
+                planilha  TEXT NOT NULL,
+                aba       TEXT NOT NULL,
+                linha     TEXT NOT NULL,
+                cabecalho TEXT NOT NULL,
+                criado_em REAL NOT NULL,
+                enviado_em REAL
+            )
+            """
+        )
+        self._conexao.commit()
+
+    def add(self, planilha: str, aba: str, linha: List[str],
+            cabecalho: List[str]) -> Pendente:
+        """Grava uma linha pendente e retorna o registro com o seu ID."""
+        with self._lock:
+            cursor = self._conexao.execute(
+                "INSERT INTO gravacoes (planilha, aba, linha, cabecalho, criado_em) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (planilha, aba, json.dumps(linha, ensure_ascii=False),
+                 json.dumps(cabecalho, ensure_ascii=False), time.time()),
+            )
+            self._conexao.commit()
+        return Pendente(cursor.lastrowid, aba, list(linha), list(cabecalho))
+
+    def pending(self, planilha: str) -> List[Pendente]:
+        """Linhas pendentes da planilha, na ordem em que foram gravadas."""
+        with self._lock:
+            linhas = self._conexao.execute(
+                "SELECT id, aba, linha, cabecalho, enviado_em FROM gravacoes "
+                "WHERE planilha = ? ORDER BY id",
+                (planilha,),
+            ).fetchall()
+        pendentes = []
+        for id_, aba, linha, cabecalho, enviado_em in linhas:
+            try:
+                pendentes.append(Pendente(id_, aba, json.loads(linha), json.loads(cabecalho),
+                                          enviado_em is not None))
+            except ValueError as e:
+                logging.warning(f"Linha pendente {id_} corrompida, descartada: {e}")
+        return pendentes
+
+    def mark_sent(self, ids: List[int]):
+        """Marca as linhas que estão sendo enviadas, antes da requisição."""
+        with self._lock:
+            self._conexao.executemany("UPDATE gravacoes SET enviado_em = ? WHERE id = ?",
+                                      [(time.time(), id_) for id_ in ids])
+            self._conexao.commit()
+
+    def remove(self, ids: List[int]):
+        """Remove as linhas já confirmadas pela planilha."""
+        if not ids:
+            return
+        with self._lock:
+            self._conexao.executemany("DELETE FROM gravacoes WHERE id = ?",
+                                      [(id_,) for id_ in ids])
+            self._conexao.commit()
+
+    def close(self):
+        """Fecha a conexão com o arquivo do journal."""
+        with self._lock:
+            self._conexao.close()
+
+
+class WriteBackQueue:
+    """
+    Fila de gravação na planilha com envios agrupados.
+
+    Cada linha registrada é gravada no journal e aplicada na hora ao
+    snapshot local do DataLoader, de modo que as leituras seguintes já a
+    enxergam sem baixar a aba de novo. As linhas pendentes são enviadas
+    juntas, todas as abas em uma única requisição batchUpdate, quando
+    passam de max_pendentes ou a cada intervalo; até a confirmação, são
+    reaplicadas sobre qualquer nova leitura da aba.
+
+    Assim, dezenas de decisões consomem uma única escrita da cota da API
+    em vez de uma chamada append_row por linha.
+    """
+
+    def __init__(self, data_loader: DataLoader, journal: Optional[WriteJournal] = None,
+                 max_pendentes: int = MAX_PENDENTES,
+                 intervalo: float = DEFAULT_FLUSH_INTERVAL):
+        """
+        Args:
+            data_loader: Loader cujos snapshots recebem as linhas.
+            journal: Journal das linhas pendentes; se None, um journal em memória
+                (as linhas pendentes se perdem se o processo for encerrado).
+            max_pendentes: Linhas pendentes a partir das quais o envio é antecipado.
+            intervalo: Segundos entre os envios periódicos.
+        """
+        self.data_loader = data_loader
+        self.journal = journal if journal is not None else WriteJournal()
+        self.max_pendentes = max_pendentes
+        self.intervalo = intervalo
+        # Serializa os envios; _lock protege só a lista de pendentes e nunca
+        # é mantido enquanto se aguarda o DataLoader (que chama pendentes())
+        self._envio = threading.Lock()
+        self._lock = threading.Lock()
+        self._pendentes: List[Pendente] = []
+        self._tarefa: Optional[asyncio.Task] = None
+        self._sinal: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+        with self._lock:
+            self._pendentes = self.journal.pending(data_loader.cache_key)
+        if self._pendentes:
+            logging.info(f"{len(self._pendentes)} linha(s) pendente(s) recuperada(s) do journal.")
+        data_loader.write_overlay = self.pendentes
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._pendentes)
+
+    def pendentes(self, aba: str) -> Optional[Tuple[List[str], List[List[str]]]]:
+        """
+        Linhas da aba ainda não confirmadas pela planilha.
+
+        Returns:
+            Optional[Tuple[List[str], List[List[str]]]]: Cabeçalho e linhas,
+            ou None se não houver pendências na aba.
+        """
+        with self._lock:
+            linhas = [p for p in self._pendentes if p.aba == aba]
+        if not linhas:
+            return None
+        return linhas[0].cabecalho, [p.linha for p in linhas]
+
+    def _cabecalho(self, aba: str) -> List[str]:
+        """Cabeçalho atual da aba; para abas novas, as colunas do schema."""
+        dados = self.data_loader.load_data(aba)
+        if dados:
+            return list(dados[0])
+        return [coluna.nome for coluna in SCHEMAS.get(aba, ())]
+
+    def append(self, aba: str, registro: Mapping[str, str]) -> List[str]:
+        """
+        Registra uma linha na aba: grava no journal e aplica ao snapshot local.
+
+        Args:
+            aba: Nome da aba.
+            registro: Valores (já formatados como na planilha) por coluna;
+                colunas comparadas sem acentos nem maiúsculas e as ausentes
+                ficam em branco.
+
+        Returns:
+            List[str]: A linha registrada, na ordem das colunas da aba.
+        """
+        cabecalho = self._cabecalho(aba)
+        valores = {normalizar_nome(coluna): valor for coluna, valor in registro.items()}
+        linha = [str(valores.get(normalizar_nome(coluna), "")) for coluna in cabecalho]
+        pendente = self.journal.add(self.data_loader.cache_key, aba, linha, cabecalho)
+
+        def registrar():
+            with self._lock:
+                self._pendentes.append(pendente)
+
+        self.data_loader.append_local(aba, [linha], cabecalho, ao_aplicar=registrar)
+        if len(self) >= self.max_pendentes:
+            self._sinalizar()
+        return linha
+
+    def flush(self) -> int:
+        """
+        Envia todas as linhas pendentes em uma única requisição.
+
+        Em caso de falha, as linhas continuam pendentes e são reenviadas no
+        próximo envio. Como a gravação não é idempotente (a planilha pode
+        tê-la aplicado mesmo sem responder), as linhas de um envio sem
+        confirmação são antes procuradas no fim das suas abas e só são
+        reenviadas se não estiverem lá.
+
+        Returns:
+            int: Quantidade de linhas gravadas (ou confirmadas) na planilha.
+        """
+        with self._envio:
+            with self._lock:
+                lote = list(self._pendentes)
+            if not lote:
+                return 0
+            confirmadas = self._ja_gravadas([p for p in lote if p.enviada])
+            if confirmadas:
+                self._confirmar(confirmadas)
+                logging.info(f"{len(confirmadas)} linha(s) de um envio anterior já "
+                             f"estavam na planilha.")
+                lote = [p for p in lote if p.id not in confirmadas]
+                if not lote:
+                    return len(confirmadas)
+
+            linhas: Dict[str, List[List[str]]] = {}
+            cabecalhos: Dict[str, List[str]] = {}
+            for pendente in lote:
+                linhas.setdefault(pendente.aba, []).append(pendente.linha)
+                cabecalhos.setdefault(pendente.aba, pendente.cabecalho)
+            enviados = {pendente.id for pendente in lote}
+
+            self.journal.mark_sent(sorted(enviados))
+            with self._lock:
+                self._pendentes = [p._replace(enviada=True) if p.id in enviados else p
+                                   for p in self._pendentes]
+            self.data_loader.append_remote(linhas, cabecalhos,
+                                           ao_confirmar=lambda: self._confirmar(enviados))
+            metrics.count("ocb_write_rows_total", len(lote))
+            logging.info(f"{len(lote)} linha(s) gravada(s) na planilha em "
+                         f"{len(linhas)} aba(s).")
+            return len(lote) + len(confirmadas)
+
+    def _confirmar(self, ids: Set[int]):
+        """Retira do journal e da lista de pendentes as linhas já gravadas."""
+        self.journal.remove(sorted(ids))
+        with self._lock:
+            self._pendentes = [p for p in self._pendentes if p.id not in ids]
+
+    def _ja_gravadas(self, incertas: List[Pendente]) -> Set[int]:
+        """
+        IDs das linhas de um envio sem confirmação que já estão na planilha.
+
+        O batchUpdate é atômico: as linhas de cada aba ou foram todas
+        acrescentadas, e estão no fim da aba, ou nenhuma foi.
+        """
+        if not incertas:
+            return set()
+        por_aba: Dict[str, List[Pendente]] = {}
+        for pendente in incertas:
+            por_aba.setdefault(pendente.aba, []).append(pendente)
+        remotas = self.data_loader.read_remote(list(por_aba))
+        confirmadas = set()
+        for aba, pendentes in por_aba.items():
+            final = remotas.get(aba, [])[1:][-len(pendentes):]
+            tipos = {coluna.nome: coluna.tipo for coluna in SCHEMAS.get(aba, ())}
+            tipos_linha = [tipos.get(nome) for nome in pendentes[0].cabecalho]
+            if len(final) == len(pendentes) and all(
+                    _mesma_linha(remota, p.linha, tipos_linha)
+                    for remota, p in zip(final, pendentes)):
+                confirmadas.update(p.id for p in pendentes)
+        return confirmadas
+
+    def registrar_simulacao(self, valor_compra: float, categoria: str,
+                            forma_pagamento: str, parcelas: int,
+                            sugestao: str, justificativa: str) -> List[str]:
+        """Registra uma compra avaliada na aba de simulações."""
+        return self.append(ABA_SIMULACOES, {
+            "Data da Simulação": datetime.date.today().strftime("%d/%m/%Y"),
+            "Valor da Compra": formatar_brl(valor_compra),
+            "Categoria": categoria,
+            "Forma de Pagamento": forma_pagamento,
+            "Parcelas": str(parcelas),
+            "Sugestão": sugestao,
+            "Justificativa": justificativa,
+        })
+
+    def registrar_compra(self, valor_compra: float, categoria: str,
+                         forma_pagamento: str, parcelas: int,
+                         descricao: str = "") -> List[str]:
+        """Registra uma compra aprovada na aba de despesas."""
+        return self.append(ABA_DESPESAS, {
+            "Data da Despesa": datetime.date.today().strftime("%d/%m/%Y"),
+            "Descrição da Despesa": descricao or f"Compra em {parcelas}x",
+            "Valor da Despesa": formatar_brl(valor_compra),
+            "Categoria da Despesa": categoria,
+            "Forma de Pagamento": forma_pagamento,
+            # Mesmo formato das compras parceladas da planilha (parcela atual/total)
+            "Parcelas": f"1/{parcelas}" if parcelas > 1 else "",
+            "Recorrente": "Não",
+        })
+
+    # Envio periódico em segundo plano
+
+    @property
+    def running(self) -> bool:
+        return self._tarefa is not None and not self._tarefa.done()
+
+    def start(self):
+        """Inicia o envio periódico no loop de eventos atual (idempotente)."""
+        if not self.running:
+            self._loop = asyncio.get_running_loop()
+            self._sinal = asyncio.Event()
+            self._tarefa = self._loop.create_task(self._executar())
+
+    async def stop(self):
+        """Interrompe o envio periódico e envia as linhas pendentes."""
+        if self.running:
+            self._tarefa.cancel()
+            try:
+                await self._tarefa
+            except asyncio.CancelledError:
+                pass
+        self._tarefa = None
+        await self._enviar()
+
+    def _sinalizar(self):
+        """Antecipa o próximo envio (pode ser chamado de qualquer thread)."""
+        if self.running and self._loop is not None:
+            self._loop.call_soon_threadsafe(self._sinal.set)
+
+    async def _executar(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._sinal.wait(), self.intervalo)
+            except asyncio.TimeoutError:
+                pass
+            self._sinal.clear()
+            await self._enviar()
+
+    async def _enviar(self):
+        try:
+            await asyncio.get_running_loop().run_in_executor(get_io_executor(), self.flush)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logging.error(f"Erro ao gravar na planilha: {e}")
@@ -0,0 +1,22 @@
+# ocb/tests/conftest.py
+import os
+import sys
+import pytest
+
+# Os módulos do projeto são importados a partir da raiz (data.*, cli, benchmarks.*)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.synthetic import FakeClient, FakeSpreadsheet, gerar_planilha  # noqa: E402
+from data.data_loader import DataLoader  # noqa: E402
+
+
+@pytest.fixture
+def planilha() -> FakeSpreadsheet:
+    """Planilha sintética em memória, com seis meses de histórico."""
+    return FakeSpreadsheet(gerar_planilha(300, meses=6))
+
+
+@pytest.fixture
+def loader(planilha) -> DataLoader:
+    """DataLoader sobre a planilha falsa, sem TTL (toda leitura revalida)."""
+    return DataLoader(None, "Planilha de Teste", ttl=0, client=FakeClient(planilha))
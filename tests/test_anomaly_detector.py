@@ -0,0 +1,118 @@
+# ocb/tests/test_anomaly_detector.py
+import copy
+import datetime
+import math
+import numpy as np
+import pytest
+from benchmarks.synthetic import gerar_planilha
+from data.anomaly_detector import AnomalyDetector
+from data.sheet_parser import SCHEMAS, SheetTable
+
+
+def _tabela(linhas):
+    return SheetTable(linhas, SCHEMAS["despesa"])
+
+
+@pytest.fixture
+def linhas():
+    # Em ordem de data, como o detector consome cada lote de linhas novas
+    cabecalho, *despesas = gerar_planilha(400, meses=6)["despesa"]
+    return [cabecalho] + sorted(despesas, key=lambda l: datetime.datetime.strptime(
+        l[0], "%d/%m/%Y"))
+
+
+def _estado(detector):
+    return (detector._media.copy(), detector._desvio.copy(), detector._media_mensal.copy(),
+            list(detector.anomalias()))
+
+
+def _mesmo_estado(a, b):
+    return all(np.array_equal(x, y) for x, y in zip(a[:3], b[:3])) and a[3] == b[3]
+
+
+def test_consome_so_as_linhas_novas(linhas):
+    detector = AnomalyDetector()
+    assert detector.refresh(_tabela(linhas[:301])) == 300
+    assert detector.refresh(_tabela(linhas)) == 100
+    assert detector.refresh(_tabela(linhas)) == 0
+
+    completo = AnomalyDetector()
+    completo.refresh(_tabela(linhas))
+    assert _mesmo_estado(_estado(detector), _estado(completo))
+
+
+def test_edicao_no_meio_do_historico_reconstroi(linhas):
+    detector = AnomalyDetector()
+    detector.refresh(_tabela(linhas))
+    editadas = copy.deepcopy(linhas)
+    editadas[10][2] = "R$ 99.999,00"
+
+    assert detector.refresh(_tabela(editadas)) == 400
+    novo = AnomalyDetector()
+    novo.refresh(_tabela(editadas))
+    assert _mesmo_estado(_estado(detector), _estado(novo))
+
+
+def test_aba_menor_reconstroi(linhas):
+    detector = AnomalyDetector()
+    detector.refresh(_tabela(linhas))
+    assert detector.refresh(_tabela(linhas[:101])) == 100
+
+
+def test_valor_incomum_e_pico():
+    hoje = datetime.date.today()
+    linhas = [["Data da Despesa", "Valor da Despesa", "Categoria da Despesa"]]
+    # Quatro meses de despesas de ~R$ 50 e, no mês atual, uma de R$ 5.000
+    for meses_atras in range(4, 0, -1):
+        mes = (hoje.replace(day=1) - datetime.timedelta(days=28 * meses_atras)).replace(day=5)
+        linhas += [[mes.strftime("%d/%m/%Y"), f"R$ {valor},00", "Mercado"]
+                   for valor in (35, 70, 45, 60, 50)]
+    linhas.append([hoje.strftime("%d/%m/%Y"), "R$ 5.000,00", "Mercado"])
+    detector = AnomalyDetector()
+    detector.refresh(_tabela(linhas))
+
+    anomalias = detector.anomalias()
+    assert anomalias[-1].valor == 5000.0 and anomalias[-1].linha == 20
+    assert anomalias[-1].escore == max(a.escore for a in anomalias)
+    assert detector.escore("mercado", 50.0) < 1
+    assert "Mercado" not in detector.picos() and "mercado" in detector.picos()
+    assert math.isnan(detector.escore("Lazer", 50.0))
+
+
+def test_contexto_lote_igual_ao_contexto(linhas):
+    detector = AnomalyDetector(min_meses=1)
+    detector.refresh(_tabela(linhas))
+    categorias = ["Alimentação", "lazer", "Inexistente", None, "Transporte"]
+    valores = [10.0, 500.0, 20.0, 30.0, 2000.0]
+    lote = detector.contexto_lote(categorias, valores)
+
+    for i, (categoria, valor) in enumerate(zip(categorias, valores)):
+        individual = detector.contexto(categoria or "", valor)
+        for chave, esperado in individual.items():
+            np.testing.assert_allclose(lote[chave][i], esperado, equal_nan=True)
+
+
+def test_linhas_trocadas_de_lugar_reconstroem(linhas):
+    detector = AnomalyDetector()
+    detector.refresh(_tabela(linhas))
+    trocadas = copy.deepcopy(linhas)
+    trocadas[10], trocadas[20] = trocadas[20], trocadas[10]
+
+    assert detector.refresh(_tabela(trocadas)) == 400
+
+
+def test_historico_so_e_conferido_em_um_snapshot_novo(loader, planilha, monkeypatch):
+    detector = AnomalyDetector()
+    conferencias = []
+    hashes = AnomalyDetector._hashes
+    monkeypatch.setattr(AnomalyDetector, "_hashes",
+                        staticmethod(lambda tabela: conferencias.append(1) or hashes(tabela)))
+    assert detector.refresh_from_loader(loader) == 300
+    # Mesma revisão: mesma tabela, nenhuma conferência do histórico
+    assert detector.refresh_from_loader(loader) == 0
+    assert len(conferencias) == 1
+
+    planilha.editar("despesa", planilha.abas["despesa"].linhas + [
+        ["01/01/2024", "Nova", "R$ 10,00", "Lazer", "Pix", "", "Não"]])
+    assert detector.refresh_from_loader(loader) == 1
+    assert len(conferencias) == 2
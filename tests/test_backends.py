@@ -0,0 +1,50 @@
+# ocb/tests/test_backends.py
+import os
+import pytest
+from data.backends import FileBackend
+from data.data_loader import DataLoader
+
+TEMPLATE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                        "templates", "Meus Gastos OCB.xlsx")
+
+
+@pytest.fixture
+def lancamentos(tmp_path):
+    (tmp_path / "lancamentos.csv").write_text(
+        "Data;Descrição;Valor;Categoria;Tipo\n"
+        "01/09/2026;Salário;R$ 3.000,00;Salário;Receita\n"
+        "02/09/2026;Aluguel;R$ 1.200,00;Moradia;Despesa\n"
+        "05/09/2026;Mercado;350,50;Alimentação;despesa\n", encoding="utf-8")
+    return str(tmp_path)
+
+
+def test_layout_de_lancamentos_vira_receita_e_despesa(lancamentos):
+    loader = DataLoader.from_file(lancamentos)
+
+    assert len(loader.load_table("receita")) == 1
+    despesas = loader.load_table("despesa")
+    assert despesas.centavos("Valor da Despesa").tolist() == [120000, 35050]
+    assert "Forma de Pagamento" not in despesas
+    assert loader.extrair_salario_atual(loader.load_data("resumo")) == pytest.approx(1449.50)
+
+
+def test_layout_de_lancamentos_e_somente_leitura(lancamentos):
+    with pytest.raises(NotImplementedError):
+        FileBackend(lancamentos).append_rows({"despesa": [["x"]]}, {"despesa": ["Data"]})
+
+
+def test_abas_receita_e_despesa_tem_precedencia(lancamentos):
+    with open(os.path.join(lancamentos, "despesa.csv"), "w", encoding="utf-8") as arquivo:
+        arquivo.write("Data da Despesa,Valor da Despesa\n01/09/2026,\"10,00\"\n")
+    dados = FileBackend(lancamentos).fetch_many(["despesa"])
+
+    assert dados["despesa"] == [["Data da Despesa", "Valor da Despesa"],
+                                ["01/09/2026", "10,00"]]
+
+
+def test_template_carrega_as_abas_padrao():
+    pytest.importorskip("openpyxl")
+    dados = DataLoader.from_file(TEMPLATE).load_all()
+
+    assert dados["resumo"] == [["Saldo Restante"], ["0,00"]]
+    assert dados["despesa"] == [["Data", "Descrição", "Valor", "Categoria"]]
@@ -0,0 +1,56 @@
+# ocb/tests/test_benchmarks.py
+import datetime
+import pandas as pd
+import pytest
+from benchmarks.bench_suite import comparar, preparar_etapas
+from benchmarks.synthetic import (CABECALHO_DESPESA, CABECALHO_RECEITA, CABECALHO_RESUMO,
+                                  FakeSpreadsheet, gerar_planilha)
+from data.backends import GoogleSheetsBackend
+from data.sheet_parser import SCHEMAS, SheetTable
+
+HOJE = datetime.date(2024, 6, 30)
+
+
+def test_gerar_planilha_e_deterministica():
+    assert gerar_planilha(100, seed=3, hoje=HOJE) == gerar_planilha(100, seed=3, hoje=HOJE)
+    assert gerar_planilha(100, seed=3, hoje=HOJE) != gerar_planilha(100, seed=4, hoje=HOJE)
+
+
+def test_gerar_planilha_no_layout_da_planilha():
+    abas = gerar_planilha(200, meses=6, hoje=HOJE)
+    assert [abas[nome][0] for nome in ("resumo", "receita", "despesa")] \
+        == [CABECALHO_RESUMO, CABECALHO_RECEITA, CABECALHO_DESPESA]
+    assert len(abas["despesa"]) == 201 and len(abas["receita"]) == 21
+
+    despesas = SheetTable(abas["despesa"], SCHEMAS["despesa"])
+    assert (despesas.centavos("Valor da Despesa") > 0).all()
+    datas = despesas.column("Data da Despesa")
+    assert datas.notna().all() and datas.max() <= pd.Timestamp(HOJE)
+
+
+def test_fake_spreadsheet_aplica_batch_update():
+    planilha = FakeSpreadsheet({"despesa": [["Data da Despesa", "Valor da Despesa"]]})
+    GoogleSheetsBackend(planilha).append_rows(
+        {"despesa": [["01/02/2024", "R$ 1.234,50"]],
+         "simulações": [["texto"]]},
+        {"despesa": ["Data da Despesa", "Valor da Despesa"], "simulações": ["Justificativa"]})
+
+    assert planilha.abas["despesa"].linhas[1] == ["01/02/2024", "R$ 1.234,50"]
+    assert planilha.abas["simulações"].linhas == [["Justificativa"], ["texto"]]
+    assert planilha.chamadas["batch_update"] == 1
+    assert planilha.get_lastUpdateTime() == "rev-1"
+
+
+def test_etapas_do_benchmark_executam():
+    for etapa in preparar_etapas(gerar_planilha(100, meses=6)).values():
+        etapa()
+
+
+@pytest.mark.parametrize("medida, esperado", [
+    ({"p50": 0.0104, "pico_mb": 1.0}, []),   # dentro da tolerância
+    ({"p50": 0.0120, "pico_mb": 1.0}, []),   # acima da tolerância, mas abaixo do piso
+    ({"p50": 0.0200, "pico_mb": 1.0}, ["linhas_100/load_frio: p50 0.0200 (baseline 0.0100)"]),
+])
+def test_comparar_acusa_so_regressoes_reais(medida, esperado):
+    baseline = {"linhas_100": {"load_frio": {"p50": 0.0100, "pico_mb": 1.0}}}
+    assert comparar({"linhas_100": {"load_frio": medida}}, baseline, 0.25) == esperado
@@ -0,0 +1,90 @@
+# ocb/tests/test_cash_flow.py
+import numpy as np
+import pandas as pd
+import pytest
+from data.cash_flow import CashFlowProjection, expandir_parcelas, parse_parcelas
+from data.sheet_parser import DESPESA_SCHEMA, RECEITA_SCHEMA, SheetTable
+
+JANEIRO = pd.Period("2024-01")
+
+
+def test_parse_parcelas_formatos():
+    atual, total = parse_parcelas(pd.Series(["3/10", "3 de 10", " 10 ", "12/10", "1", "",
+                                             None, "abc"]))
+    assert atual.tolist() == [3, 3, 1, 10, 0, 0, 0, 0]
+    assert total.tolist() == [10, 10, 10, 10, 0, 0, 0, 0]
+
+
+def test_expandir_parcelas():
+    linhas, meses = expandir_parcelas(np.array([0, 5, 2]), np.array([2, 3, 0]))
+    assert linhas.tolist() == [0, 0, 1, 1, 1]
+    assert meses.tolist() == [0, 1, 5, 6, 7]
+
+
+@pytest.fixture
+def projecao():
+    receitas = SheetTable([
+        ["Data da Receita", "Valor da Receita", "Recorrente"],
+        ["15/06/2023", "R$ 1.000,00", "Sim"],
+        ["10/03/2024", "R$ 500,00", "Não"],
+        ["", "R$ 9.999,00", "Não"],
+        ["99/03/2024", "R$ 9.999,00", "Sim"],
+    ], RECEITA_SCHEMA)
+    despesas = SheetTable([
+        ["Data da Despesa", "Descrição da Despesa", "Valor da Despesa", "Parcelas", "Recorrente"],
+        # Uma linha por parcela: um único plano de 3 parcelas
+        ["05/01/2024", "Geladeira", "R$ 100,00", "1/3", "Não"],
+        ["05/02/2024", "geladeira", "R$ 100,00", "2/3", "Não"],
+        ["05/03/2024", "Geladeira", "R$ 100,00", "3/3", "Não"],
+        # Parcelas 3 a 10, a partir de janeiro
+        ["10/01/2024", "Curso", "R$ 50,00", "3 de 10", "Não"],
+        # Dez parcelas a partir de fevereiro: passam do horizonte
+        ["20/02/2024", "TV", "R$ 200,00", "10", "Não"],
+        ["01/01/2024", "Aluguel", "R$ 300,00", "", "Sim"],
+        ["", "Sem data", "R$ 9.999,00", "2/4", ""],
+    ], DESPESA_SCHEMA)
+    return CashFlowProjection(receitas, despesas, 1000.0, mes_inicial=JANEIRO,
+                              horizonte_meses=6), despesas
+
+
+def test_fluxos_mensais(projecao):
+    projecao, _ = projecao
+    assert (projecao.receitas / 100).tolist() == [1000, 1000, 1500, 1000, 1000, 1000]
+    assert (projecao.despesas / 100).tolist() == [450, 650, 650, 550, 550, 550]
+    assert (projecao.saldo / 100).tolist() == [1000, 1350, 2200, 2650, 3100, 3550]
+    assert projecao.to_frame().index[0] == JANEIRO
+
+
+def test_dividas_atuais_e_futuras(projecao):
+    projecao, despesas = projecao
+    atuais, futuras = projecao.dividas(despesas)
+
+    assert [(d["descricao"], d["parcela"], d["total_parcelas"]) for d in atuais] \
+        == [("Geladeira", 1, 3), ("Curso", 3, 10)]
+    assert len(futuras) == 2 + 7 + 10
+    assert max(d["mes"] for d in futuras) == pd.Period("2024-11")
+
+
+@pytest.mark.parametrize("valor, parcelas, percentual, esperado", [
+    (2000.0, 1, None, "2024-03"),
+    (2000.0, 2, None, "2024-02"),
+    (2000.0, 1, 0.8, "2024-04"),
+    (10000.0, 1, None, None),
+])
+def test_mes_viavel(projecao, valor, parcelas, percentual, esperado):
+    projecao, _ = projecao
+    mes = projecao.mes_viavel(valor, parcelas, percentual_saldo=percentual)
+    assert mes == (pd.Period(esperado) if esperado else None)
+
+
+def test_mes_viavel_com_saldo_minimo(projecao):
+    projecao, _ = projecao
+    assert projecao.mes_viavel(2000.0, saldo_minimo=300) == pd.Period("2024-04")
+    with pytest.raises(ValueError):
+        projecao.mes_viavel(100.0, parcelas=0)
+
+
+def test_horizonte_invalido():
+    vazia = SheetTable([], RECEITA_SCHEMA)
+    with pytest.raises(ValueError):
+        CashFlowProjection(vazia, vazia, 0.0, horizonte_meses=0)
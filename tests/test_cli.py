@@ -0,0 +1,131 @@
+# ocb/tests/test_cli.py
+import argparse
+import csv
+import http.client
+import json
+import socket
+import threading
+from http.server import ThreadingHTTPServer
+import pytest
+from benchmarks.synthetic import gerar_planilha
+from cli import Avaliador, _Handler, main
+
+
+@pytest.fixture
+def dados(tmp_path):
+    """Diretório com as abas da planilha sintética em .csv."""
+    pasta = tmp_path / "dados"
+    pasta.mkdir()
+    for nome, linhas in gerar_planilha(200, meses=6).items():
+        with open(pasta / f"{nome}.csv", "w", newline="", encoding="utf-8") as arquivo:
+            csv.writer(arquivo).writerows(linhas)
+    return str(pasta)
+
+
+def _argumentos(dados, tmp_path):
+    return argparse.Namespace(dados=dados, credenciais=None, planilha=None, cache="",
+                              ttl=30.0, regras=str(tmp_path / "sem_regras.json"), lote=3)
+
+
+COMPRAS = [
+    '{"id": "a", "valor": 10}',
+    '{"valor_compra": "R$ 1.000,00", "parcelas": "3", "categoria": "Lazer"}',
+    'não é json',
+    '[1, 2]',
+    '{"categoria": "Lazer"}',
+    '{"valor": "abc"}',
+    '{"valor": -5}',
+    '{"valor_compra": 1e400}',
+    '{"valor": 10, "parcelas": "abc"}',
+    '{"valor": 10, "parcelas": true}',
+    '{"valor": 10, "parcelas": 0}',
+    '{"valor": 10, "parcelas": 2.5}',
+    '{"valor": 10, "parcelas": 1e400}',
+    '',
+]
+
+
+def test_avaliar_jsonl_com_erros_por_linha(dados, tmp_path):
+    entrada, saida = tmp_path / "compras.jsonl", tmp_path / "decisoes.jsonl"
+    entrada.write_text("\n".join(COMPRAS), encoding="utf-8")
+    main(["--dados", dados, "--cache", "", "--regras", str(tmp_path / "x.json"),
+          "--lote", "4", "avaliar", str(entrada), "--saida", str(saida), "--trace"])
+    resultados = [json.loads(linha) for linha in saida.read_text(encoding="utf-8").splitlines()]
+
+    assert [r["linha"] for r in resultados] == list(range(1, 14))
+    assert resultados[0]["id"] == "a" and resultados[0]["parcelas"] == 1
+    assert resultados[0]["trace"][0]["regra"] == "percentual_saldo"
+    assert resultados[1]["valor_compra"] == 1000.0 and resultados[1]["parcelas"] == 3
+    assert resultados[2]["erro"].startswith("JSON inválido")
+    assert resultados[3]["erro"] == "A linha não é um objeto JSON."
+    assert resultados[4]["erro"] == "Compra sem valor."
+    assert [r["erro"] for r in resultados[5:8]] == ["Valor da compra inválido."] * 3
+    assert [r["erro"] for r in resultados[8:]] == ["Número de parcelas inválido."] * 5
+    # A saída é JSON estrito (sem Infinity/NaN)
+    for linha in saida.read_text(encoding="utf-8").splitlines():
+        json.loads(linha, parse_constant=lambda constante: pytest.fail(constante))
+
+
+def test_avaliar_csv_com_ponto_e_virgula(dados, tmp_path, capsys):
+    entrada = tmp_path / "compras.csv"
+    entrada.write_text("Valor da Compra;Parcelas;ID\n\"1.234,56\";2;x\n;;y\n", encoding="utf-8")
+    main(["--dados", dados, "--cache", "", "--regras", str(tmp_path / "x.json"),
+          "avaliar", str(entrada)])
+    resultados = [json.loads(linha) for linha in capsys.readouterr().out.splitlines()]
+
+    assert resultados[0]["valor_compra"] == 1234.56 and resultados[0]["id"] == "x"
+    assert resultados[1] == {"linha": 2, "erro": "Compra sem valor."}
+
+
+@pytest.fixture
+def servidor(dados, tmp_path):
+    _Handler.avaliador = Avaliador(_argumentos(dados, tmp_path))
+    http_server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    thread = threading.Thread(target=http_server.serve_forever, daemon=True)
+    thread.start()
+    yield http_server.server_address
+    http_server.shutdown()
+    http_server.server_close()
+
+
+def _requisicao(endereco, metodo, rota, corpo=None, cabecalhos=None):
+    conexao = http.client.HTTPConnection(*endereco, timeout=10)
+    try:
+        conexao.request(metodo, rota, body=corpo, headers=cabecalhos or {})
+        resposta = conexao.getresponse()
+        return resposta.status, resposta.read().decode("utf-8")
+    finally:
+        conexao.close()
+
+
+def test_http_avaliar_jsonl_e_csv(servidor):
+    status, corpo = _requisicao(servidor, "POST", "/avaliar?trace=1",
+                                "\n".join(COMPRAS[:3]).encode("utf-8"))
+    resultados = [json.loads(linha) for linha in corpo.splitlines()]
+    assert status == 200 and len(resultados) == 3
+    assert "trace" in resultados[0] and "erro" in resultados[2]
+
+    status, corpo = _requisicao(servidor, "POST", "/avaliar", "valor,parcelas\n50,x\n",
+                                {"Content-Type": "text/csv"})
+    assert status == 200
+    assert json.loads(corpo) == {"linha": 1, "erro": "Número de parcelas inválido."}
+
+
+def test_http_saude_e_rotas_inexistentes(servidor):
+    status, corpo = _requisicao(servidor, "GET", "/saude")
+    assert status == 200 and json.loads(corpo)["status"] == "ok"
+    assert _requisicao(servidor, "GET", "/outra")[0] == 404
+    assert _requisicao(servidor, "POST", "/outra", b"{}")[0] == 404
+
+
+def test_http_sem_content_length(servidor):
+    with socket.create_connection(servidor, timeout=10) as conexao:
+        conexao.sendall(b"POST /avaliar HTTP/1.0\r\nHost: x\r\n\r\n")
+        resposta = b""
+        while True:
+            bloco = conexao.recv(4096)
+            if not bloco:
+                break
+            resposta += bloco
+    assert resposta.startswith(b"HTTP/1.0 411")
+    assert "Content-Length obrigatório." in resposta.decode("utf-8")
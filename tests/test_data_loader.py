@@ -0,0 +1,78 @@
+# ocb/tests/test_data_loader.py
+from benchmarks.synthetic import FakeClient
+from data.data_loader import DataLoader
+from data.snapshot_cache import SnapshotCache
+
+
+def test_ttl_serve_snapshot_sem_consultar_a_planilha(planilha):
+    loader = DataLoader(None, "x", ttl=3600, client=FakeClient(planilha))
+    primeira = loader.load_data("despesa")
+    planilha.editar("despesa", planilha.abas["despesa"].linhas[:2])
+
+    assert loader.load_data("despesa") is primeira
+    assert planilha.chamadas["revisao"] == 1
+    assert planilha.chamadas["values_batch_get"] == 1
+
+
+def test_revisao_inalterada_nao_baixa_de_novo(loader, planilha):
+    primeira = loader.load_data("despesa")
+    assert loader.load_data("despesa") is primeira
+    assert planilha.chamadas["revisao"] == 2
+    assert planilha.chamadas["values_batch_get"] == 1
+
+
+def test_revisao_nova_baixa_a_aba(loader, planilha):
+    loader.load_data("despesa")
+    linhas = planilha.abas["despesa"].linhas[:3]
+    planilha.editar("despesa", linhas)
+
+    assert loader.load_data("despesa") == linhas
+    assert planilha.chamadas["values_batch_get"] == 2
+
+
+def test_load_many_baixa_as_abas_em_uma_requisicao(loader, planilha):
+    dados = loader.load_all()
+    assert set(dados) == {"resumo", "receita", "despesa"}
+    assert planilha.chamadas["values_batch_get"] == 1
+
+
+def test_cache_em_disco_sobrevive_a_um_novo_loader(planilha, tmp_path):
+    caminho = str(tmp_path / "cache.sqlite3")
+    DataLoader(None, "x", cache=SnapshotCache(caminho), client=FakeClient(planilha)) \
+        .load_data("receita")
+    novo = DataLoader(None, "x", cache=SnapshotCache(caminho), client=FakeClient(planilha))
+
+    assert novo.load_data("receita") == planilha.abas["receita"].linhas
+    assert planilha.chamadas["values_batch_get"] == 1
+
+
+def test_falha_na_leitura_usa_snapshot_desatualizado(loader, planilha, monkeypatch):
+    anterior = loader.load_data("despesa")
+    planilha.revisao += 1
+
+    def falhar(*args, **kwargs):
+        raise ConnectionError("sem rede")
+
+    monkeypatch.setattr(planilha, "values_batch_get", falhar)
+    assert loader.load_data("despesa") is anterior
+
+
+def test_falha_sem_snapshot_retorna_aba_vazia(loader, planilha, monkeypatch):
+    def falhar(*args, **kwargs):
+        raise ConnectionError("sem rede")
+
+    monkeypatch.setattr(planilha, "values_batch_get", falhar)
+    assert loader.load_data("despesa") == []
+
+
+def test_aba_inexistente_retorna_lista_vazia(loader):
+    assert loader.load_data("inexistente") == []
+
+
+def test_refresh_informa_so_as_abas_alteradas(loader, planilha):
+    loader.load_all()
+    planilha.revisao += 1
+    assert loader.refresh() == []
+
+    planilha.editar("receita", planilha.abas["receita"].linhas[:2])
+    assert loader.refresh() == ["receita"]
@@ -0,0 +1,72 @@
+# ocb/tests/test_financial_analyzer.py
+import itertools
+import pytest
+from data.financial_analyzer import FinancialAnalyzer
+from data.payment_optimizer import FORMAS_CREDITO
+from data.rule_engine import RuleEngine
+
+FORMAS = ["Pix", "Cartão de Crédito"]
+PARCELAS = [1, 3, 12]
+
+
+def simular_uma(saldo_atual, limite_credito, valor_compra, parcelas, forma):
+    """Simulação de uma única compra, como antes da versão vetorizada."""
+    valor_parcela = valor_compra / parcelas
+    aprovada = RuleEngine().avaliar({
+        "valor_compra": valor_compra, "parcelas": parcelas, "saldo_atual": saldo_atual,
+        "limite_credito": limite_credito, "forma_pagamento": forma,
+    }).aprovada[0]
+    return {
+        "valor_parcela": valor_parcela,
+        "novo_saldo": saldo_atual - valor_compra,
+        "comprometimento_saldo": valor_parcela / saldo_atual,
+        "limite_restante": limite_credito - valor_compra if forma in FORMAS_CREDITO
+        else limite_credito,
+        "a_vista_possivel": saldo_atual >= valor_compra,
+        "aprovada": aprovada,
+    }
+
+
+@pytest.fixture
+def analyzer(loader):
+    return FinancialAnalyzer(loader)
+
+
+@pytest.fixture
+def valores(analyzer):
+    saldo = analyzer.get_current_balance()
+    assert saldo > 0
+    return [round(saldo * fator, 2) for fator in (0.1, 0.3, 0.45, 1.2)]
+
+
+def test_grade_vetorizada_igual_a_simulacao_item_a_item(analyzer, valores):
+    saldo, limite = analyzer.get_current_balance(), analyzer.get_available_credit()
+    grade = analyzer.simular_compras(valores, PARCELAS, FORMAS)
+    combinacoes = list(itertools.product(valores, PARCELAS, FORMAS))
+    assert len(grade) == len(combinacoes)
+
+    for (valor, parcelas, forma), (_, linha) in zip(combinacoes, grade.iterrows()):
+        assert (linha["valor_compra"], linha["parcelas"], linha["forma_pagamento"]) \
+            == (valor, parcelas, forma)
+        esperado = simular_uma(saldo, limite, valor, parcelas, forma)
+        for coluna, valor_esperado in esperado.items():
+            assert linha[coluna] == pytest.approx(valor_esperado), coluna
+        assert analyzer.descrever_simulacao(linha) == analyzer.simular_compra(valor, parcelas)
+
+    # A grade cobre compras aprovadas e negadas
+    assert grade["aprovada"].any() and not grade["aprovada"].all()
+
+
+def test_matriz_aprovacao_igual_a_grade(analyzer, valores):
+    saldo, limite = analyzer.get_current_balance(), analyzer.get_available_credit()
+    for forma in FORMAS:
+        matriz = analyzer.matriz_aprovacao(valores, PARCELAS, forma)
+        assert matriz.index.tolist() == valores and matriz.columns.tolist() == PARCELAS
+        for valor, parcelas in itertools.product(valores, PARCELAS):
+            esperado = simular_uma(saldo, limite, valor, parcelas, forma)["aprovada"]
+            assert bool(matriz.loc[valor, parcelas]) == bool(esperado)
+
+
+def test_parcelas_invalidas(analyzer):
+    with pytest.raises(ValueError):
+        analyzer.simular_compras([100.0], [0])
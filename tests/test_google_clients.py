@@ -0,0 +1,162 @@
+# ocb/tests/test_google_clients.py
+import datetime
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from data.google_clients import (DEFAULT_SCOPES, DRIVE_FILES_URL, TOKEN_REFRESH_MARGIN,
+                                 GoogleClientPool)
+
+CREDENCIAIS = "conta.json"
+
+
+def agora():
+    return datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+
+
+class CredencialFalsa:
+    """Credencial com a interface usada pelo pool e pela AuthorizedSession."""
+
+    def __init__(self, token="token", validade=datetime.timedelta(hours=1)):
+        self.token = token
+        self.expiry = agora() + validade if validade is not None else None
+        self.renovacoes = 0
+
+    def refresh(self, request):
+        self.renovacoes += 1
+        self.token = f"token-{self.renovacoes}"
+        self.expiry = agora() + datetime.timedelta(hours=1)
+
+    def before_request(self, request, method, url, headers):
+        headers["authorization"] = f"Bearer {self.token}"
+
+
+class RespostaFalsa:
+    """Resposta da busca no Drive."""
+
+    def __init__(self, arquivos):
+        self.arquivos = arquivos
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return {"files": self.arquivos}
+
+
+class SessaoFalsa:
+    """Sessão HTTP que registra as buscas no Drive."""
+
+    def __init__(self, arquivos):
+        self.arquivos = arquivos
+        self.consultas = []
+
+    def get(self, url, params=None):
+        self.consultas.append((url, params))
+        return RespostaFalsa(self.arquivos)
+
+    def close(self):
+        pass
+
+
+def pool_com(credencial, sessao=None, **kwargs):
+    pool = GoogleClientPool(**kwargs)
+    chave = pool._chave(CREDENCIAIS, DEFAULT_SCOPES)
+    pool._credenciais[chave] = credencial
+    if sessao is not None:
+        pool._sessoes[chave] = sessao
+    return pool
+
+
+@pytest.mark.parametrize("validade, renova", [
+    (datetime.timedelta(hours=1), False),
+    (TOKEN_REFRESH_MARGIN - datetime.timedelta(seconds=30), True),
+    (-datetime.timedelta(minutes=1), True),
+    (None, True),
+])
+def test_token_renovado_antes_de_expirar(validade, renova):
+    credencial = CredencialFalsa(validade=validade)
+    pool = pool_com(credencial, SessaoFalsa([]))
+    assert pool.credentials(CREDENCIAIS) is credencial
+    assert credencial.renovacoes == int(renova)
+    # Renovado, o token vale por mais uma hora e não é renovado de novo
+    pool.credentials(CREDENCIAIS)
+    assert credencial.renovacoes == int(renova)
+
+
+def test_token_ausente_e_renovado():
+    credencial = CredencialFalsa(token=None)
+    pool_com(credencial, SessaoFalsa([])).credentials(CREDENCIAIS)
+    assert credencial.renovacoes == 1
+
+
+def test_id_da_planilha_memorizado():
+    sessao = SessaoFalsa([{"id": "abc", "name": "Gastos d'Ana"}, {"id": "def"}])
+    pool = pool_com(CredencialFalsa(), sessao)
+
+    assert pool.spreadsheet_id(CREDENCIAIS, "Gastos d'Ana") == "abc"
+    assert pool.spreadsheet_id(CREDENCIAIS, "Gastos d'Ana") == "abc"
+    assert len(sessao.consultas) == 1
+    url, params = sessao.consultas[0]
+    assert url == DRIVE_FILES_URL and "name='Gastos d\\'Ana'" in params["q"]
+
+    # Outra planilha é uma nova busca
+    pool.spreadsheet_id(CREDENCIAIS, "Outra")
+    assert len(sessao.consultas) == 2
+
+
+def test_planilha_nao_encontrada_nao_e_memorizada():
+    sessao = SessaoFalsa([])
+    pool = pool_com(CredencialFalsa(), sessao)
+    assert pool.spreadsheet_id(CREDENCIAIS, "Nenhuma") is None
+    assert pool.spreadsheet_id(CREDENCIAIS, "Nenhuma") is None
+    assert len(sessao.consultas) == 2
+
+
+@pytest.fixture
+def servidor():
+    """Servidor HTTP local que responde com os status da fila e conta as requisições."""
+    estado = {"status": [], "requisicoes": []}
+
+    class Handler(BaseHTTPRequestHandler):
+        def _responder(self):
+            tamanho = int(self.headers.get("Content-Length") or 0)
+            self.rfile.read(tamanho)
+            estado["requisicoes"].append(self.command)
+            status = estado["status"].pop(0) if estado["status"] else 200
+            self.send_response(status)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        do_GET = do_POST = _responder
+
+        def log_message(self, *args):
+            pass
+
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=httpd.serve_forever, args=(0.05,),
+                              daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}/", estado
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.mark.parametrize("metodo, status, requisicoes, final", [
+    ("GET", [503, 500], 3, 200),
+    ("GET", [429], 2, 200),
+    ("POST", [429, 429], 3, 200),
+    ("POST", [503], 1, 503),
+    ("POST", [500], 1, 500),
+])
+def test_post_so_e_repetido_em_429(servidor, metodo, status, requisicoes, final):
+    url, estado = servidor
+    pool = pool_com(CredencialFalsa(), backoff=0)
+    sessao = pool.session(CREDENCIAIS)
+    # O adaptador com as novas tentativas é montado para https; o teste usa http local
+    sessao.mount("http://", sessao.get_adapter("https://sheets.googleapis.com"))
+
+    estado["status"] = list(status)
+    resposta = sessao.request(metodo, url, data=b"{}" if metodo == "POST" else None)
+    assert resposta.status_code == final
+    assert estado["requisicoes"] == [metodo] * requisicoes
+    pool.clear()
@@ -0,0 +1,89 @@
+# ocb/tests/test_instrumentation.py
+import json
+import pytest
+from data.instrumentation import Metrics
+
+
+@pytest.fixture
+def metricas():
+    return Metrics(enabled=True, buckets=(0.1, 1.0))
+
+
+def test_formato_prometheus(metricas):
+    metricas.count("ocb_api_calls_total", chamada="revisao")
+    metricas.count("ocb_api_calls_total", 2, chamada="batch_get")
+    metricas.count("ocb_api_calls_total", chamada="revisao")
+    metricas.count("ocb_sem_rotulos_total")
+    for valor in (0.05, 0.5, 0.1, 3.0):
+        metricas.observe("ocb_latencia_seconds", valor, rota="consulta")
+
+    assert metricas.export_prometheus().splitlines() == [
+        "# TYPE ocb_api_calls_total counter",
+        'ocb_api_calls_total{chamada="batch_get"} 2',
+        'ocb_api_calls_total{chamada="revisao"} 2',
+        "# TYPE ocb_sem_rotulos_total counter",
+        "ocb_sem_rotulos_total 1",
+        "# TYPE ocb_latencia_seconds histogram",
+        # Baldes acumulados: <= 0,1 (0,05 e 0,1), <= 1 (+0,5) e +Inf (+3)
+        'ocb_latencia_seconds_bucket{rota="consulta",le="0.1"} 2',
+        'ocb_latencia_seconds_bucket{rota="consulta",le="1"} 3',
+        'ocb_latencia_seconds_bucket{rota="consulta",le="+Inf"} 4',
+        'ocb_latencia_seconds_sum{rota="consulta"} 3.650000',
+        'ocb_latencia_seconds_count{rota="consulta"} 4',
+    ]
+
+
+def test_histogramas_separados_por_rotulos(metricas):
+    metricas.observe("ocb_span_seconds", 0.5, span="a")
+    metricas.observe("ocb_span_seconds", 0.5, span="b")
+    metricas.observe("ocb_span_seconds", 5.0, span="b")
+    texto = metricas.export_prometheus()
+    assert texto.count("# TYPE ocb_span_seconds histogram") == 1
+    assert 'ocb_span_seconds_count{span="a"} 1' in texto
+    assert 'ocb_span_seconds_bucket{span="b",le="1"} 1' in texto
+    assert 'ocb_span_seconds_count{span="b"} 2' in texto
+
+
+def test_spans_aninhados_no_trace(metricas, tmp_path):
+    with metricas.span("consulta", usuario="ana"):
+        with metricas.span("analise"):
+            pass
+        with pytest.raises(KeyError):
+            with metricas.span("decisao"):
+                raise KeyError("x")
+
+    caminho = tmp_path / "trace.json"
+    trace = metricas.export_trace(str(caminho))
+    assert json.loads(caminho.read_text(encoding="utf-8")) == trace
+    eventos = {evento["name"]: evento for evento in trace["traceEvents"]}
+    # Os filhos terminam antes e são registrados primeiro
+    assert [e["name"] for e in trace["traceEvents"]] == ["analise", "decisao", "consulta"]
+    assert eventos["consulta"]["args"] == {"usuario": "ana"}
+    assert eventos["analise"]["args"] == {"pai": "consulta"}
+    assert eventos["decisao"]["args"] == {"pai": "consulta", "erro": "KeyError"}
+    consulta = eventos["consulta"]
+    for filho in ("analise", "decisao"):
+        assert consulta["ts"] <= eventos[filho]["ts"]
+        assert eventos[filho]["ts"] + eventos[filho]["dur"] <= consulta["ts"] + consulta["dur"]
+    assert 'ocb_span_seconds_count{span="consulta"} 1' in metricas.export_prometheus()
+
+
+def test_desligada_nao_registra_nada():
+    metricas = Metrics(enabled=False)
+    metricas.count("ocb_api_calls_total")
+    metricas.observe("ocb_latencia_seconds", 1.0)
+    contexto = metricas.span("consulta")
+    with contexto:
+        pass
+    # O mesmo contexto nulo é reaproveitado em todas as chamadas
+    assert metricas.span("outra") is contexto
+    with pytest.raises(ValueError):
+        with metricas.span("erro"):
+            raise ValueError
+    assert metricas.export_prometheus() == "\n"
+    assert metricas.export_trace()["traceEvents"] == []
+
+    metricas.enable()
+    metricas.count("ocb_api_calls_total")
+    metricas.reset()
+    assert metricas.export_prometheus() == "\n"
@@ -0,0 +1,75 @@
+# ocb/tests/test_payment_optimizer.py
+import numpy as np
+import pytest
+from data.payment_optimizer import PaymentOptimizer
+
+CREDITO = "Cartão de Crédito"
+
+
+def centavos(reais):
+    return np.array(reais, dtype=float) * 100
+
+
+def test_fator_price_confere_com_calculo_manual():
+    otimizador = PaymentOptimizer([{"forma_pagamento": CREDITO, "parcelas_min": 12,
+                                    "parcelas_max": 12, "taxa_juros": 0.02}])
+    plano = otimizador.avaliar(1000.0, centavos([5000]), 5000.0).iloc[0]
+
+    # PMT = 1000 * 0,02 / (1 - 1,02^-12) = 94,56; total = 12 x 94,56
+    assert plano["valor_parcela"] == pytest.approx(94.56, abs=0.005)
+    assert plano["custo_total"] == pytest.approx(1134.72, abs=0.05)
+
+
+def test_desconto_e_sem_juros():
+    otimizador = PaymentOptimizer([{"forma_pagamento": "Pix", "desconto": 0.05},
+                                   {"forma_pagamento": CREDITO, "parcelas_max": 3}])
+    planos = otimizador.avaliar(200.0, centavos([1000]), 1000.0)
+    assert planos["custo_total"].tolist() == pytest.approx([190.0, 200.0, 200.0, 200.0])
+    assert planos["valor_parcela"].tolist() == pytest.approx([190.0, 200.0, 100.0, 200 / 3])
+
+
+def test_otimizar_desempata_pela_maior_folga():
+    otimizador = PaymentOptimizer([{"forma_pagamento": "Pix"},
+                                   {"forma_pagamento": CREDITO, "parcelas_max": 3}])
+    # Mesmo custo em todos os planos: 3x deixa a maior folga (400 no mês 0)
+    plano = otimizador.otimizar(300.0, centavos([500, 1000, 1500]), 1000.0)
+    assert (plano.forma_pagamento, plano.parcelas) == (CREDITO, 3)
+    assert plano.saldo_minimo == pytest.approx(400.0)
+
+
+def test_otimizar_prefere_o_menor_custo_a_folga():
+    otimizador = PaymentOptimizer([{"forma_pagamento": "Pix", "desconto": 0.01},
+                                   {"forma_pagamento": CREDITO, "parcelas_max": 3}])
+    plano = otimizador.otimizar(300.0, centavos([500, 1000, 1500]), 1000.0)
+    assert (plano.forma_pagamento, plano.parcelas) == ("Pix", 1)
+    assert plano.custo_total == pytest.approx(297.0)
+
+    # Sem limite no cartão, só o Pix continua viável
+    plano = otimizador.otimizar(300.0, centavos([500, 1000, 1500]), 100.0,
+                                formas_pagamento=[CREDITO])
+    assert plano is None
+
+
+def test_parcelas_apos_o_horizonte_contam_no_saldo():
+    otimizador = PaymentOptimizer([{"forma_pagamento": CREDITO, "parcelas_max": 12}])
+    # Em dois meses só 200 seriam pagos, mas as 12 parcelas somam 1.200
+    planos = otimizador.avaliar(1200.0, centavos([1000, 1000]), 5000.0)
+    assert planos["saldo_minimo"].iloc[-1] == pytest.approx(-200.0)
+    assert not planos["viavel"].any()
+    assert otimizador.otimizar(1200.0, centavos([1000, 1000]), 5000.0) is None
+
+    plano = otimizador.otimizar(900.0, centavos([1000, 1000]), 5000.0)
+    assert plano.saldo_minimo == pytest.approx(100.0)
+
+
+@pytest.mark.parametrize("condicao", [
+    {},
+    {"forma_pagamento": "Pix", "parcelas_min": 0},
+    {"forma_pagamento": CREDITO, "parcelas_min": 3, "parcelas_max": 2},
+    {"forma_pagamento": CREDITO, "parcelas_max": 25},
+    {"forma_pagamento": "Pix", "desconto": 1.0},
+    {"forma_pagamento": CREDITO, "taxa_juros": -0.01},
+])
+def test_condicao_invalida(condicao):
+    with pytest.raises(ValueError):
+        PaymentOptimizer([condicao])
@@ -0,0 +1,83 @@
+# ocb/tests/test_prediction_model.py
+import copy
+import numpy as np
+import pytest
+from benchmarks.synthetic import gerar_planilha
+from data.model_store import ModelStore
+from data.prediction_model import IncrementalLinearRegression, PredictionModel
+
+
+def _referencia(X, y):
+    """Mínimos quadrados com intercepto, ajustados de uma vez."""
+    A = np.column_stack([X, np.ones(len(X))])
+    solucao = np.linalg.lstsq(A, y, rcond=None)[0]
+    return solucao[:-1].T, solucao[-1]
+
+
+@pytest.fixture
+def amostras():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(60, 4))
+    y = X @ rng.normal(size=(4, 2)) + rng.normal(scale=0.1, size=(60, 2)) + 3.0
+    return X, y
+
+
+def test_partial_fit_em_lotes_igual_ao_ajuste_completo(amostras):
+    X, y = amostras
+    modelo = IncrementalLinearRegression()
+    for inicio in range(0, len(X), 7):
+        modelo.partial_fit(X[inicio:inicio + 7], y[inicio:inicio + 7])
+    coef, intercepto = _referencia(X, y)
+
+    np.testing.assert_allclose(modelo.coef_, coef, atol=1e-8)
+    np.testing.assert_allclose(modelo.intercept_, intercepto, atol=1e-8)
+
+
+def test_peso_negativo_remove_amostras(amostras):
+    X, y = amostras
+    modelo = IncrementalLinearRegression().partial_fit(X, y)
+    modelo.partial_fit(X[:10], y[:10], sample_weight=-np.ones(10))
+    coef, intercepto = _referencia(X[10:], y[10:])
+
+    np.testing.assert_allclose(modelo.coef_, coef, atol=1e-8)
+    np.testing.assert_allclose(modelo.intercept_, intercepto, atol=1e-8)
+
+
+def test_alvo_unico_e_modelo_vazio(amostras):
+    X, y = amostras
+    modelo = IncrementalLinearRegression()
+    with pytest.raises(ValueError):
+        modelo.predict(X)
+    assert modelo.partial_fit(X, y[:, 0]).predict(X[:3]).shape == (3,)
+
+
+def _registros(abas, nome):
+    cabecalho, *linhas = abas[nome]
+    return [dict(zip(cabecalho, linha)) for linha in linhas]
+
+
+def test_modelo_incremental_igual_ao_retreino_apos_edicao(tmp_path):
+    abas = gerar_planilha(1500, meses=18)
+    receitas, despesas, resumo = (_registros(abas, nome)
+                                  for nome in ("receita", "despesa", "resumo"))
+    store = ModelStore(str(tmp_path))
+    PredictionModel(receitas, despesas, resumo, model_store=store)
+
+    # Uma linha nova e um lançamento antigo editado
+    editadas = copy.deepcopy(despesas) + [dict(despesas[5])]
+    editadas[0]["Valor da Despesa"] = "R$ 9.999,99"
+    incremental = PredictionModel(receitas, editadas, resumo, model_store=store)
+    completo = PredictionModel(receitas, editadas, resumo)
+
+    np.testing.assert_allclose(incremental.predict_limits(), completo.predict_limits(),
+                               rtol=1e-6)
+
+
+def test_dados_inalterados_recarregam_o_modelo(tmp_path):
+    abas = gerar_planilha(500, meses=12)
+    registros = [_registros(abas, nome) for nome in ("receita", "despesa", "resumo")]
+    store = ModelStore(str(tmp_path))
+    primeiro = PredictionModel(*registros, model_store=store)
+    segundo = PredictionModel(*registros, model_store=store)
+
+    assert segundo.predict_limits() == primeiro.predict_limits()
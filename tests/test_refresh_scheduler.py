@@ -0,0 +1,39 @@
+# ocb/tests/test_refresh_scheduler.py
+import asyncio
+from data.async_loader import AsyncDataLoader
+from data.refresh_scheduler import RefreshScheduler
+
+
+def test_revisao_nova_notifica_as_sessoes_e_inalterada_nao(loader, planilha):
+    eventos, derivados = [], []
+
+    async def sessao(evento):
+        eventos.append(evento)
+
+    async def falha(evento):
+        raise RuntimeError("sessão encerrada")
+
+    async def cenario():
+        scheduler = RefreshScheduler(AsyncDataLoader(loader), intervalo=3600)
+        scheduler.add_derived(lambda: derivados.append(1))
+        scheduler.subscribe(falha)
+        scheduler.subscribe(sessao)
+        await scheduler.refresh_now()
+        eventos.clear()
+        derivados.clear()
+
+        # Mesma revisão: nada é recalculado nem publicado
+        assert await scheduler.refresh_now() == []
+        assert eventos == [] and derivados == []
+
+        planilha.editar("despesa", planilha.abas["despesa"].linhas[:4])
+        assert await scheduler.refresh_now() == ["despesa"]
+        assert [evento["abas"] for evento in eventos] == [["despesa"]]
+        assert derivados == [1]
+
+        scheduler.unsubscribe(sessao)
+        planilha.editar("despesa", planilha.abas["despesa"].linhas[:2])
+        await scheduler.refresh_now()
+        assert len(eventos) == 1
+
+    asyncio.run(cenario())
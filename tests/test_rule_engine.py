@@ -0,0 +1,89 @@
+# ocb/tests/test_rule_engine.py
+import os
+import numpy as np
+import pytest
+from data.rule_engine import RuleEngine
+
+EXEMPLO = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                       "regras.exemplo.json")
+
+
+@pytest.fixture
+def contexto():
+    rng = np.random.default_rng(0)
+    n = 200
+    escore = rng.normal(scale=3, size=n)
+    escore[::7] = np.nan
+    return {
+        "valor_compra": rng.uniform(10, 3000, n),
+        "parcelas": rng.integers(1, 19, n).astype(float),
+        "saldo_atual": 4000.0,
+        "limite_credito": rng.uniform(0, 2000, n),
+        "forma_pagamento": rng.choice(["Cartão de Crédito", "Pix", "Dinheiro"], n),
+        "gasto_categoria": rng.uniform(0, 800, n),
+        "orcamento_mes": 3000.0,
+        "escore_anomalia": escore,
+        "razao_pico_categoria": rng.uniform(0, 4, n),
+    }
+
+
+def _sem_nan(trace):
+    return [{chave: None if isinstance(valor, float) and np.isnan(valor) else valor
+             for chave, valor in regra.items()} for regra in trace]
+
+
+def _compra(contexto, i):
+    return {nome: valor[i] if isinstance(valor, np.ndarray) else valor
+            for nome, valor in contexto.items()}
+
+
+def test_lote_igual_a_avaliacao_uma_a_uma(contexto):
+    motor = RuleEngine.from_file(EXEMPLO)
+    lote = motor.avaliar(contexto)
+
+    assert len(lote) == 200
+    for i in range(len(lote)):
+        individual = motor.avaliar(_compra(contexto, i))
+        assert bool(lote.aprovada[i]) == bool(individual.aprovada[0])
+        assert _sem_nan(lote.trace(i)) == _sem_nan(individual.trace(0))
+        assert lote.justificativa(i) == individual.justificativa(0)
+
+
+def test_regra_padrao_de_30_por_cento():
+    avaliacao = RuleEngine().avaliar({"valor_compra": [300, 301], "saldo_atual": 1000})
+    assert avaliacao.aprovada.tolist() == [True, False]
+    assert "30%" in avaliacao.justificativa(1)
+
+
+def test_forma_de_pagamento_restringe_a_regra():
+    motor = RuleEngine([{"nome": "cartao", "tipo": "limite_credito",
+                         "formas_pagamento": ["Cartão de Crédito"]}])
+    avaliacao = motor.avaliar({"valor_compra": 500, "limite_credito": 100,
+                               "forma_pagamento": ["cartao de credito", "Pix"]})
+    assert avaliacao.aprovada.tolist() == [False, True]
+    assert [t["aplicavel"] for t in (avaliacao.trace(0)[0], avaliacao.trace(1)[0])] \
+        == [True, False]
+
+
+def test_alerta_nao_nega_a_compra():
+    motor = RuleEngine([{"nome": "pico", "tipo": "pico_categoria", "severidade": "alerta",
+                         "mensagem_negada": "pico"}])
+    avaliacao = motor.avaliar({"razao_pico_categoria": 5.0})
+    assert avaliacao.aprovada.tolist() == [True]
+    assert avaliacao.justificativa(0) == "pico"
+
+
+def test_variavel_ausente_ou_nan_nao_aplica_a_regra():
+    motor = RuleEngine([{"nome": "juros", "tipo": "juros_maximo", "percentual": 0.1}])
+    assert motor.avaliar({"parcelas": 12}).trace(0)[0]["aplicavel"] is False
+    assert motor.avaliar({"parcelas": 12, "taxa_juros": np.nan}).aprovada.tolist() == [True]
+
+
+@pytest.mark.parametrize("regra", [
+    {"nome": "x", "tipo": "inexistente"},
+    {"nome": "x", "tipo": "percentual_saldo"},
+    {"nome": "x", "tipo": "parcelas_maximas", "maximo": 12, "severidade": "fatal"},
+])
+def test_regra_invalida(regra):
+    with pytest.raises(ValueError):
+        RuleEngine([regra])
@@ -0,0 +1,66 @@
+# ocb/tests/test_sheet_parser.py
+import pandas as pd
+import pytest
+from data.sheet_parser import (DESPESA_SCHEMA, RESUMO_SCHEMA, SheetTable, formatar_brl,
+                               parse_brl, parse_datas)
+
+
+@pytest.mark.parametrize("texto, centavos", [
+    ("R$ 1.234,56", 123456),
+    ("1.234,56", 123456),
+    ("1234,56", 123456),
+    ("1.234", 123400),
+    ("1.234.567,89", 123456789),
+    ("12.5", 1250),
+    ("-R$ 5,00", -500),
+    ("R$ -5,00", -500),
+    ("0,1", 10),
+])
+def test_parse_brl(texto, centavos):
+    assert parse_brl([texto])[0] == centavos
+
+
+@pytest.mark.parametrize("texto", ["", "abc", "R$", None, "inf", "-inf", "1e400", "nan",
+                                   "1e17", "1,5.3", "1.234,5.6", "1,2,3"])
+def test_parse_brl_invalido(texto):
+    assert pd.isna(parse_brl([texto])[0])
+
+
+def test_parse_brl_numeros():
+    assert parse_brl([1234.5, 7]).tolist() == [123450, 700]
+    assert parse_brl([float("inf"), -float("inf"), 1e300, 12.5]).isna().tolist() \
+        == [True, True, True, False]
+
+
+def test_formatar_brl_ida_e_volta():
+    for reais in (0.0, 5.0, -5.0, 1234.56, 1234567.89):
+        assert parse_brl([formatar_brl(reais)])[0] == round(reais * 100)
+
+
+def test_parse_datas():
+    datas = parse_datas(["31/01/2024", "2024-01-31", ""])
+    assert datas[0] == pd.Timestamp(2024, 1, 31)
+    assert datas[1:].isna().all()
+
+
+def test_colunas_pelo_nome_e_aliases():
+    tabela = SheetTable([["Data", "Valor", "Observação"],
+                         ["01/02/2024", "R$ 10,00", "a"],
+                         ["", "", ""]], DESPESA_SCHEMA)
+    assert len(tabela) == 1
+    assert "Valor da Despesa" in tabela
+    assert tabela.centavos("Valor da Despesa").tolist() == [1000]
+    assert tabela.column("Data da Despesa")[0] == pd.Timestamp(2024, 2, 1)
+    assert tabela.column("Observação")[0] == "a"
+
+
+def test_reais_celula_vazia():
+    tabela = SheetTable([["Saldo Restante", "Limite Total"], ["", "abc"]], RESUMO_SCHEMA)
+    with pytest.raises(ValueError):
+        tabela.reais("Saldo Restante")
+    with pytest.raises(ValueError):
+        tabela.reais("Limite Total")
+    with pytest.raises(KeyError):
+        tabela.reais("Total a Pagar")
+    with pytest.raises(IndexError):
+        tabela.reais("Saldo Restante", 1)
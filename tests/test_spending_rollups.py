@@ -0,0 +1,68 @@
+# ocb/tests/test_spending_rollups.py
+import pandas as pd
+import pytest
+from data.sheet_parser import DESPESA_SCHEMA, RECEITA_SCHEMA, RESUMO_SCHEMA, SheetTable
+from data.spending_rollups import SpendingRollups
+
+CABECALHO_DESPESA = ["Data da Despesa", "Valor da Despesa", "Categoria da Despesa",
+                     "Forma de Pagamento"]
+
+
+def _despesas(*linhas):
+    return SheetTable([CABECALHO_DESPESA] + [list(linha) for linha in linhas], DESPESA_SCHEMA)
+
+
+def _receitas(*linhas):
+    return SheetTable([["Data da Receita", "Valor da Receita"]] + [list(l) for l in linhas],
+                      RECEITA_SCHEMA)
+
+
+@pytest.fixture
+def rollups():
+    agregados = SpendingRollups()
+    agregados.refresh(
+        _despesas(("05/01/2024", "R$ 100,00", "Mercado", "Cartão de Crédito"),
+                  ("20/01/2024", "R$ 50,00", "mercado", "Pix"),
+                  ("10/03/2024", "R$ 30,00", "Lazer", "Cartão de Crédito")),
+        _receitas(("01/01/2024", "R$ 1.000,00"), ("01/03/2024", "R$ 500,00")),
+        SheetTable([["Limite Total"], ["R$ 1.000,00"]], RESUMO_SCHEMA),
+    )
+    return agregados
+
+
+def test_totais_por_categoria_e_mes(rollups):
+    janeiro = pd.Period("2024-01")
+    assert rollups.total_categoria("Mercado", janeiro) == 150.0
+    assert rollups.contagem_categoria("MERCADO", janeiro) == 2
+    assert rollups.media_categoria("mercado", janeiro) == 75.0
+    assert rollups.total_mes(janeiro) == 150.0
+    assert rollups.receitas_mes(janeiro) == 1000.0
+    assert rollups.percentual_orcamento("Mercado", janeiro) == pytest.approx(15.0)
+    assert rollups.utilizacao_cartao(janeiro) == pytest.approx(0.1)
+
+
+def test_saldo_acumulado_nos_meses_sem_lancamentos(rollups):
+    assert rollups.saldo_acumulado(pd.Period("2023-12")) == 0.0
+    assert rollups.saldo_acumulado(pd.Period("2024-01")) == 850.0
+    # Fevereiro não tem lançamentos: vale o saldo de janeiro
+    assert rollups.saldo_acumulado(pd.Period("2024-02")) == 850.0
+    assert rollups.saldo_acumulado(pd.Period("2024-03")) == 1320.0
+    assert rollups.saldo_acumulado(pd.Period("2025-06")) == 1320.0
+
+
+def test_refresh_recalcula_so_os_meses_alterados(rollups):
+    alterados = rollups.refresh(
+        _despesas(("05/01/2024", "R$ 100,00", "Mercado", "Cartão de Crédito"),
+                  ("20/01/2024", "R$ 50,00", "mercado", "Pix"),
+                  ("10/03/2024", "R$ 90,00", "Lazer", "Cartão de Crédito")),
+        _receitas(("01/01/2024", "R$ 1.000,00"), ("01/03/2024", "R$ 500,00")),
+    )
+    assert alterados == {pd.Period("2024-03")}
+    assert rollups.total_categoria("Lazer", pd.Period("2024-03")) == 90.0
+    assert rollups.saldo_acumulado(pd.Period("2024-04")) == 1260.0
+
+
+def test_refresh_from_loader_ignora_o_mesmo_snapshot(loader):
+    rollups = SpendingRollups()
+    assert rollups.refresh_from_loader(loader)
+    assert rollups.refresh_from_loader(loader) == set()
@@ -0,0 +1,132 @@
+# ocb/tests/test_tenants.py
+import asyncio
+import pytest
+from benchmarks.synthetic import FakeClient, FakeSpreadsheet, gerar_planilha
+from data.async_loader import AsyncDataLoader
+from data.data_loader import DataLoader
+from data.snapshot_cache import SnapshotCache
+from data.tenants import Tenant, TenantRegistry, TenantSpec
+
+USUARIOS = ("a", "b", "c", "d")
+
+
+class RegistroFalso(TenantRegistry):
+    """Registro cujos usuários leem planilhas falsas, uma por usuário."""
+
+    def __init__(self, planilhas, **kwargs):
+        specs = {nome: TenantSpec(nome, spreadsheet_name="Planilha") for nome in planilhas}
+        super().__init__(specs, refresh_interval=3600, **kwargs)
+        self.planilhas = planilhas
+
+    async def _criar(self, spec):
+        return criar_tenant(spec, self.planilhas[spec.tenant_id], self.cache)
+
+
+def criar_tenant(spec, planilha, cache):
+    loader = DataLoader(None, spec.spreadsheet_name, cache=cache, ttl=float("inf"),
+                        cache_key=spec.tenant_id, client=FakeClient(planilha))
+    return Tenant(spec, AsyncDataLoader(loader), refresh_interval=3600)
+
+
+@pytest.fixture
+def planilhas():
+    return {nome: FakeSpreadsheet(gerar_planilha(50 * (i + 1), seed=i, meses=3))
+            for i, nome in enumerate(USUARIOS)}
+
+
+async def carregar(tenant):
+    await tenant.data_loader.load_all()
+    return await tenant.data_loader.run(tenant.update_memory)
+
+
+def test_lru_remove_o_menos_usado_sem_sessoes(planilhas):
+    async def cenario():
+        registro = RegistroFalso(planilhas, max_tenants=2)
+        for nome in ("a", "b", "c"):
+            await registro.get(nome)
+        assert list(registro._tenants) == ["b", "c"]
+
+        await registro.get("b")
+        await registro.get("d")
+        assert list(registro._tenants) == ["b", "d"]
+
+        # Usuário com sessão aberta não é removido, mesmo sendo o mais antigo
+        sessao = await registro.acquire("b")
+        await registro.get("a")
+        await registro.get("c")
+        assert list(registro._tenants) == ["b", "c"]
+
+        await registro.release(sessao)
+        assert sessao.sessions == 0
+        await registro.close()
+
+    asyncio.run(cenario())
+
+
+def test_lru_por_memoria_remove_e_depois_reduz(planilhas):
+    async def cenario():
+        registro = RegistroFalso(planilhas)
+        a = await registro.acquire("a")
+        b = await registro.acquire("b")
+        memoria_a, memoria_b = await carregar(a), await carregar(b)
+        assert memoria_a > 0 and memoria_b > memoria_a
+
+        # Todos com sessões: os dados do menos usado são liberados
+        registro.max_memory = memoria_b
+        await registro.enforce_limits()
+        assert len(registro) == 2
+        assert a.memory == 0 and not a.data_loader.data_loader._memoria
+        assert b.memory == memoria_b
+
+        # Sem sessões, o menos usado é removido do registro
+        await registro.release(a)
+        await carregar(a)
+        await registro.enforce_limits()
+        assert "a" not in registro and "b" in registro
+        await registro.close()
+
+    asyncio.run(cenario())
+
+
+def test_usuarios_isolados_com_mesmo_nome_de_planilha(planilhas, tmp_path):
+    cache = SnapshotCache(str(tmp_path / "cache.sqlite3"))
+
+    async def cenario():
+        registro = RegistroFalso(planilhas, cache=cache)
+        a, b = await registro.get("a"), await registro.get("b")
+        despesas_a = await a.data_loader.load_data("despesa")
+        despesas_b = await b.data_loader.load_data("despesa")
+        assert a.rollups is not b.rollups and a.anomalias is not b.anomalias
+        await registro.close()
+        return despesas_a, despesas_b
+
+    despesas_a, despesas_b = asyncio.run(cenario())
+    assert despesas_a == planilhas["a"].abas["despesa"].linhas
+    assert despesas_b == planilhas["b"].abas["despesa"].linhas
+    assert cache.get("a", "despesa").dados == despesas_a
+    assert cache.get("b", "despesa").dados == despesas_b
+
+
+def test_trim_recarrega_do_disco_sem_consultar_a_planilha(planilhas, tmp_path):
+    planilha = planilhas["a"]
+    tenant = criar_tenant(TenantSpec("a", spreadsheet_name="Planilha"), planilha,
+                          SnapshotCache(str(tmp_path / "cache.sqlite3")))
+
+    async def cenario():
+        antes = await tenant.data_loader.load_table("despesa")
+        assert await carregar(tenant) > 0
+        chamadas = dict(planilha.chamadas)
+
+        tenant.trim()
+        assert tenant.memory == 0
+        depois = await tenant.data_loader.load_table("despesa")
+        assert depois is not antes and depois.frame.equals(antes.frame)
+        assert planilha.chamadas == chamadas
+
+        # A revalidação fica com a atualização em segundo plano
+        planilha.editar("despesa", planilha.abas["despesa"].linhas[:5])
+        assert await tenant.scheduler.refresh_now() == ["despesa"]
+        assert planilha.chamadas["revisao"] == chamadas["revisao"] + 1
+        assert len(await tenant.data_loader.load_data("despesa")) == 5
+
+    asyncio.run(cenario())
@@ -0,0 +1,107 @@
+# ocb/tests/test_write_back.py
+import pytest
+from benchmarks.synthetic import FakeClient, FakeSpreadsheet, gerar_planilha
+from data.data_loader import DataLoader
+from data.google_clients import RETRY_STATUS, _retry_class
+from data.write_back import ABA_SIMULACOES, WriteBackQueue, WriteJournal
+
+
+class PlanilhaInstavel(FakeSpreadsheet):
+    """Planilha cujo batch_update falha antes (ou depois) de aplicar a gravação."""
+
+    falha = None  # "antes", "depois" ou None
+
+    def batch_update(self, corpo):
+        if self.falha == "antes":
+            raise ConnectionError("sem rede")
+        resposta = super().batch_update(corpo)
+        if self.falha == "depois":
+            raise ConnectionError("resposta perdida")
+        return resposta
+
+
+@pytest.fixture
+def planilha():
+    return PlanilhaInstavel(gerar_planilha(50, meses=3))
+
+
+def _fila(planilha, journal):
+    loader = DataLoader(None, "x", ttl=0, client=FakeClient(planilha))
+    return loader, WriteBackQueue(loader, journal)
+
+
+def _simular(fila, valor=100.0):
+    return fila.registrar_simulacao(valor, "Lazer", "Pix", 1, "Compra aprovada!", "ok")
+
+
+def test_linhas_aparecem_antes_do_envio_e_saem_em_um_batch(planilha):
+    loader, fila = _fila(planilha, WriteJournal())
+    _simular(fila)
+    fila.registrar_compra(250.0, "Lazer", "Pix", 3)
+
+    assert len(loader.load_data(ABA_SIMULACOES)) == 2
+    assert loader.load_table("despesa").centavos("Valor da Despesa")[-1] == 25000
+    assert fila.flush() == 2
+    assert planilha.chamadas["batch_update"] == 1
+    assert len(fila) == 0 and fila.journal.pending("x") == []
+    assert planilha.abas["despesa"].linhas[-1][5] == "1/3"
+    # A nova revisão traz as linhas da planilha, sem duplicar as locais
+    assert len(loader.load_data(ABA_SIMULACOES)) == 2
+
+
+def test_journal_reenvia_pendentes_apos_reinicio(planilha, tmp_path):
+    caminho = str(tmp_path / "journal.sqlite3")
+    _, fila = _fila(planilha, WriteJournal(caminho))
+    _simular(fila)
+    fila.journal.close()
+
+    loader, reiniciada = _fila(planilha, WriteJournal(caminho))
+    assert len(reiniciada) == 1
+    assert len(loader.load_data(ABA_SIMULACOES)) == 2
+    assert reiniciada.flush() == 1
+    assert planilha.abas[ABA_SIMULACOES].linhas[1][1] == "R$ 100,00"
+
+
+def test_falha_antes_de_gravar_mantem_pendentes(planilha):
+    loader, fila = _fila(planilha, WriteJournal())
+    _simular(fila)
+    planilha.falha = "antes"
+    with pytest.raises(ConnectionError):
+        fila.flush()
+    assert len(fila) == 1
+    assert len(loader.load_data(ABA_SIMULACOES)) == 2
+
+    planilha.falha = None
+    assert fila.flush() == 1
+    assert len(planilha.abas[ABA_SIMULACOES].linhas) == 2
+
+
+def test_resposta_perdida_nao_duplica_linhas(planilha, tmp_path):
+    caminho = str(tmp_path / "journal.sqlite3")
+    _, fila = _fila(planilha, WriteJournal(caminho))
+    _simular(fila, 100.0)
+    _simular(fila, 200.0)
+    planilha.falha = "depois"
+    with pytest.raises(ConnectionError):
+        fila.flush()
+    fila.journal.close()
+
+    planilha.falha = None
+    _, reiniciada = _fila(planilha, WriteJournal(caminho))
+    _simular(reiniciada, 300.0)
+    assert reiniciada.flush() == 3
+    valores = [linha[1] for linha in planilha.abas[ABA_SIMULACOES].linhas[1:]]
+    assert valores == ["R$ 100,00", "R$ 200,00", "R$ 300,00"]
+    assert len(reiniciada) == 0
+
+
+@pytest.mark.parametrize("metodo, status, repete", [
+    ("GET", 503, True),
+    ("GET", 429, True),
+    ("POST", 429, True),
+    ("POST", 500, False),
+    ("POST", 503, False),
+])
+def test_retry_nao_repete_gravacoes_em_5xx(metodo, status, repete):
+    retry = _retry_class()(total=3, status_forcelist=RETRY_STATUS)
+    assert retry.is_retry(metodo, status) is repete